@@ -0,0 +1,248 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+from api.sparql_tokens import UnclosedStringError, tokenize
+
+logger = logging.getLogger(__name__)
+
+# alias cache bersama antar worker, lihat CACHES di kagebunshin/settings.py
+SHARED_CACHE_ALIAS = 'shared'
+
+SPARQL_CACHE_MAX_ENTRIES = int(os.getenv('SPARQL_CACHE_MAX_ENTRIES', '512'))
+SPARQL_CACHE_TTL = int(os.getenv('SPARQL_CACHE_TTL', '300'))
+# seberapa sering generasi TieredCache dibaca ulang dari cache bersama (detik)
+SHARED_CACHE_GENERATION_SECONDS = int(os.getenv('SHARED_CACHE_GENERATION_SECONDS', '5'))
+
+
+def normalize_query_text(query: str) -> str:
+    """Token query (api/sparql_tokens.py) dipisah satu spasi, supaya query yang
+    sama (beda indentasi, baris kosong atau komentar) dapat key cache yang
+    sama. Query dengan string yang tidak ditutup dipakai apa adanya."""
+    try:
+        tokens = tokenize(query)
+    except UnclosedStringError:
+        return query.strip()
+    return " ".join(token.value for token in tokens)
+
+
+def query_fingerprint(query: str) -> str:
+    return hashlib.sha256(normalize_query_text(query).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Cache LRU in-process dengan TTL per entry.
+
+    Dipakai di depan GraphDB oleh api/sparql_client.py. Aman dipanggil dari
+    beberapa thread sekaligus.
+    """
+
+    def __init__(self, max_entries=SPARQL_CACHE_MAX_ENTRIES, default_ttl=SPARQL_CACHE_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# Tier bersama (Django cache 'shared'). Backend-nya bisa file, Redis, atau
+# backend Django lain; error dari backend tidak boleh menggagalkan request.
+
+def shared_get(key):
+    try:
+        return caches[SHARED_CACHE_ALIAS].get(key)
+    except Exception as e:
+        logger.warning("Shared cache get gagal: %s", e)
+        return None
+
+def shared_set(key, value, ttl):
+    if ttl <= 0:
+        return
+    try:
+        caches[SHARED_CACHE_ALIAS].set(key, value, ttl)
+    except Exception as e:
+        logger.warning("Shared cache set gagal: %s", e)
+
+def shared_delete(key):
+    # jangan pernah clear() alias bersama: isinya juga dipakai cache lain
+    # (snapshot, versi dataset), dan di Redis clear() berarti FLUSHDB
+    try:
+        caches[SHARED_CACHE_ALIAS].delete(key)
+    except Exception as e:
+        logger.warning("Shared cache delete gagal: %s", e)
+
+async def ashared_get(key):
+    try:
+        return await caches[SHARED_CACHE_ALIAS].aget(key)
+    except Exception as e:
+        logger.warning("Shared cache get gagal: %s", e)
+        return None
+
+async def ashared_set(key, value, ttl):
+    if ttl <= 0:
+        return
+    try:
+        await caches[SHARED_CACHE_ALIAS].aset(key, value, ttl)
+    except Exception as e:
+        logger.warning("Shared cache set gagal: %s", e)
+
+
+class TieredCache:
+    """Cache dua tingkat: ResultCache in-process di depan cache bersama.
+
+    Hit di tier bersama ikut disalin ke tier lokal supaya request berikutnya
+    di worker yang sama tidak perlu baca disk/Redis lagi.
+
+    Key di tier bersama memuat generasi cache (disimpan di cache bersama
+    juga). invalidate() tanpa key cukup menaikkan generasi: entry lama tidak
+    terbaca lagi dan hilang sendiri setelah TTL-nya habis, tanpa menyentuh
+    key lain di cache bersama.
+    """
+
+    def __init__(self, local=None, prefix="sparql"):
+        self.local = local if local is not None else ResultCache()
+        self.prefix = prefix
+        self.generation_key = f"{prefix}:generation"
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self._generation = None
+        self._generation_checked = 0.0
+
+    def _generation_stale(self):
+        return (self._generation is None
+                or time.monotonic() - self._generation_checked >= SHARED_CACHE_GENERATION_SECONDS)
+
+    def _set_generation(self, generation):
+        self._generation = generation if generation is not None else 0
+        self._generation_checked = time.monotonic()
+        return self._generation
+
+    def generation(self):
+        if self._generation_stale():
+            return self._set_generation(shared_get(self.generation_key))
+        return self._generation
+
+    async def ageneration(self):
+        if self._generation_stale():
+            return self._set_generation(await ashared_get(self.generation_key))
+        return self._generation
+
+    def shared_key(self, key, generation):
+        return f"{self.prefix}:{generation}:{key}"
+
+    def ttl(self, ttl):
+        return self.local.default_ttl if ttl is None else ttl
+
+    def _from_shared(self, key, entry):
+        # entry di tier bersama disimpan sebagai (expires_at, value) supaya
+        # salinan lokalnya tidak hidup lebih lama dari TTL aslinya
+        if entry is None:
+            self.shared_misses += 1
+            return None
+
+        expires_at, value = entry
+        self.shared_hits += 1
+        self.local.set(key, value, expires_at - time.time())
+        return value
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        return self._from_shared(key, shared_get(self.shared_key(key, self.generation())))
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl(ttl)
+        self.local.set(key, value, ttl)
+        shared_set(self.shared_key(key, self.generation()), (time.time() + ttl, value), ttl)
+
+    async def aget(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        return self._from_shared(key, await ashared_get(self.shared_key(key, await self.ageneration())))
+
+    async def aset(self, key, value, ttl=None):
+        ttl = self.ttl(ttl)
+        self.local.set(key, value, ttl)
+        await ashared_set(self.shared_key(key, await self.ageneration()), (time.time() + ttl, value), ttl)
+
+    def invalidate(self, key=None):
+        self.local.invalidate(key)
+        if key is not None:
+            shared_delete(self.shared_key(key, self.generation()))
+            return
+        generation = time.time()
+        shared_set(self.generation_key, generation, 365 * 24 * 3600)
+        self._set_generation(generation)
+
+    def invalidate_local(self):
+        """Buang tier lokal saja, generasi dibaca ulang di akses berikutnya
+        (dipakai worker yang tahu proses lain sudah menaikkan generasi)."""
+        self.local.invalidate(None)
+        self._generation = None
+
+    def stats(self):
+        stats = self.local.stats()
+        stats["sharedBackend"] = caches[SHARED_CACHE_ALIAS].__class__.__name__
+        stats["sharedHits"] = self.shared_hits
+        stats["sharedMisses"] = self.shared_misses
+        return stats
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.sparql_client import invalidate_sparql_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Buang cache hasil SPARQL di cache bersama (dipakai semua worker). "
+        "Cache studio Wikidata di disk (STUDIO_CACHE_DIR) tidak ikut dibuang."
+    )
+
+    def handle(self, *args, **options):
+        invalidate_sparql_cache()
+        self.stdout.write(self.style.SUCCESS("Cache bersama berhasil dikosongkan."))
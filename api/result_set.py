@@ -0,0 +1,107 @@
+class ResultSet:
+    """Hasil SPARQL SELECT yang sudah diratakan, disimpan per kolom.
+
+    Nama variabel (head.vars) cukup disimpan sekali dan tiap kolom berupa list
+    value (None untuk unbound), jadi tidak ada satu dict per row. Dict baru
+    dibuat saat diserialisasi: lewat `tolist()` (dipanggil JSONEncoder DRF) atau
+    saat di-iterate (streaming response), dengan bentuk yang sama persis dengan
+    hasil sparql_to_json.
+    """
+
+    __slots__ = ("vars", "columns", "length")
+
+    def __init__(self, vars, columns, length=None):
+        self.vars = list(vars)
+        self.columns = columns
+        if length is None:
+            length = len(columns[self.vars[0]]) if self.vars else 0
+        self.length = length
+
+    @classmethod
+    def from_sparql(cls, result):
+        vars = list(result.get("head", {}).get("vars", []))
+        bindings = result.get("results", {}).get("bindings", [])
+
+        if not vars:
+            # head kosong, ambil variabel dari binding sesuai urutan munculnya
+            seen = {}
+            for binding in bindings:
+                for var in binding:
+                    seen.setdefault(var, None)
+            vars = list(seen)
+
+        columns = {
+            var: [binding[var].get("value") if var in binding else None for binding in bindings]
+            for var in vars
+        }
+        return cls(vars, columns, len(bindings))
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = list(rows)
+        seen = {}
+        for row in rows:
+            for var in row:
+                seen.setdefault(var, None)
+        vars = list(seen)
+        columns = {var: [row.get(var) for row in rows] for var in vars}
+        return cls(vars, columns, len(rows))
+
+    def __len__(self):
+        return self.length
+
+    def column(self, name):
+        column = self.columns.get(name)
+        return column if column is not None else [None] * self.length
+
+    def row(self, index):
+        row = {}
+        for var in self.vars:
+            value = self.columns[var][index]
+            if value is not None:
+                row[var] = value
+        return row
+
+    def __iter__(self):
+        columns = [(var, self.columns[var]) for var in self.vars]
+        for index in range(self.length):
+            row = {}
+            for var, column in columns:
+                value = column[index]
+                if value is not None:
+                    row[var] = value
+            yield row
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            columns = {var: column[key] for var, column in self.columns.items()}
+            return ResultSet(self.vars, columns, len(range(*key.indices(self.length))))
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError(key)
+        return self.row(key)
+
+    def take(self, indices):
+        """ResultSet baru berisi row pada `indices` (sesuai urutannya)."""
+        indices = list(indices)
+        columns = {var: [column[i] for i in indices] for var, column in self.columns.items()}
+        return ResultSet(self.vars, columns, len(indices))
+
+    def set_column(self, name, values):
+        values = list(values)
+        if len(values) != self.length:
+            raise ValueError(f"Panjang kolom '{name}' tidak sama dengan jumlah row")
+        if name not in self.columns:
+            self.vars.append(name)
+        self.columns[name] = values
+        return self
+
+    def map_column(self, name, fn):
+        """Ubah value satu kolom di tempat, unbound (None) dibiarkan."""
+        if name in self.columns:
+            self.columns[name] = [None if value is None else fn(value) for value in self.columns[name]]
+        return self
+
+    def tolist(self):
+        return list(self)
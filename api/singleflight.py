@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Gabungkan pemanggilan konkuren dengan key yang sama jadi satu.
+
+    Thread pertama (leader) yang menjalankan `fn`, thread lain dengan key yang
+    sama menunggu dan ikut memakai hasilnya (atau exception-nya).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """Versi asyncio dari SingleFlight, satu task per key per event loop."""
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, coro_fn):
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+
+        task = self._tasks.get(task_key)
+        if task is None:
+            task = loop.create_task(coro_fn())
+            self._tasks[task_key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(task_key, None))
+
+        # shield supaya caller yang dibatalkan tidak ikut membatalkan caller lain
+        return await asyncio.shield(task)
+
+    def in_flight(self):
+        return len(self._tasks)
@@ -1,41 +1,437 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from api.cache import TieredCache, query_fingerprint
+from api.singleflight import SingleFlight, AsyncSingleFlight
+from api.sparql_results import RESULT_FORMATS, format_from_content_type, iter_rows, aiter_rows
 from kagebunshin.common.utils import extract_graphdb_error
 
 GRAPHDB_URL = os.getenv('GRAPHDB_URL')
 REPO_NAME = "kagebunshin-graph"
 
-def test_connection():
-    url = f"{GRAPHDB_URL}/repositories/{REPO_NAME}/statements"
+# konfigurasi koneksi ke GraphDB, bisa dioverride lewat .env
+GRAPHDB_POOL_SIZE = int(os.getenv('GRAPHDB_POOL_SIZE', '10'))
+GRAPHDB_CONNECT_TIMEOUT = float(os.getenv('GRAPHDB_CONNECT_TIMEOUT', '3'))
+GRAPHDB_READ_TIMEOUT = float(os.getenv('GRAPHDB_READ_TIMEOUT', '30'))
+GRAPHDB_MAX_RETRIES = int(os.getenv('GRAPHDB_MAX_RETRIES', '2'))
+GRAPHDB_RETRY_BACKOFF = float(os.getenv('GRAPHDB_RETRY_BACKOFF', '0.3'))
+GRAPHDB_ASYNC_POOL_SIZE = int(os.getenv('GRAPHDB_ASYNC_POOL_SIZE', '100'))
+
+# format hasil untuk query yang dibaca bertahap (lihat api/sparql_results.py),
+# tsv/csv lebih ringan dari json kalau datatype tidak dibutuhkan
+SPARQL_ROWS_FORMAT = os.getenv('SPARQL_ROWS_FORMAT', 'tsv')
+SPARQL_STREAM_CHUNK_SIZE = int(os.getenv('SPARQL_STREAM_CHUNK_SIZE', '65536'))
+# hasil streaming hanya di-cache kalau jumlah row-nya tidak lebih dari ini
+SPARQL_STREAM_CACHE_MAX_ROWS = int(os.getenv('SPARQL_STREAM_CACHE_MAX_ROWS', '5000'))
+
+# jumlah query yang bisa jalan bareng lewat run_sparql_many
+SPARQL_PARALLEL_WORKERS = int(os.getenv('SPARQL_PARALLEL_WORKERS', '8'))
+
+RETRY_STATUS_CODES = (502, 503, 504)
+
+SPARQL_HEADERS = {
+    "Accept": "application/sparql-results+json",
+    "Content-Type": "application/x-www-form-urlencoded"
+}
+
+def query_data(query, timeout=None):
+    # `timeout` (detik) diteruskan ke GraphDB, query yang lebih lama dihentikan di server
+    data = {"query": query}
+    if timeout:
+        data["timeout"] = str(int(timeout))
+    return data
+
+def rows_headers(result_format):
+    return {**SPARQL_HEADERS, "Accept": RESULT_FORMATS[result_format]}
+
+def error_result(e):
     try:
-        response = requests.head(url)
-        response.raise_for_status()
-        return {"database": "connected"}
-    except Exception as e:
-        return {"error": str(e)}
-
-def run_sparql(query: str):
-    headers = {
-        "Accept": "application/sparql-results+json",
-        "Content-Type": "application/x-www-form-urlencoded"
+        raw_error = e.response.text
+        error_detail = extract_graphdb_error(raw_error)
+    except:
+        error_detail = str(e) or e.__class__.__name__
+
+    return {
+        "error": error_detail,
     }
-    
-    try:
-        response = requests.post(
-            f"{GRAPHDB_URL}/repositories/{REPO_NAME}",
-            data={"query": query},
-            headers=headers
+
+
+class SparqlClient:
+    """Client GraphDB dengan session yang di-pool (keep-alive), timeout dan retry.
+
+    Query SPARQL SELECT bersifat read-only, jadi POST ke endpoint repository
+    aman untuk di-retry walaupun bukan method idempotent menurut HTTP.
+    """
+
+    def __init__(self, base_url=None, repo_name=REPO_NAME,
+                 pool_size=GRAPHDB_POOL_SIZE,
+                 connect_timeout=GRAPHDB_CONNECT_TIMEOUT,
+                 read_timeout=GRAPHDB_READ_TIMEOUT,
+                 max_retries=GRAPHDB_MAX_RETRIES,
+                 backoff=GRAPHDB_RETRY_BACKOFF):
+        self.base_url = base_url if base_url is not None else GRAPHDB_URL
+        self.repo_name = repo_name
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["HEAD", "GET", "POST"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+        )
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def repository_url(self):
+        return f"{self.base_url}/repositories/{self.repo_name}"
+
+    def test_connection(self):
+        try:
+            response = self.session.head(f"{self.repository_url}/statements", timeout=self.timeout)
+            response.raise_for_status()
+            return {"database": "connected"}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def size(self):
+        """Jumlah statement di repository (endpoint /size GraphDB)."""
+        try:
+            response = self.session.get(f"{self.repository_url}/size", timeout=self.timeout)
+            response.raise_for_status()
+            return {"size": int(response.text.strip())}
+        except Exception as e:
+            return error_result(e)
+
+    def post(self, query: str, headers=SPARQL_HEADERS, timeout=None, stream=False):
+        """POST query ke repository dan return response mentahnya. Error HTTP
+        di-raise, pemanggil yang mengubahnya jadi {"error": ...}."""
+        response = self.session.post(
+            self.repository_url,
+            data=query_data(query, timeout),
+            headers=headers,
+            timeout=self.timeout,
+            stream=stream,
         )
         response.raise_for_status()
-        return response.json()
-    except Exception as e:
+        return response
+
+    def query(self, query: str, timeout=None):
+        try:
+            return self.post(query, timeout=timeout).json()
+        except Exception as e:
+            return error_result(e)
+
+    def query_rows(self, query: str, result_format="json", timeout=None):
+        """Seperti `query`, tapi body dibaca bertahap: return {"rows": iterator}
+        berisi row yang sudah diratakan, atau {"error": ...}."""
+        try:
+            response = self.post(query, rows_headers(result_format), timeout, stream=True)
+        except Exception as e:
+            return error_result(e)
+
+        # GraphDB bisa saja menjawab dengan format lain dari yang diminta
+        result_format = format_from_content_type(response.headers.get("Content-Type"), result_format)
+        return {"rows": self._iter_response(response, result_format)}
+
+    def query_raw(self, query: str, result_format, timeout=None):
+        """Body hasil GraphDB apa adanya (tanpa di-parse): return {"chunks":
+        iterator bytes, "content_type": ...} atau {"error": ...}."""
         try:
-            raw_error = e.response.text
-            error_detail = extract_graphdb_error(raw_error)
-        except:
-            error_detail = str(e)
+            response = self.post(query, rows_headers(result_format), timeout, stream=True)
+        except Exception as e:
+            return error_result(e)
+
+        content_type = response.headers.get("Content-Type") or RESULT_FORMATS[result_format]
+        return {"chunks": self._iter_chunks(response), "content_type": content_type}
+
+    def _iter_chunks(self, response):
+        try:
+            yield from response.iter_content(SPARQL_STREAM_CHUNK_SIZE)
+        finally:
+            response.close()
+
+    def _iter_response(self, response, result_format):
+        try:
+            yield from iter_rows(response.iter_content(SPARQL_STREAM_CHUNK_SIZE), result_format)
+        finally:
+            response.close()
+
+
+class AsyncSparqlClient:
+    """Versi asyncio dari SparqlClient untuk view async (deploy lewat ASGI).
+
+    Satu instance terikat ke satu event loop karena koneksi httpx tidak bisa
+    dipakai lintas loop, jadi ambil lewat `get_async_client()`.
+    """
+
+    def __init__(self, base_url=None, repo_name=REPO_NAME,
+                 pool_size=GRAPHDB_ASYNC_POOL_SIZE,
+                 connect_timeout=GRAPHDB_CONNECT_TIMEOUT,
+                 read_timeout=GRAPHDB_READ_TIMEOUT,
+                 max_retries=GRAPHDB_MAX_RETRIES,
+                 backoff=GRAPHDB_RETRY_BACKOFF):
+        self.base_url = base_url if base_url is not None else GRAPHDB_URL
+        self.repo_name = repo_name
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+            ),
+        )
+
+    @property
+    def repository_url(self):
+        return f"{self.base_url}/repositories/{self.repo_name}"
+
+    async def _post_with_retry(self, url, stream=False, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                request = self.http.build_request("POST", url, **kwargs)
+                response = await self.http.send(request, stream=stream)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                if stream:
+                    await response.aclose()
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+            await asyncio.sleep(self.backoff * (2 ** attempt))
+            attempt += 1
+
+    async def test_connection(self):
+        try:
+            response = await self.http.head(f"{self.repository_url}/statements")
+            response.raise_for_status()
+            return {"database": "connected"}
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def query(self, query: str, timeout=None):
+        try:
+            response = await self._post_with_retry(
+                self.repository_url,
+                data=query_data(query, timeout),
+                headers=SPARQL_HEADERS,
+            )
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return error_result(e)
+
+    async def query_rows(self, query: str, result_format="json", timeout=None):
+        try:
+            response = await self._post_with_retry(
+                self.repository_url,
+                stream=True,
+                data=query_data(query, timeout),
+                headers=rows_headers(result_format),
+            )
+            if response.is_error:
+                # body error dibaca dulu supaya bisa dipakai error_result
+                await response.aread()
+                await response.aclose()
+            response.raise_for_status()
+        except Exception as e:
+            return error_result(e)
+
+        result_format = format_from_content_type(response.headers.get("Content-Type"), result_format)
+        return {"rows": self._aiter_response(response, result_format)}
+
+    async def _aiter_response(self, response, result_format):
+        try:
+            async for row in aiter_rows(response.aiter_bytes(SPARQL_STREAM_CHUNK_SIZE), result_format):
+                yield row
+        finally:
+            await response.aclose()
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+# satu client per proses (per worker gunicorn) supaya koneksi ke GraphDB dipakai ulang
+client = SparqlClient()
+
+# client async disimpan per event loop, loop yang sudah ditutup dibuang
+_async_clients = {}
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        for old_loop in [l for l in _async_clients if l.is_closed()]:
+            del _async_clients[old_loop]
+        async_client = AsyncSparqlClient()
+        _async_clients[loop] = async_client
+    return async_client
+
+# cache hasil query (yang tidak error), key-nya query yang sudah dinormalisasi.
+# Tier pertama per proses, tier kedua dipakai bersama semua worker (lihat api/cache.py)
+result_cache = TieredCache(prefix="sparql")
+
+# query identik yang datang bersamaan cukup dikirim sekali ke GraphDB
+inflight = SingleFlight()
+async_inflight = AsyncSingleFlight()
+
+def test_connection():
+    return client.test_connection()
+
+def repository_size():
+    return client.size()
+
+def run_sparql(query: str, cache_ttl=None, timeout=None):
+    """Jalankan query SELECT ke GraphDB.
+
+    `cache_ttl` dalam detik, None pakai default SPARQL_CACHE_TTL dan 0 untuk
+    melewati cache. Hasil dari cache dipakai bersama, jangan diubah isinya.
+    `timeout` (detik) adalah batas waktu eksekusi query di GraphDB.
+    """
+    key = query_fingerprint(query)
+    if cache_ttl != 0:
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+
+    def fetch():
+        result = client.query(query, timeout)
+        if "error" not in result and cache_ttl != 0:
+            result_cache.set(key, result, cache_ttl)
+        return result
+
+    return inflight.do(key, fetch)
+
+async def arun_sparql(query: str, cache_ttl=None, timeout=None):
+    key = query_fingerprint(query)
+    if cache_ttl != 0:
+        cached = await result_cache.aget(key)
+        if cached is not None:
+            return cached
+
+    async def fetch():
+        result = await get_async_client().query(query, timeout)
+        if "error" not in result and cache_ttl != 0:
+            await result_cache.aset(key, result, cache_ttl)
+        return result
+
+    return await async_inflight.do(key, fetch)
+
+# thread untuk run_sparql_many, jangan panggil run_sparql_many dari thread ini
+parallel_pool = ThreadPoolExecutor(max_workers=SPARQL_PARALLEL_WORKERS, thread_name_prefix="sparql-parallel")
+
+def run_sparql_many(queries, cache_ttl=None):
+    """Jalankan beberapa query sekaligus. `queries` berupa {nama: query},
+    hasilnya {nama: result} (result per query sama dengan run_sparql)."""
+    futures = {name: parallel_pool.submit(run_sparql, query, cache_ttl) for name, query in queries.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+async def arun_sparql_many(queries, cache_ttl=None):
+    results = await asyncio.gather(*(arun_sparql(query, cache_ttl) for query in queries.values()))
+    return dict(zip(queries, results))
+
+def rows_cache_key(query: str, result_format):
+    return f"{query_fingerprint(query)}:rows:{result_format}"
+
+def collect_rows(rows, key, cache_ttl):
+    # row diteruskan apa adanya, salinannya disimpan ke cache hanya kalau
+    # hasilnya kecil dan iterator habis dibaca sampai akhir
+    collected = []
+    for row in rows:
+        if collected is not None:
+            collected.append(row)
+            if len(collected) > SPARQL_STREAM_CACHE_MAX_ROWS:
+                collected = None
+        yield row
+    if collected is not None:
+        result_cache.set(key, tuple(collected), cache_ttl)
+
+async def acollect_rows(rows, key, cache_ttl):
+    collected = []
+    async for row in rows:
+        if collected is not None:
+            collected.append(row)
+            if len(collected) > SPARQL_STREAM_CACHE_MAX_ROWS:
+                collected = None
+        yield row
+    if collected is not None:
+        await result_cache.aset(key, tuple(collected), cache_ttl)
+
+async def _aiter_cached(rows):
+    for row in rows:
+        yield row
+
+def stream_sparql(query: str, result_format=None, cache_ttl=None, timeout=None):
+    """Versi run_sparql untuk hasil besar: return {"rows": iterator row yang
+    sudah diratakan} atau {"error": ...}. Body response dibaca bertahap
+    selama iterator dikonsumsi, jadi hasil lengkapnya tidak pernah ada utuh
+    di memori. Tidak lewat single-flight karena iteratornya hanya bisa
+    dikonsumsi satu kali.
+    """
+    result_format = result_format or SPARQL_ROWS_FORMAT
+    key = rows_cache_key(query, result_format)
+    if cache_ttl != 0:
+        cached = result_cache.get(key)
+        if cached is not None:
+            return {"rows": iter(cached)}
+
+    result = client.query_rows(query, result_format, timeout)
+    if "error" in result or cache_ttl == 0:
+        return result
+    return {"rows": collect_rows(result["rows"], key, cache_ttl)}
+
+def stream_sparql_raw(query: str, result_format, timeout=None):
+    """Hasil query dalam format asli GraphDB (csv / tsv / json) untuk diteruskan
+    langsung ke client tanpa dibuat jadi row Python. Tidak lewat cache."""
+    return client.query_raw(query, result_format, timeout)
+
+async def astream_sparql(query: str, result_format=None, cache_ttl=None, timeout=None):
+    result_format = result_format or SPARQL_ROWS_FORMAT
+    key = rows_cache_key(query, result_format)
+    if cache_ttl != 0:
+        cached = await result_cache.aget(key)
+        if cached is not None:
+            return {"rows": _aiter_cached(cached)}
+
+    result = await get_async_client().query_rows(query, result_format, timeout)
+    if "error" in result or cache_ttl == 0:
+        return result
+    return {"rows": acollect_rows(result["rows"], key, cache_ttl)}
+
+def invalidate_sparql_cache(query: str = None, local_only=False):
+    """Hook untuk membuang cache, misalnya setelah data di GraphDB di-update.
+    Tanpa argumen semua entry SPARQL dibuang, termasuk yang di cache bersama
+    (kecuali `local_only`, yang hanya membuang cache di proses ini)."""
+    if not query:
+        if local_only:
+            result_cache.invalidate_local()
+        else:
+            result_cache.invalidate(None)
+        return
+    result_cache.invalidate(query_fingerprint(query))
+    for result_format in RESULT_FORMATS:
+        result_cache.invalidate(rows_cache_key(query, result_format))
 
-        return {
-            "error": error_detail,
-        }
+def sparql_cache_stats():
+    stats = result_cache.stats()
+    stats["inFlight"] = inflight.in_flight() + async_inflight.in_flight()
+    return stats
@@ -0,0 +1,229 @@
+import codecs
+import csv
+import json
+import re
+
+# Parser hasil SPARQL SELECT yang membaca response GraphDB bertahap dan
+# langsung menghasilkan row yang sudah diratakan ({variable: value}), sama
+# seperti simplify_bindings di api/views.py. Body response tidak pernah di-load
+# utuh ke memori.
+#
+# Format yang didukung:
+# - json: application/sparql-results+json (lengkap dengan datatype/lang)
+# - tsv : text/tab-separated-values, lebih ringan, datatype ikut terbuang
+# - csv : text/csv, paling ringan, tapi unbound dan string kosong tidak bisa
+#         dibedakan (keduanya dianggap unbound)
+#
+# Parser bersifat push (`feed(bytes)` lalu `close()`) supaya bisa dipakai dari
+# client sync (requests) maupun async (httpx).
+
+RESULT_FORMATS = {
+    "json": "application/sparql-results+json",
+    "tsv": "text/tab-separated-values",
+    "csv": "text/csv",
+}
+
+BINDINGS_START = re.compile(r'"bindings"\s*:\s*\[')
+
+TSV_ESCAPES = {
+    "t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f",
+    '"': '"', "'": "'", "\\": "\\",
+}
+TSV_ESCAPE_PATTERN = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+
+
+def format_from_content_type(content_type, default="json"):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    for name, mime in RESULT_FORMATS.items():
+        if content_type == mime:
+            return name
+    return default
+
+def flatten_binding(binding):
+    return {key: val.get("value") for key, val in binding.items()}
+
+
+class JsonRowsParser:
+    """Ambil object di array `results.bindings` satu per satu. Posisi "head"
+    (sebelum atau sesudah "results") tidak berpengaruh."""
+
+    def __init__(self, encoding="utf-8"):
+        self.text = codecs.getincrementaldecoder(encoding)()
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = None
+        self.done = False
+
+    def feed(self, chunk, final=False):
+        self.buf += self.text.decode(chunk, final=final)
+        rows = []
+
+        if self.pos is None:
+            match = BINDINGS_START.search(self.buf)
+            if match is None:
+                self.buf = self.buf[-64:]
+                return rows
+            self.pos = match.end()
+
+        buf, pos = self.buf, self.pos
+        while not self.done:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == "]":
+                self.done = True
+                break
+            try:
+                binding, pos = self.decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # object belum lengkap, tunggu chunk berikutnya
+                if final:
+                    raise
+                break
+            rows.append(flatten_binding(binding))
+
+        self.buf, self.pos = buf[pos:], 0
+        return rows
+
+    def close(self):
+        rows = self.feed(b"", final=True)
+        if self.pos is not None and not self.done:
+            raise ValueError("Response SPARQL JSON terpotong")
+        # tanpa bindings sama sekali (misalnya hasil ASK) berarti tidak ada row
+        return rows
+
+
+class LineRowsParser:
+    """Dasar parser TSV/CSV: potong input per baris lalu `parse_line`."""
+
+    def __init__(self, encoding="utf-8"):
+        self.text = codecs.getincrementaldecoder(encoding)()
+        self.pending = ""
+        self.names = None
+
+    def feed(self, chunk, final=False):
+        self.pending += self.text.decode(chunk, final=final)
+        rows = []
+        start = 0
+        while True:
+            end = self.pending.find("\n", start)
+            if end == -1:
+                break
+            self._line(self.pending[start:end + 1], rows)
+            start = end + 1
+        self.pending = self.pending[start:]
+        return rows
+
+    def close(self):
+        rows = self.feed(b"", final=True)
+        if self.pending:
+            self._line(self.pending, rows)
+            self.pending = ""
+        return rows
+
+    def _line(self, line, rows):
+        if self.names is None:
+            self.names = self.parse_header(line)
+            return
+        row = self.parse_line(line)
+        if row is not None:
+            rows.append(row)
+
+
+def parse_tsv_term(term):
+    """Value dari satu term TSV (sintaks N-Triples), None kalau unbound."""
+    if not term:
+        return None
+    if term.startswith("<") and term.endswith(">"):
+        return term[1:-1]
+    if term.startswith("_:"):
+        return term[2:]
+    if term.startswith('"'):
+        # suffix @lang / ^^<datatype> tidak mengandung tanda kutip
+        end = term.rfind('"')
+        return unescape_tsv(term[1:end])
+    # angka/boolean ditulis tanpa kutip
+    return term
+
+def unescape_tsv(value):
+    if "\\" not in value:
+        return value
+
+    def replace(match):
+        code = match.group(1)
+        if len(code) > 1:
+            return chr(int(code[1:], 16))
+        return TSV_ESCAPES.get(code, code)
+
+    return TSV_ESCAPE_PATTERN.sub(replace, value)
+
+
+class TsvRowsParser(LineRowsParser):
+    def parse_header(self, line):
+        names = line.rstrip("\r\n").split("\t")
+        return [name[1:] if name[:1] in "?$" else name for name in names]
+
+    def parse_line(self, line):
+        line = line.rstrip("\r\n")
+        if not line:
+            return None
+        row = {}
+        for name, term in zip(self.names, line.split("\t")):
+            value = parse_tsv_term(term)
+            if value is not None:
+                row[name] = value
+        return row
+
+
+class CsvRowsParser(LineRowsParser):
+    def __init__(self, encoding="utf-8"):
+        super().__init__(encoding)
+        self.record = ""
+
+    def _line(self, line, rows):
+        # field yang dikutip boleh berisi newline: satu record baru lengkap
+        # kalau jumlah tanda kutipnya genap
+        self.record += line
+        if self.record.count('"') % 2:
+            return
+        record, self.record = self.record, ""
+        super()._line(record, rows)
+
+    def close(self):
+        rows = super().close()
+        if self.record:
+            raise ValueError("Response SPARQL CSV terpotong")
+        return rows
+
+    def parse_header(self, line):
+        return next(csv.reader([line]), [])
+
+    def parse_line(self, line):
+        values = next(csv.reader([line]), None)
+        if not values:
+            return None
+        return {name: value for name, value in zip(self.names, values) if value != ""}
+
+
+PARSERS = {
+    "json": JsonRowsParser,
+    "tsv": TsvRowsParser,
+    "csv": CsvRowsParser,
+}
+
+def iter_rows(chunks, result_format="json"):
+    """Row hasil query dari iterator bytes (misalnya response.iter_content())."""
+    parser = PARSERS[result_format]()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+async def aiter_rows(chunks, result_format="json"):
+    """Versi async dari iter_rows untuk async iterator bytes (httpx aiter_bytes())."""
+    parser = PARSERS[result_format]()
+    async for chunk in chunks:
+        for row in parser.feed(chunk):
+            yield row
+    for row in parser.close():
+        yield row
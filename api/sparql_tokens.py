@@ -0,0 +1,42 @@
+import re
+from collections import namedtuple
+
+# Tokenizer SPARQL, dipakai untuk normalisasi key cache (api/cache.py) dan
+# oleh parser query playground (query/parser.py).
+
+TOKEN_PATTERN = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<comment>\#[^\n]*)
+  | (?P<string>"{3}(?:[^"\\]|\\.|"(?!""))*"{3}|'{3}(?:[^'\\]|\\.|'(?!''))*'{3}
+              |"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<iri><[^<>"{}|^`\\\s]*>)
+  | (?P<var>[?$]\w+)
+  | (?P<pname>(?:[A-Za-z][\w-]*(?:\.[\w-]+)*)?:(?:[\w%-]+(?:\.[\w%-]+)*)?)
+  | (?P<langtag>@[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_]\w*)
+  | (?P<open>\{)
+  | (?P<close>\})
+  | (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<op>\|\||&&|!=|<=|>=|\^\^|.)
+''', re.VERBOSE)
+
+Token = namedtuple("Token", ["kind", "value", "start", "end"])
+
+
+class UnclosedStringError(ValueError):
+    pass
+
+
+def tokenize(text):
+    """Token query tanpa whitespace dan komentar."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind in ("ws", "comment"):
+            continue
+        if kind == "op" and match.group() in ("'", '"'):
+            raise UnclosedStringError("Query tidak valid, string literal tidak ditutup.")
+        tokens.append(Token(kind, match.group(), match.start(), match.end()))
+    return tokens
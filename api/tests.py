@@ -0,0 +1,167 @@
+import asyncio
+import json
+import random
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from api.cache import SHARED_CACHE_ALIAS, TieredCache, normalize_query_text, query_fingerprint
+from api.sparql_results import aiter_rows, iter_rows
+
+
+class QueryFingerprintTests(SimpleTestCase):
+    def test_whitespace_and_comments_ignored(self):
+        a = "SELECT ?s WHERE {\n  ?s ?p ?o . # semua triple\n}\nLIMIT 5"
+        b = "SELECT ?s   WHERE { ?s ?p ?o . }  LIMIT 5"
+        self.assertEqual(query_fingerprint(a), query_fingerprint(b))
+
+    def test_whitespace_inside_strings_kept(self):
+        a = 'SELECT * WHERE { ?s ?p "a  b" }'
+        b = 'SELECT * WHERE { ?s ?p "a b" }'
+        self.assertNotEqual(query_fingerprint(a), query_fingerprint(b))
+
+    def test_comment_ends_at_line_break(self):
+        # FILTER di baris setelah komentar ikut dijalankan, di baris yang sama tidak
+        a = "SELECT * WHERE { ?s ?p ?o # x\n FILTER(?o = 1) } LIMIT 5"
+        b = "SELECT * WHERE { ?s ?p ?o # x FILTER(?o = 1)\n } LIMIT 5"
+        self.assertNotEqual(query_fingerprint(a), query_fingerprint(b))
+        self.assertEqual(normalize_query_text(b), "SELECT * WHERE { ?s ?p ?o } LIMIT 5")
+
+    def test_apostrophe_in_comment(self):
+        a = "SELECT * WHERE { # it's\n ?s ?p 'x  y' }"
+        self.assertEqual(normalize_query_text(a), "SELECT * WHERE { ?s ?p 'x  y' }")
+
+    def test_hash_in_iri_is_not_comment(self):
+        a = "SELECT * WHERE { ?s a <http://example.org/v#Anime> }"
+        self.assertEqual(normalize_query_text(a), a)
+
+
+XSD_INTEGER = "http://www.w3.org/2001/XMLSchema#integer"
+
+# satu hasil SELECT dalam tiga format, dengan escape, tag bahasa, datatype,
+# blank node, unbound, karakter multi-byte dan newline di dalam literal
+SPARQL_JSON = json.dumps({
+    "head": {"vars": ["s", "label", "n"]},
+    "results": {"bindings": [
+        {
+            "s": {"type": "uri", "value": "http://example.org/anime/1"},
+            "label": {"type": "literal", "xml:lang": "ja", "value": "ナルト \"疾風伝\""},
+            "n": {"type": "literal", "datatype": XSD_INTEGER, "value": "220"},
+        },
+        {
+            "s": {"type": "bnode", "value": "b0"},
+            "label": {"type": "literal", "value": "baris 1\nbaris 2\ttab \\ back, koma"},
+        },
+        {
+            "s": {"type": "uri", "value": "http://example.org/anime/2?a=1&b=2"},
+            "n": {"type": "literal", "datatype": XSD_INTEGER, "value": "-5"},
+        },
+        {"label": {"type": "literal", "xml:lang": "en", "value": "{ \"bindings\": [ ] }"}},
+    ]},
+}, ensure_ascii=False, indent=1)
+
+SPARQL_TSV = (
+    "?s\t?label\t?n\n"
+    '<http://example.org/anime/1>\t"ナルト \\"疾風伝\\""@ja\t220\n'
+    '_:b0\t"baris 1\\nbaris 2\\ttab \\\\ back, koma"\t\n'
+    f'<http://example.org/anime/2?a=1&b=2>\t\t"-5"^^<{XSD_INTEGER}>\n'
+    '\t"{ \\"bindings\\": [ ] }"@en\t\n'
+)
+
+SPARQL_CSV = (
+    "s,label,n\r\n"
+    'http://example.org/anime/1,"ナルト ""疾風伝""",220\r\n'
+    '_:b0,"baris 1\nbaris 2\ttab \\ back, koma",\r\n'
+    "http://example.org/anime/2?a=1&b=2,,-5\r\n"
+    ',"{ ""bindings"": [ ] }",\r\n'
+)
+
+EXPECTED_ROWS = [
+    {"s": "http://example.org/anime/1", "label": "ナルト \"疾風伝\"", "n": "220"},
+    {"s": "b0", "label": "baris 1\nbaris 2\ttab \\ back, koma"},
+    {"s": "http://example.org/anime/2?a=1&b=2", "n": "-5"},
+    {"label": "{ \"bindings\": [ ] }"},
+]
+
+
+def random_chunks(body, rng):
+    """`body` (bytes) dipotong di posisi acak, boleh di tengah karakter UTF-8."""
+    cuts = sorted(rng.sample(range(1, len(body)), rng.randint(1, 20)))
+    return [body[start:end] for start, end in zip([0] + cuts, cuts + [len(body)])]
+
+
+class IncrementalRowsParserTests(SimpleTestCase):
+    bodies = {
+        "json": (SPARQL_JSON, EXPECTED_ROWS),
+        "tsv": (SPARQL_TSV, EXPECTED_ROWS),
+        # CSV menulis blank node apa adanya (_:label)
+        "csv": (SPARQL_CSV, [EXPECTED_ROWS[0], dict(EXPECTED_ROWS[1], s="_:b0"), *EXPECTED_ROWS[2:]]),
+    }
+
+    def test_whole_body(self):
+        for result_format, (body, expected) in self.bodies.items():
+            self.assertEqual(list(iter_rows([body.encode("utf-8")], result_format)), expected, result_format)
+
+    def test_random_chunk_boundaries(self):
+        rng = random.Random(11)
+        for result_format, (body, expected) in self.bodies.items():
+            data = body.encode("utf-8")
+            for _ in range(200):
+                rows = list(iter_rows(random_chunks(data, rng), result_format))
+                self.assertEqual(rows, expected, result_format)
+
+    def test_byte_by_byte(self):
+        for result_format, (body, expected) in self.bodies.items():
+            data = body.encode("utf-8")
+            rows = list(iter_rows([data[i:i + 1] for i in range(len(data))], result_format))
+            self.assertEqual(rows, expected, result_format)
+
+    def test_async_matches_sync(self):
+        async def chunks(data):
+            for i in range(0, len(data), 7):
+                yield data[i:i + 7]
+
+        async def collect(data, result_format):
+            return [row async for row in aiter_rows(chunks(data), result_format)]
+
+        for result_format, (body, expected) in self.bodies.items():
+            rows = asyncio.run(collect(body.encode("utf-8"), result_format))
+            self.assertEqual(rows, expected, result_format)
+
+    def test_json_head_after_results(self):
+        body = json.dumps({"results": {"bindings": [{"x": {"type": "literal", "value": "]"}}]}, "head": {"vars": ["x"]}})
+        self.assertEqual(list(iter_rows([body.encode()], "json")), [{"x": "]"}])
+
+    def test_truncated_body_raises(self):
+        for result_format, body in (("json", SPARQL_JSON), ("csv", SPARQL_CSV)):
+            cut = body.encode("utf-8")[:body.encode("utf-8").index(b"baris 2")]
+            with self.assertRaises(ValueError, msg=result_format):
+                list(iter_rows([cut], result_format))
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-tests'},
+})
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches[SHARED_CACHE_ALIAS].clear()
+
+    def test_shared_hit_from_other_worker(self):
+        TieredCache().set("q", [1], ttl=60)
+        self.assertEqual(TieredCache().get("q"), [1])
+
+    def test_invalidate_all_keeps_other_shared_keys(self):
+        shared = caches[SHARED_CACHE_ALIAS]
+        shared.set("studio:x", "tetap", 60)
+        cache = TieredCache()
+        cache.set("q", [1], ttl=60)
+
+        cache.invalidate()
+
+        self.assertIsNone(cache.get("q"))
+        # worker lain membaca generasi baru setelah cache lokalnya dibuang
+        other = TieredCache()
+        self.assertIsNone(other.get("q"))
+        self.assertEqual(shared.get("studio:x"), "tetap")
+
@@ -1,7 +1,8 @@
 from django.urls import path
-from api.views import test_sparql
+from api.views import test_sparql, cache_stats
 
 app_name = 'api'
 urlpatterns = [
     path('test-sparql/', test_sparql, name='test_sparql'),
+    path('cache-stats/', cache_stats, name='cache_stats'),
 ]
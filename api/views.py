@@ -1,7 +1,9 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from api.sparql_client import test_connection, run_sparql
+from api.sparql_client import test_connection, run_sparql, sparql_cache_stats
+from api.result_set import ResultSet
+from api.sparql_results import flatten_binding
 from kagebunshin.common.utils import api_response
 
 @api_view(['GET'])
@@ -13,14 +15,17 @@ def test_sparql(request):
     result = test_connection()
     return api_response(status.HTTP_200_OK, "Berhasil connect ke GraphDB", result)
 
+@api_view(['GET'])
+def cache_stats(request):
+    return api_response(status.HTTP_200_OK, "Berhasil ambil statistik cache", sparql_cache_stats())
+
 def simplify_bindings(results):
-    simplified = []
-    for row in results.get("bindings", []):
-        item = {}
-        for key, val in row.items():
-            item[key] = val.get("value")
-        simplified.append(item)
-    return simplified
+    return [flatten_binding(row) for row in results.get("bindings", [])]
 
 def sparql_to_json(result):
     return simplify_bindings(result.get("results", {}))
+
+def sparql_to_result_set(result):
+    """Seperti sparql_to_json tapi hasilnya ResultSet (kolom per variabel),
+    lebih hemat memori untuk hasil yang banyak row-nya."""
+    return ResultSet.from_sparql(result)
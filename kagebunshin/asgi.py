@@ -14,3 +14,13 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kagebunshin.settings')
 
 application = get_asgi_application()
+
+# mulai load snapshot katalog di background begitu worker jalan
+from search.catalog import warm_catalog  # noqa: E402
+from search.fulltext import warm_search_index  # noqa: E402
+from search.suggest import warm_suggest_index  # noqa: E402
+from search.versioning import warm_dataset_version  # noqa: E402
+warm_catalog()
+warm_search_index()
+warm_suggest_index()
+warm_dataset_version()
@@ -0,0 +1,89 @@
+import base64
+import json
+import os
+
+# Pagination limit/offset + cursor untuk endpoint list & search.
+# Tanpa parameter limit/offset/cursor endpoint tetap mengembalikan semua data
+# seperti sebelumnya, jadi client lama tidak terpengaruh.
+
+PAGE_MAX_LIMIT = int(os.getenv('PAGE_MAX_LIMIT', '500'))
+PAGE_DEFAULT_LIMIT = int(os.getenv('PAGE_DEFAULT_LIMIT', '50'))
+
+
+class PaginationError(ValueError):
+    pass
+
+
+class Page:
+    def __init__(self, limit, offset=0):
+        self.limit = limit
+        self.offset = offset
+
+    @property
+    def end(self):
+        return self.offset + self.limit
+
+    def slice(self, rows):
+        return rows[self.offset:self.end]
+
+    def meta(self, returned, has_more=None, total=None):
+        if has_more is None:
+            has_more = total is not None and self.offset + returned < total
+        return {
+            "pagination": {
+                "limit": self.limit,
+                "offset": self.offset,
+                "total": total,
+                "nextCursor": encode_cursor(self.end, self.limit) if has_more else None,
+            }
+        }
+
+
+def encode_cursor(offset, limit):
+    raw = json.dumps({"o": offset, "l": limit}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(data["o"]), int(data["l"])
+    except Exception:
+        raise PaginationError("Parameter 'cursor' tidak valid")
+
+def _parse_int(params, name):
+    raw = params.get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        raise PaginationError(f"Parameter '{name}' harus berupa angka")
+
+def parse_pagination(params):
+    """Baca limit/offset/cursor dari query params. Return None kalau request
+    tidak minta pagination, raise PaginationError kalau nilainya tidak valid."""
+    limit = _parse_int(params, "limit")
+    offset = _parse_int(params, "offset")
+    cursor = params.get("cursor")
+
+    if limit is None and offset is None and not cursor:
+        return None
+
+    if cursor:
+        cursor_offset, cursor_limit = decode_cursor(cursor)
+        offset = cursor_offset
+        if limit is None:
+            limit = cursor_limit
+
+    if limit is None:
+        limit = PAGE_DEFAULT_LIMIT
+    if offset is None:
+        offset = 0
+
+    if limit < 1:
+        raise PaginationError("Parameter 'limit' minimal 1")
+    if offset < 0:
+        raise PaginationError("Parameter 'offset' tidak boleh negatif")
+
+    return Page(min(limit, PAGE_MAX_LIMIT), offset)
@@ -1,15 +1,163 @@
+import json
+import logging
+import os
+
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import exception_handler as drf_exception_handler
 from rest_framework import status
 
-def api_response(status_code, message, data=None):
+logger = logging.getLogger(__name__)
+
+def envelope(status_code, message, data=None, meta=None):
     if data is None:
         data = []
-    return Response({
+    body = {
         "status": status_code,
         "message": message,
         "data": data
-    }, status=status_code)
+    }
+    # info tambahan (mis. pagination) hanya ditambahkan kalau ada
+    if meta is not None:
+        body["meta"] = meta
+    return body
+
+def api_response(status_code, message, data=None, meta=None):
+    return Response(envelope(status_code, message, data, meta), status=status_code)
+
+def json_api_response(status_code, message, data=None, meta=None):
+    # versi api_response untuk view async Django biasa (DRF @api_view belum support async)
+    return JsonResponse(
+        envelope(status_code, message, data, meta),
+        status=status_code, encoder=JSONEncoder, json_dumps_params={"ensure_ascii": False}
+    )
+
+# STREAMING RESPONSE
+# Envelope {status, message, data} yang sama, tapi `data` ditulis bertahap dari
+# iterator rows sehingga response besar tidak perlu dibangun utuh di memori.
+# Status 200 sudah terkirim sebelum row pertama dibaca, jadi kalau iterator
+# rows error di tengah jalan (timeout / koneksi GraphDB putus) stream tetap
+# ditutup dengan JSON yang valid dan `meta.error`.
+
+STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', 'True') == 'True'
+# jumlah row per chunk yang dikirim ke client
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', '200'))
+
+STREAM_ERROR_MESSAGE = "Pengiriman hasil terhenti di tengah jalan, data tidak lengkap."
+
+def dump_json(value):
+    # format sama dengan JSONRenderer DRF (compact, unicode apa adanya)
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":"))
+
+def envelope_parts(status_code, message, meta=None):
+    # `meta` boleh callable, dipanggil setelah semua row terkirim (misalnya
+    # untuk flag truncated), jadi tail-nya dibuat terpisah lewat envelope_tail
+    head = dump_json({"status": status_code, "message": message})
+    return (head[:-1] + ',"data":[').encode(), envelope_tail(None if callable(meta) else meta)
+
+def envelope_tail(meta=None):
+    tail = "]"
+    if meta is not None:
+        tail += ',"meta":' + dump_json(meta)
+    return (tail + "}").encode()
+
+def stream_error_meta(meta=None):
+    # meta penutup stream yang terhenti karena error dari iterator rows
+    meta = dict((meta() if callable(meta) else meta) or {})
+    meta["error"] = STREAM_ERROR_MESSAGE
+    return meta
+
+def closing_tail(tail, meta, failed):
+    if failed:
+        return envelope_tail(stream_error_meta(meta))
+    return envelope_tail(meta()) if callable(meta) else tail
+
+def iter_envelope(status_code, message, rows, meta=None):
+    head, tail = envelope_parts(status_code, message, meta)
+    yield head
+
+    chunk = []
+    separator = ""
+    failed = False
+    try:
+        for row in rows:
+            chunk.append(dump_json(row))
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                yield (separator + ",".join(chunk)).encode()
+                separator = ","
+                chunk = []
+    except Exception:
+        logger.exception("Stream response terhenti")
+        failed = True
+    if chunk:
+        yield (separator + ",".join(chunk)).encode()
+
+    yield closing_tail(tail, meta, failed)
+
+def iter_ndjson(rows):
+    """Satu objek JSON per baris, dikirim per STREAM_CHUNK_ROWS row. Kalau
+    `rows` error di tengah jalan, baris terakhirnya {"meta": {"error": ...}}."""
+    chunk = []
+    failed = False
+    try:
+        for row in rows:
+            chunk.append(dump_json(row))
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                yield ("\n".join(chunk) + "\n").encode()
+                chunk = []
+    except Exception:
+        logger.exception("Stream ndjson terhenti")
+        failed = True
+    if failed:
+        chunk.append(dump_json({"meta": stream_error_meta()}))
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode()
+
+async def aiter_envelope(status_code, message, rows, meta=None):
+    # `rows` boleh iterator biasa atau async iterator (misalnya dari astream_sparql)
+    if not hasattr(rows, "__aiter__"):
+        for part in iter_envelope(status_code, message, rows, meta):
+            yield part
+        return
+
+    head, tail = envelope_parts(status_code, message, meta)
+    yield head
+
+    chunk = []
+    separator = ""
+    failed = False
+    try:
+        async for row in rows:
+            chunk.append(dump_json(row))
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                yield (separator + ",".join(chunk)).encode()
+                separator = ","
+                chunk = []
+    except Exception:
+        logger.exception("Stream response terhenti")
+        failed = True
+    if chunk:
+        yield (separator + ",".join(chunk)).encode()
+
+    yield closing_tail(tail, meta, failed)
+
+def stream_api_response(status_code, message, rows, meta=None):
+    """Padanan api_response untuk hasil besar, `rows` boleh berupa generator."""
+    return StreamingHttpResponse(
+        iter_envelope(status_code, message, rows, meta),
+        status=status_code, content_type="application/json"
+    )
+
+def astream_api_response(status_code, message, rows, meta=None):
+    # di ASGI StreamingHttpResponse butuh async iterator supaya tidak dikonsumsi lewat thread
+    return StreamingHttpResponse(
+        aiter_envelope(status_code, message, rows, meta),
+        status=status_code, content_type="application/json"
+    )
+
+def str_to_list(str):
+    return [s.strip() for s in str.split(",") if s.strip()]
 
 def custom_exception_handler(exc, context):
     response = drf_exception_handler(exc, context)
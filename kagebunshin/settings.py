@@ -40,6 +40,13 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+# header export /query/execute/ (format ndjson / csv / tsv) yang perlu dibaca frontend
+CORS_EXPOSE_HEADERS = [
+    "Content-Disposition",
+    "X-Query-Limit",
+    "X-Query-Limit-Injected",
+    "X-Query-Limit-Clamped",
+]
 
 
 # Application definition
@@ -100,6 +107,37 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# Cache 'shared' dipakai bersama oleh semua worker gunicorn di satu host untuk
+# hasil SPARQL dan lookup Wikidata. Default-nya file di disk (tanpa service
+# tambahan), set SHARED_CACHE_URL=redis://... untuk pindah ke Redis.
+
+SHARED_CACHE_URL = os.getenv('SHARED_CACHE_URL')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SHARED_CACHE_DIR', '/tmp/kagebunshin-cache'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('SHARED_CACHE_MAX_ENTRIES', '5000')),
+        },
+    },
+}
+
+if SHARED_CACHE_URL:
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': SHARED_CACHE_URL,
+        'TIMEOUT': 300,
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
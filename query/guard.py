@@ -0,0 +1,158 @@
+import os
+from collections import namedtuple
+
+from kagebunshin.common.utils import dump_json
+
+# Batas eksekusi query dari playground (/query/execute/), supaya satu query
+# berat tidak menahan GraphDB dan worker terlalu lama:
+# - query tanpa LIMIT diberi LIMIT QUERY_DEFAULT_LIMIT, LIMIT yang lebih besar
+#   dari QUERY_MAX_ROWS diturunkan
+# - GraphDB diberi timeout QUERY_TIMEOUT_SECONDS
+# - row / byte hasil yang dibaca dibatasi, sisanya tidak dibaca dan response
+#   diberi flag truncated
+
+QUERY_DEFAULT_LIMIT = int(os.getenv('QUERY_DEFAULT_LIMIT', '1000'))
+QUERY_MAX_ROWS = int(os.getenv('QUERY_MAX_ROWS', '10000'))
+QUERY_MAX_BYTES = int(os.getenv('QUERY_MAX_BYTES', str(5 * 1024 * 1024)))
+QUERY_TIMEOUT_SECONDS = int(os.getenv('QUERY_TIMEOUT_SECONDS', '10'))
+
+LimitedQuery = namedtuple("LimitedQuery", ["query", "limit", "injected", "clamped"])
+
+
+def limit_query(parsed, default_limit=QUERY_DEFAULT_LIMIT, max_limit=QUERY_MAX_ROWS, probe_row=True):
+    """Teks query (ParsedQuery) dengan LIMIT yang dijamin ada dan tidak lebih
+    dari `max_limit`. Kalau LIMIT ditambahkan atau diturunkan di sini dan
+    `probe_row` aktif, query meminta satu row lebih dari `limit` untuk
+    mendeteksi hasil yang terpotong; ResultGuard(max_rows=limit) membuang row
+    itu dan memberi flag truncated."""
+    query = parsed.text
+    probe = 1 if probe_row else 0
+
+    if parsed.limit is None:
+        # LIMIT harus sebelum VALUES di akhir query (kalau ada)
+        insert_at = parsed.values_at if parsed.values_at is not None else len(query.rstrip())
+        limited = f"{query[:insert_at].rstrip()}\nLIMIT {default_limit + probe}\n{query[insert_at:]}"
+        return LimitedQuery(limited, default_limit, True, False)
+
+    limit = parsed.limit
+    if limit.value > max_limit:
+        limited = query[:limit.start] + str(max_limit + probe) + query[limit.end:]
+        return LimitedQuery(limited, max_limit, False, True)
+    return LimitedQuery(query, limit.value, False, False)
+
+
+class ResultGuard:
+    """Iterator row yang berhenti setelah `max_rows` row atau `max_bytes` byte
+    (ukuran JSON row). Begitu berhenti, iterator sumber ditutup sehingga sisa
+    response GraphDB tidak ikut dibaca."""
+
+    def __init__(self, rows, max_rows=QUERY_MAX_ROWS, max_bytes=QUERY_MAX_BYTES):
+        self.rows = rows
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.count = 0
+        self.bytes = 0
+        self.truncated_by = None
+
+    def __iter__(self):
+        try:
+            for row in self.rows:
+                if self.count >= self.max_rows:
+                    self.truncated_by = "rows"
+                    break
+                size = len(dump_json(row).encode("utf-8"))
+                if self.bytes + size > self.max_bytes:
+                    self.truncated_by = "bytes"
+                    break
+                self.count += 1
+                self.bytes += size
+                yield row
+        finally:
+            close = getattr(self.rows, "close", None)
+            if close is not None:
+                close()
+
+    def meta(self, limited):
+        return {
+            "execution": {
+                "rows": self.count,
+                "truncated": self.truncated_by is not None,
+                "truncatedBy": self.truncated_by,
+                "limit": limited.limit,
+                "limitInjected": limited.injected,
+                "limitClamped": limited.clamped,
+                "timeoutSeconds": QUERY_TIMEOUT_SECONDS,
+            }
+        }
+
+
+class RawResultGuard:
+    """Padanan ResultGuard untuk body CSV / TSV dari GraphDB yang diteruskan
+    apa adanya: chunk bytes dipotong di batas record setelah `max_rows` record
+    (baris header tidak dihitung) atau `max_bytes` byte. Dengan `quoted`
+    (CSV), newline di dalam field yang dikutip bukan akhir record."""
+
+    def __init__(self, chunks, max_rows=QUERY_MAX_ROWS, max_bytes=QUERY_MAX_BYTES, quoted=False):
+        self.chunks = chunks
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.quoted = quoted
+        self.count = 0
+        self.bytes = 0
+        self.truncated_by = None
+        self._header = True
+
+    def _accept(self, size):
+        # hitung satu record lagi, False kalau record itu melewati batas
+        if not self._header and self.count >= self.max_rows:
+            self.truncated_by = "rows"
+            return False
+        if self.bytes + size > self.max_bytes:
+            self.truncated_by = "bytes"
+            return False
+        if self._header:
+            self._header = False
+        else:
+            self.count += 1
+        self.bytes += size
+        return True
+
+    def __iter__(self):
+        buf = b""
+        scanned = 0  # posisi di buf yang sudah dicari newline-nya
+        quotes = 0   # jumlah tanda kutip di record yang belum selesai
+        try:
+            for chunk in self.chunks:
+                buf += chunk
+                start = 0  # awal record yang belum diteruskan
+                while True:
+                    newline = buf.find(b"\n", scanned)
+                    if self.quoted:
+                        quotes += buf.count(b'"', scanned, len(buf) if newline == -1 else newline)
+                    if newline == -1:
+                        scanned = len(buf)
+                        break
+                    scanned = newline + 1
+                    if quotes % 2:
+                        continue
+                    quotes = 0
+                    if not self._accept(scanned - start):
+                        if start:
+                            yield buf[:start]
+                        return
+                    start = scanned
+
+                if start:
+                    yield buf[:start]
+                    buf, scanned = buf[start:], scanned - start
+                if self.bytes + len(buf) > self.max_bytes:
+                    self.truncated_by = "bytes"
+                    return
+
+            # record terakhir tanpa newline di akhir body
+            if buf and self._accept(len(buf)):
+                yield buf
+        finally:
+            close = getattr(self.chunks, "close", None)
+            if close is not None:
+                close()
@@ -0,0 +1,280 @@
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from api.sparql_client import SPARQL_ROWS_FORMAT, SparqlClient
+from kagebunshin.common.utils import dump_json
+from query.guard import limit_query
+
+logger = logging.getLogger(__name__)
+
+# Job untuk query playground yang terlalu lama untuk /query/execute/. Query
+# dijalankan di thread pool terbatas, hasilnya ditulis ke disk dan dibaca per
+# halaman lewat /query/jobs/<id>/results/. Status dan hasil job ada di disk,
+# jadi bisa dibaca dari worker mana pun; yang menjalankan tetap worker yang
+# menerima job.
+#
+# Satu direktori per job:
+# - job.json: status, kolom, jumlah row dan index posisi byte setiap
+#   QUERY_JOB_INDEX_STRIDE row
+# - rows.jsonl: satu array JSON per row (nilai sesuai urutan kolom)
+#
+# Job dihapus QUERY_JOB_TTL detik setelah selesai. Job yang masih queued /
+# running tidak dihapus; kalau worker-nya berhenti (restart / crash) job
+# ditandai failed, lalu dihapus QUERY_JOB_TTL detik setelahnya.
+
+QUERY_JOB_DIR = os.getenv('QUERY_JOB_DIR', '/tmp/kagebunshin-jobs')
+QUERY_JOB_WORKERS = int(os.getenv('QUERY_JOB_WORKERS', '2'))
+# job yang boleh menunggu di antrian selain yang sedang jalan
+QUERY_JOB_MAX_QUEUED = int(os.getenv('QUERY_JOB_MAX_QUEUED', '8'))
+QUERY_JOB_TIMEOUT_SECONDS = int(os.getenv('QUERY_JOB_TIMEOUT_SECONDS', '600'))
+QUERY_JOB_MAX_ROWS = int(os.getenv('QUERY_JOB_MAX_ROWS', '1000000'))
+QUERY_JOB_MAX_BYTES = int(os.getenv('QUERY_JOB_MAX_BYTES', str(512 * 1024 * 1024)))
+QUERY_JOB_TTL = int(os.getenv('QUERY_JOB_TTL', '3600'))
+# paling lama sebuah job menunggu di antrian: semua job di depannya berjalan
+# sampai timeout
+QUERY_JOB_MAX_WAIT = QUERY_JOB_TIMEOUT_SECONDS * (QUERY_JOB_MAX_QUEUED // QUERY_JOB_WORKERS + 1) + 60
+QUERY_JOB_INDEX_STRIDE = 256
+# job.json diperbarui setiap sekian row selama hasil ditulis
+QUERY_JOB_PROGRESS_ROWS = 10000
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+JOB_FIELDS = (
+    "id", "status", "createdAt", "startedAt", "finishedAt", "expiresAt",
+    "rows", "columns", "truncated", "truncatedBy", "limit", "limitInjected", "error",
+)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def job_status(job):
+    """Field job yang ditampilkan ke client."""
+    return {field: job.get(field) for field in JOB_FIELDS}
+
+
+class JobStore:
+    def __init__(self, directory=QUERY_JOB_DIR):
+        self.directory = directory
+
+    def path(self, job_id, name=""):
+        return os.path.join(self.directory, job_id, name)
+
+    def save(self, job):
+        job["updatedAt"] = time.time()
+        directory = self.path(job["id"])
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, self.path(job["id"], "job.json"))
+        return job
+
+    def load(self, job_id):
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            with open(self.path(job_id, "job.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def abandoned(self, job, now):
+        """True kalau job queued / running tapi worker-nya sudah berhenti."""
+        if job["status"] == RUNNING:
+            return now - job["updatedAt"] > QUERY_JOB_TIMEOUT_SECONDS + 60
+        if job["status"] == QUEUED:
+            return now - job["createdAt"] > QUERY_JOB_MAX_WAIT
+        return False
+
+    def check(self, job):
+        """`job` setelah dicek umurnya: None kalau kedaluwarsa (dan dihapus),
+        ditandai failed kalau worker-nya berhenti sebelum job selesai."""
+        now = time.time()
+        if job["status"] in (QUEUED, RUNNING):
+            if self.abandoned(job, now):
+                return self.finish(job, FAILED, error="Worker berhenti sebelum job selesai.")
+            # job yang masih berjalan tidak kedaluwarsa, seberapa pun lama menunggunya
+            return job
+        if job["expiresAt"] < now:
+            self.delete(job["id"])
+            return None
+        return job
+
+    def get(self, job_id):
+        """Job dengan id `job_id`, atau None kalau tidak ada / sudah kedaluwarsa."""
+        job = self.load(job_id)
+        return self.check(job) if job is not None else None
+
+    def create(self, limited):
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "query": limited.query,
+            "limit": limited.limit,
+            "limitInjected": limited.injected,
+            "createdAt": now,
+            "expiresAt": now + QUERY_JOB_TTL,
+        }
+        os.makedirs(self.path(job["id"]), exist_ok=True)
+        return self.save(job)
+
+    def update(self, job, **fields):
+        job.update(fields)
+        return self.save(job)
+
+    def finish(self, job, status, **fields):
+        now = time.time()
+        return self.update(job, status=status, finishedAt=now, expiresAt=now + QUERY_JOB_TTL, **fields)
+
+    def delete(self, job_id):
+        shutil.rmtree(self.path(job_id), ignore_errors=True)
+
+    def purge_expired(self):
+        """Hapus job yang sudah kedaluwarsa, return jumlahnya."""
+        try:
+            job_ids = os.listdir(self.directory)
+        except OSError:
+            return 0
+
+        purged = 0
+        for job_id in job_ids:
+            job = self.load(job_id)
+            if job is not None and self.check(job) is None:
+                purged += 1
+        return purged
+
+    def spool(self, job, rows, max_rows=QUERY_JOB_MAX_ROWS, max_bytes=QUERY_JOB_MAX_BYTES):
+        """Tulis `rows` (dict per row) ke rows.jsonl. Return field job hasilnya:
+        rows, columns, index, truncated dan truncatedBy."""
+        columns = []
+        positions = {}
+        index = []
+        count = 0
+        size = 0
+        truncated_by = None
+
+        tmp_path = self.path(job["id"], "rows.jsonl.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                for row in rows:
+                    if count >= max_rows:
+                        truncated_by = "rows"
+                        break
+                    for column in row:
+                        if column not in positions:
+                            positions[column] = len(columns)
+                            columns.append(column)
+                    values = [None] * len(columns)
+                    for column, value in row.items():
+                        values[positions[column]] = value
+                    line = (dump_json(values) + "\n").encode("utf-8")
+                    if size + len(line) > max_bytes:
+                        truncated_by = "bytes"
+                        break
+
+                    if count % QUERY_JOB_INDEX_STRIDE == 0:
+                        index.append(size)
+                    f.write(line)
+                    size += len(line)
+                    count += 1
+                    if count % QUERY_JOB_PROGRESS_ROWS == 0:
+                        self.update(job, rows=count)
+        finally:
+            close = getattr(rows, "close", None)
+            if close is not None:
+                close()
+
+        os.replace(tmp_path, self.path(job["id"], "rows.jsonl"))
+        return {
+            "rows": count,
+            "columns": columns,
+            "index": index,
+            "truncated": truncated_by is not None,
+            "truncatedBy": truncated_by,
+        }
+
+    def read_rows(self, job, offset, limit):
+        """Row ke-`offset` sampai `offset + limit` dari hasil job yang sudah selesai."""
+        if offset >= job["rows"]:
+            return []
+
+        checkpoint = offset // QUERY_JOB_INDEX_STRIDE
+        columns = job["columns"]
+        rows = []
+        with open(self.path(job["id"], "rows.jsonl"), "rb") as f:
+            f.seek(job["index"][checkpoint])
+            for _ in range(offset - checkpoint * QUERY_JOB_INDEX_STRIDE):
+                f.readline()
+            for _ in range(limit):
+                line = f.readline()
+                if not line:
+                    break
+                values = json.loads(line)
+                # kolom yang muncul setelah row ini ditulis tidak ada di array-nya
+                rows.append({column: value for column, value in zip(columns, values) if value is not None})
+        return rows
+
+
+store = JobStore()
+
+# client terpisah: read timeout mengikuti timeout job, dan tanpa retry supaya
+# query berat tidak dijalankan ulang kalau GraphDB menjawab 5xx
+job_client = SparqlClient(read_timeout=QUERY_JOB_TIMEOUT_SECONDS + 5, max_retries=0)
+job_pool = ThreadPoolExecutor(max_workers=QUERY_JOB_WORKERS, thread_name_prefix="query-job")
+
+_active_jobs = 0
+_active_lock = threading.Lock()
+
+
+def run_job(job):
+    try:
+        store.update(job, status=RUNNING, startedAt=time.time())
+        result = job_client.query_rows(job["query"], SPARQL_ROWS_FORMAT, QUERY_JOB_TIMEOUT_SECONDS)
+        if "error" in result:
+            store.finish(job, FAILED, error=result["error"])
+            return
+        store.finish(job, DONE, **store.spool(job, result["rows"]))
+    except Exception as e:
+        logger.exception("Job query %s gagal", job["id"])
+        store.finish(job, FAILED, error=str(e) or e.__class__.__name__)
+
+def _release(future):
+    global _active_jobs
+    with _active_lock:
+        _active_jobs -= 1
+
+def submit_job(parsed):
+    """Simpan job baru untuk `parsed` (ParsedQuery yang sudah divalidasi),
+    jalankan di background dan return status awalnya. Raise JobQueueFull
+    kalau antrian penuh."""
+    global _active_jobs
+    with _active_lock:
+        if _active_jobs >= QUERY_JOB_WORKERS + QUERY_JOB_MAX_QUEUED:
+            raise JobQueueFull()
+        _active_jobs += 1
+
+    try:
+        store.purge_expired()
+        limited = limit_query(parsed, default_limit=QUERY_JOB_MAX_ROWS, max_limit=QUERY_JOB_MAX_ROWS)
+        job = store.create(limited)
+        status = job_status(job)
+        job_pool.submit(run_job, job).add_done_callback(_release)
+    except Exception:
+        with _active_lock:
+            _active_jobs -= 1
+        raise
+    return status
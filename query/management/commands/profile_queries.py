@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from query.profile import profile_query
+from search.queries import (
+    all_search_query, anime_by_theme_query, anime_list_query, anime_popularity_query, anime_search_query,
+    character_full_name_query, character_list_query, character_popularity_query, character_search_query,
+    local_studios_query, searchable_values_query, suggest_labels_query,
+)
+
+# query yang dipakai view search, argumennya dari opsi --search / --theme
+QUERIES = {
+    "anime_list": lambda options: anime_list_query(),
+    "anime_by_theme": lambda options: anime_by_theme_query(options["theme"]),
+    "anime_search": lambda options: anime_search_query(options["search"]),
+    "character_list": lambda options: character_list_query(),
+    "character_full_name": lambda options: character_full_name_query(),
+    "character_search": lambda options: character_search_query(options["search"]),
+    "all_search": lambda options: all_search_query(options["search"]),
+    "searchable_values": lambda options: searchable_values_query(),
+    "suggest_labels": lambda options: suggest_labels_query(),
+    "anime_popularity": lambda options: anime_popularity_query(),
+    "character_popularity": lambda options: character_popularity_query(),
+    "local_studios": lambda options: local_studios_query(),
+}
+
+TIMING_COLUMNS = ("explain", "graphdb", "parse", "serialization")
+
+
+class Command(BaseCommand):
+    help = "Tampilkan waktu eksekusi (dan query plan GraphDB) query-query yang dipakai view search."
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help=f"Nama query, default semua: {', '.join(QUERIES)}.")
+        parser.add_argument("--search", default="naruto", help="Kata kunci untuk query search.")
+        parser.add_argument("--theme", default="Action", help="Tema untuk anime_by_theme.")
+        parser.add_argument("--plan", action="store_true", help="Tampilkan juga query plan dari GraphDB.")
+
+    def handle(self, *args, **options):
+        names = options["names"] or list(QUERIES)
+        unknown = [name for name in names if name not in QUERIES]
+        if unknown:
+            raise CommandError(f"Query tidak dikenal: {', '.join(unknown)}")
+
+        self.stdout.write(f"{'query':<22}{'rows':>8}" + "".join(f"{column:>15}" for column in TIMING_COLUMNS))
+        for name in names:
+            profile = profile_query(QUERIES[name](options))
+            if "error" in profile:
+                self.stdout.write(self.style.ERROR(f"{name:<22}{profile['error']}"))
+                continue
+
+            timings = profile["timings"]
+            self.stdout.write(f"{name:<22}{profile['rows']:>8}" + "".join(
+                f"{timings[column]:>13.1f}ms" for column in TIMING_COLUMNS
+            ))
+            if options["plan"]:
+                self.stdout.write(profile["plan"] or f"(plan tidak tersedia: {profile.get('planError')})")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from query.jobs import store
+
+
+class Command(BaseCommand):
+    help = "Hapus job query (/query/jobs/) beserta hasilnya yang sudah melewati QUERY_JOB_TTL."
+
+    def handle(self, *args, **options):
+        purged = store.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"{purged} job kedaluwarsa dihapus."))
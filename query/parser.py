@@ -0,0 +1,268 @@
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+from api.sparql_tokens import UnclosedStringError, tokenize
+
+# Parser SPARQL untuk query dari playground, di atas tokenizer dari
+# api/sparql_tokens.py. Parser ini tidak membangun AST lengkap: cukup struktur
+# tingkat atas (bentuk query, proyeksi, posisi WHERE, solution modifier) yang
+# dibutuhkan untuk validasi, menambahkan LIMIT / FROM explain dan memutuskan
+# query boleh di-cache atau tidak. Isi pola WHERE divalidasi GraphDB.
+#
+# Hasil parse di-cache per teks query (LRU), jadi query yang sama dari
+# playground tidak di-parse ulang.
+
+QUERY_PARSE_CACHE_SIZE = int(os.getenv('QUERY_PARSE_CACHE_SIZE', '1024'))
+
+QUERY_FORMS = ("SELECT", "ASK", "CONSTRUCT", "DESCRIBE")
+UPDATE_KEYWORDS = ("INSERT", "DELETE", "LOAD", "CLEAR", "CREATE", "DROP", "ADD", "MOVE", "COPY", "WITH")
+# hasilnya bisa berbeda setiap kali dijalankan, jangan di-cache
+NON_DETERMINISTIC = ("RAND", "NOW", "UUID", "STRUUID", "BNODE", "SERVICE")
+
+Clause = namedtuple("Clause", ["value", "start", "end"])
+
+ParsedQuery = namedtuple(
+    "ParsedQuery",
+    [
+        "text",
+        "form",        # SELECT / ASK / CONSTRUCT / DESCRIBE
+        "update",      # keyword operasi update kalau query berisi update
+        "error",       # pesan error sintaks
+        "distinct",
+        "variables",   # tuple nama variabel proyeksi, ("*",) untuk SELECT *
+        "body_at",     # posisi WHERE (atau "{" kalau WHERE tidak ditulis)
+        "where",       # (awal, akhir) grup pola WHERE
+        "limit",       # Clause atau None
+        "offset",      # Clause atau None
+        "values_at",   # posisi VALUES di akhir query
+        "cacheable",
+    ],
+    defaults=(None, None, None, False, (), None, None, None, None, None, True),
+)
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+class Parser:
+    def __init__(self, text):
+        self.text = text
+        try:
+            self.tokens = tokenize(text)
+        except UnclosedStringError as e:
+            raise QuerySyntaxError(str(e))
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        if token is not None:
+            self.pos += 1
+        return token
+
+    def keyword(self):
+        token = self.peek()
+        return token.value.upper() if token is not None and token.kind == "word" else None
+
+    def accept(self, *keywords):
+        if self.keyword() in keywords:
+            return self.next()
+        return None
+
+    def expect(self, kind, message):
+        token = self.peek()
+        if token is None or token.kind != kind:
+            raise QuerySyntaxError(message)
+        return self.next()
+
+    def skip_balanced(self, open_kind, close_kind, message):
+        """Lewati grup yang diawali token sekarang sampai penutupnya, return
+        (posisi awal, posisi akhir) di teks."""
+        start = self.next().start
+        depth = 1
+        while depth:
+            token = self.next()
+            if token is None:
+                raise QuerySyntaxError(message)
+            if token.kind == open_kind:
+                depth += 1
+            elif token.kind == close_kind:
+                depth -= 1
+        return start, self.tokens[self.pos - 1].end
+
+    def group(self):
+        return self.skip_balanced("open", "close", "Query tidak valid, kurung kurawal { } tidak seimbang.")
+
+    def parens(self):
+        start = self.pos
+        self.skip_balanced("lparen", "rparen", "Query tidak valid, kurung ( ) tidak seimbang.")
+        return self.tokens[start + 1:self.pos - 1]
+
+    def skip_until(self, *keywords):
+        # ekspresi GROUP BY / HAVING / ORDER BY
+        while self.peek() is not None and self.keyword() not in keywords:
+            token = self.peek()
+            if token.kind == "lparen":
+                self.parens()
+            elif token.kind == "open":
+                self.group()
+            else:
+                self.next()
+
+    def prologue(self):
+        while True:
+            if self.accept("BASE"):
+                self.expect("iri", "Query tidak valid, BASE harus diikuti IRI.")
+            elif self.accept("PREFIX"):
+                self.expect("pname", "Query tidak valid, PREFIX harus diikuti nama prefix.")
+                self.expect("iri", "Query tidak valid, PREFIX harus diikuti IRI.")
+            else:
+                return
+
+    def projection(self):
+        distinct = self.accept("DISTINCT", "REDUCED") is not None
+        token = self.peek()
+        if token is not None and token.value == "*":
+            self.next()
+            return distinct, ("*",)
+
+        variables = []
+        while True:
+            token = self.peek()
+            if token is None or token.kind == "open" or self.keyword() in ("FROM", "WHERE"):
+                break
+            if token.kind == "var":
+                variables.append(self.next().value[1:])
+            elif token.kind == "lparen":
+                # (ekspresi AS ?alias)
+                inner = self.parens()
+                if len(inner) < 2 or inner[-2].value.upper() != "AS" or inner[-1].kind != "var":
+                    raise QuerySyntaxError("Query tidak valid, ekspresi di SELECT harus berbentuk (ekspresi AS ?variabel).")
+                variables.append(inner[-1].value[1:])
+            else:
+                raise QuerySyntaxError(f"Query tidak valid, '{token.value}' tidak boleh ada di bagian SELECT.")
+
+        if not variables:
+            raise QuerySyntaxError("Query tidak valid, SELECT tanpa variabel.")
+        return distinct, tuple(variables)
+
+    def describe_targets(self):
+        variables = []
+        while self.peek() is not None and self.peek().kind in ("var", "iri", "pname", "op"):
+            token = self.next()
+            if token.kind == "var":
+                variables.append(token.value[1:])
+        return tuple(variables)
+
+    def dataset(self):
+        while self.accept("FROM"):
+            self.accept("NAMED")
+            token = self.next()
+            if token is None or token.kind not in ("iri", "pname"):
+                raise QuerySyntaxError("Query tidak valid, FROM harus diikuti IRI.")
+
+    def where(self, required):
+        keyword = self.accept("WHERE")
+        token = self.peek()
+        if token is None or token.kind != "open":
+            if required or keyword is not None:
+                raise QuerySyntaxError("Query tidak valid, bagian WHERE tidak ditemukan.")
+            return None, None
+        body_at = keyword.start if keyword is not None else token.start
+        return body_at, self.group()
+
+    def modifiers(self):
+        if self.accept("GROUP"):
+            if not self.accept("BY"):
+                raise QuerySyntaxError("Query tidak valid, GROUP harus diikuti BY.")
+            self.skip_until("HAVING", "ORDER", "LIMIT", "OFFSET", "VALUES")
+        if self.accept("HAVING"):
+            self.skip_until("ORDER", "LIMIT", "OFFSET", "VALUES")
+        if self.accept("ORDER"):
+            if not self.accept("BY"):
+                raise QuerySyntaxError("Query tidak valid, ORDER harus diikuti BY.")
+            self.skip_until("LIMIT", "OFFSET", "VALUES")
+
+        clauses = {}
+        while self.keyword() in ("LIMIT", "OFFSET") and self.keyword() not in clauses:
+            keyword = self.next().value.upper()
+            token = self.peek()
+            if token is None or token.kind != "number" or not token.value.isdigit():
+                raise QuerySyntaxError(f"Query tidak valid, {keyword} harus diikuti bilangan bulat.")
+            self.next()
+            clauses[keyword] = Clause(int(token.value), token.start, token.end)
+        return clauses.get("LIMIT"), clauses.get("OFFSET")
+
+    def trailing_values(self):
+        token = self.accept("VALUES")
+        if token is None:
+            return None
+        if self.peek() is not None and self.peek().kind == "lparen":
+            self.parens()
+        else:
+            self.expect("var", "Query tidak valid, VALUES harus diikuti variabel.")
+        if self.peek() is None or self.peek().kind != "open":
+            raise QuerySyntaxError("Query tidak valid, VALUES harus diikuti blok { }.")
+        self.group()
+        return token.start
+
+    def parse(self):
+        self.prologue()
+        token = self.peek()
+        if token is None:
+            raise QuerySyntaxError("Query tidak boleh kosong.")
+
+        form = self.keyword()
+        if form in UPDATE_KEYWORDS:
+            return {"update": form}
+        if form not in QUERY_FORMS:
+            raise QuerySyntaxError(
+                f"Query tidak valid, diawali '{token.value}' bukan SELECT, ASK, CONSTRUCT atau DESCRIBE."
+            )
+        self.next()
+
+        distinct, variables = False, ()
+        if form == "SELECT":
+            distinct, variables = self.projection()
+        elif form == "CONSTRUCT" and self.peek() is not None and self.peek().kind == "open":
+            self.group()
+        elif form == "DESCRIBE":
+            variables = self.describe_targets()
+
+        self.dataset()
+        body_at, where = self.where(required=form != "DESCRIBE")
+        limit, offset = self.modifiers()
+        values_at = self.trailing_values()
+
+        rest = self.tokens[self.pos:]
+        if rest:
+            update = next((t.value.upper() for t in rest if t.kind == "word" and t.value.upper() in UPDATE_KEYWORDS), None)
+            if update is not None:
+                return {"update": update}
+            raise QuerySyntaxError(f"Query tidak valid, token tidak terduga '{rest[0].value}' setelah query.")
+
+        return {
+            "form": form,
+            "distinct": distinct,
+            "variables": variables,
+            "body_at": body_at,
+            "where": where,
+            "limit": limit,
+            "offset": offset,
+            "values_at": values_at,
+            "cacheable": not any(t.kind == "word" and t.value.upper() in NON_DETERMINISTIC for t in self.tokens),
+        }
+
+
+@lru_cache(maxsize=QUERY_PARSE_CACHE_SIZE)
+def parse_query(text):
+    """ParsedQuery untuk `text`. Error sintaks tidak di-raise tapi diisi ke
+    field `error`. Hasilnya dipakai bersama, jangan diubah."""
+    try:
+        return ParsedQuery(text, **Parser(text).parse())
+    except QuerySyntaxError as e:
+        return ParsedQuery(text, error=str(e))
@@ -0,0 +1,109 @@
+import time
+
+from api.sparql_client import SPARQL_STREAM_CHUNK_SIZE, client, error_result
+from api.sparql_results import JsonRowsParser
+from api.views import sparql_to_json
+from kagebunshin.common.utils import dump_json
+from query.guard import QUERY_MAX_BYTES
+from query.parser import parse_query
+
+# Query plan dan profil waktu eksekusi query SELECT. GraphDB mengembalikan
+# rencana eksekusi (bukan hasil query) kalau query memakai dataset
+# pseudo-graph EXPLAIN_GRAPH.
+
+EXPLAIN_GRAPH = "http://www.ontotext.com/explain"
+
+
+def elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+def with_explain(query):
+    """`query` dengan FROM EXPLAIN_GRAPH sebelum WHERE, atau None kalau WHERE
+    tidak ditemukan."""
+    position = parse_query(query).body_at
+    if position is None:
+        return None
+    return f"{query[:position]}FROM <{EXPLAIN_GRAPH}>\n{query[position:]}"
+
+def fetch_plan(query, timeout=None):
+    """(plan, error) dari explain GraphDB untuk `query`."""
+    explained = with_explain(query)
+    if explained is None:
+        return None, "Bagian WHERE tidak ditemukan."
+
+    try:
+        result = client.post(explained, timeout=timeout).json()
+    except Exception as e:
+        return None, error_result(e)["error"]
+
+    rows = sparql_to_json(result)
+    if not rows:
+        return None, "GraphDB tidak mengembalikan query plan."
+    # plan ada di satu-satunya binding pada row pertama
+    return next(iter(rows[0].values()), None), None
+
+def read_body(response, max_bytes):
+    """(list chunk, terpotong?) dari body response, paling banyak `max_bytes` byte."""
+    chunks = []
+    size = 0
+    try:
+        for chunk in response.iter_content(SPARQL_STREAM_CHUNK_SIZE):
+            if size + len(chunk) > max_bytes:
+                chunks.append(chunk[:max_bytes - size])
+                return chunks, True
+            chunks.append(chunk)
+            size += len(chunk)
+    finally:
+        response.close()
+    return chunks, False
+
+def profile_query(query, execute=True, timeout=None, max_bytes=QUERY_MAX_BYTES):
+    """Query plan GraphDB plus waktu tiap tahap (milidetik):
+
+    - explain: mengambil query plan
+    - graphdb: request query sampai body terbaca (paling banyak `max_bytes`)
+    - parse: decode JSON hasil dan meratakan row
+    - serialization: encode row menjadi JSON seperti di response
+
+    Body yang lebih besar dari `max_bytes` tidak dibaca sisanya; row yang
+    sudah lengkap tetap di-parse dan hasilnya diberi "truncated". Dengan
+    `execute=False` hanya plan yang diambil. Kalau query gagal dijalankan,
+    hasilnya berisi "error".
+    """
+    profile = {"plan": None, "timings": {}}
+    timings = profile["timings"]
+
+    start = time.perf_counter()
+    profile["plan"], plan_error = fetch_plan(query, timeout)
+    timings["explain"] = elapsed_ms(start)
+    if plan_error:
+        profile["planError"] = plan_error
+
+    if not execute:
+        return profile
+
+    start = time.perf_counter()
+    try:
+        chunks, truncated = read_body(client.post(query, timeout=timeout, stream=True), max_bytes)
+    except Exception as e:
+        profile["error"] = error_result(e)["error"]
+        return profile
+    timings["graphdb"] = elapsed_ms(start)
+
+    start = time.perf_counter()
+    parser = JsonRowsParser()
+    rows = []
+    for chunk in chunks:
+        rows.extend(parser.feed(chunk))
+    if not truncated:
+        rows.extend(parser.close())
+    timings["parse"] = elapsed_ms(start)
+
+    start = time.perf_counter()
+    serialized = dump_json(rows).encode("utf-8")
+    timings["serialization"] = elapsed_ms(start)
+
+    profile["rows"] = len(rows)
+    profile["truncated"] = truncated
+    profile["bytes"] = {"graphdb": sum(len(chunk) for chunk in chunks), "response": len(serialized)}
+    return profile
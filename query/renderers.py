@@ -0,0 +1,36 @@
+from rest_framework.renderers import BaseRenderer
+
+from kagebunshin.common.utils import dump_json
+
+# Format export /query/execute/ yang bisa dipilih lewat header Accept atau
+# ?format=. Hasil query dikirim view sebagai StreamingHttpResponse, renderer di
+# sini hanya dipakai DRF untuk negosiasi dan untuk response error, yang tetap
+# berupa envelope JSON.
+
+
+class ExportRenderer(BaseRenderer):
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if response is not None:
+            response["Content-Type"] = "application/json"
+        return dump_json(data).encode("utf-8")
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class TSVRenderer(ExportRenderer):
+    media_type = "text/tab-separated-values"
+    format = "tsv"
+
+
+EXPORT_RENDERERS = (NDJSONRenderer, CSVRenderer, TSVRenderer)
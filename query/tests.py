@@ -1,3 +1,311 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from kagebunshin.common.utils import STREAM_ERROR_MESSAGE, iter_envelope, iter_ndjson
+
+from query import jobs
+from query.guard import RawResultGuard, ResultGuard, limit_query
+from query.parser import parse_query
+from query.profile import read_body
+
+
+class LimitQueryTests(SimpleTestCase):
+    def test_injected_limit_has_probe_row(self):
+        limited = limit_query(parse_query("SELECT * WHERE { ?s ?p ?o }"), default_limit=10, max_limit=100)
+        self.assertEqual(limited.limit, 10)
+        self.assertTrue(limited.injected)
+        self.assertEqual(parse_query(limited.query).limit.value, 11)
+
+    def test_clamped_limit_has_probe_row(self):
+        limited = limit_query(parse_query("SELECT * WHERE { ?s ?p ?o } LIMIT 500"), default_limit=10, max_limit=100)
+        self.assertEqual(limited.limit, 100)
+        self.assertTrue(limited.clamped)
+        self.assertEqual(parse_query(limited.query).limit.value, 101)
+
+    def test_user_limit_kept(self):
+        query = "SELECT * WHERE { ?s ?p ?o } LIMIT 50"
+        limited = limit_query(parse_query(query), default_limit=10, max_limit=100)
+        self.assertEqual((limited.query, limited.limit, limited.injected, limited.clamped), (query, 50, False, False))
+
+    def test_without_probe_row(self):
+        limited = limit_query(parse_query("SELECT * WHERE { ?s ?p ?o }"), default_limit=10, probe_row=False)
+        self.assertEqual(parse_query(limited.query).limit.value, 10)
+
+
+class ResultGuardTests(SimpleTestCase):
+    def test_probe_row_marks_truncated(self):
+        limited = limit_query(parse_query("SELECT * WHERE { ?s ?p ?o }"), default_limit=3, max_limit=100)
+        # GraphDB menjawab LIMIT 4, guard hanya meneruskan 3
+        guard = ResultGuard(iter([{"s": str(i)} for i in range(4)]), max_rows=limited.limit)
+        self.assertEqual(len(list(guard)), 3)
+        execution = guard.meta(limited)["execution"]
+        self.assertTrue(execution["truncated"])
+        self.assertEqual(execution["truncatedBy"], "rows")
+
+    def test_complete_result_not_truncated(self):
+        limited = limit_query(parse_query("SELECT * WHERE { ?s ?p ?o }"), default_limit=3, max_limit=100)
+        guard = ResultGuard(iter([{"s": "a"}, {"s": "b"}, {"s": "c"}]), max_rows=limited.limit)
+        self.assertEqual(len(list(guard)), 3)
+        self.assertFalse(guard.meta(limited)["execution"]["truncated"])
+
+    def test_byte_cap(self):
+        guard = ResultGuard(iter([{"s": "x" * 10}] * 5), max_rows=100, max_bytes=40)
+        self.assertEqual(len(list(guard)), 2)
+        self.assertEqual(guard.truncated_by, "bytes")
+
+    def test_source_closed(self):
+        closed = []
+
+        def rows():
+            try:
+                yield from ({"s": str(i)} for i in range(10))
+            finally:
+                closed.append(True)
+
+        list(ResultGuard(rows(), max_rows=2))
+        self.assertEqual(closed, [True])
+
+
+def split_bytes(body, size):
+    return iter([body[i:i + size] for i in range(0, len(body), size)])
+
+
+class RawResultGuardTests(SimpleTestCase):
+    CSV = b'name,desc\r\na,"baris\r\nkedua"\r\nb,"kutip ""x"""\r\nc,z\r\n'
+
+    def test_complete_body_passed_through(self):
+        guard = RawResultGuard(split_bytes(self.CSV, 5), max_rows=3, quoted=True)
+        self.assertEqual(b"".join(guard), self.CSV)
+        self.assertEqual(guard.count, 3)
+        self.assertIsNone(guard.truncated_by)
+
+    def test_row_cap_cuts_at_record_boundary(self):
+        # newline di dalam field yang dikutip bukan akhir record
+        guard = RawResultGuard(split_bytes(self.CSV, 4), max_rows=2, quoted=True)
+        self.assertEqual(b"".join(guard), b'name,desc\r\na,"baris\r\nkedua"\r\nb,"kutip ""x"""\r\n')
+        self.assertEqual(guard.truncated_by, "rows")
+
+    def test_probe_row_without_trailing_newline(self):
+        guard = RawResultGuard(split_bytes(b"s\na\nb", 3), max_rows=1)
+        self.assertEqual(b"".join(guard), b"s\na\n")
+        self.assertEqual(guard.truncated_by, "rows")
+
+    def test_byte_cap(self):
+        body = b"s\n" + b"xxxx\n" * 5
+        guard = RawResultGuard(split_bytes(body, 4), max_rows=100, max_bytes=14)
+        self.assertEqual(b"".join(guard), b"s\nxxxx\nxxxx\n")
+        self.assertEqual(guard.truncated_by, "bytes")
+
+    def test_source_closed(self):
+        closed = []
+
+        def chunks():
+            try:
+                yield from (b"s\n", b"a\n", b"b\n", b"c\n")
+            finally:
+                closed.append(True)
+
+        list(RawResultGuard(chunks(), max_rows=1))
+        self.assertEqual(closed, [True])
+
+
+
+def failing_rows(count):
+    yield from ({"s": str(i)} for i in range(count))
+    raise TimeoutError("GraphDB read timeout")
+
+
+class StreamErrorTests(SimpleTestCase):
+    def test_envelope_closed_with_error(self):
+        limited = limit_query(parse_query("SELECT * WHERE { ?s ?p ?o }"), default_limit=10, max_limit=100)
+        guard = ResultGuard(failing_rows(3), max_rows=limited.limit)
+        with self.assertLogs("kagebunshin.common.utils", level="ERROR"):
+            body = json.loads(b"".join(iter_envelope(200, "ok", guard, lambda: guard.meta(limited))))
+        self.assertEqual(len(body["data"]), 3)
+        self.assertEqual(body["meta"]["error"], STREAM_ERROR_MESSAGE)
+        self.assertEqual(body["meta"]["execution"]["rows"], 3)
+
+    def test_ndjson_ends_with_error_line(self):
+        with self.assertLogs("kagebunshin.common.utils", level="ERROR"):
+            lines = b"".join(iter_ndjson(failing_rows(2))).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[-1]), {"meta": {"error": STREAM_ERROR_MESSAGE}})
+
+class FakeResponse:
+    def __init__(self, body, chunk_size=7):
+        self.chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+        self.read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=None):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class ReadBodyTests(SimpleTestCase):
+    def test_body_under_cap(self):
+        response = FakeResponse(b"x" * 20)
+        chunks, truncated = read_body(response, max_bytes=20)
+        self.assertEqual((b"".join(chunks), truncated, response.closed), (b"x" * 20, False, True))
+
+    def test_body_over_cap_stops_reading(self):
+        response = FakeResponse(b"x" * 100)
+        chunks, truncated = read_body(response, max_bytes=20)
+        self.assertEqual(len(b"".join(chunks)), 20)
+        self.assertTrue(truncated)
+        self.assertTrue(response.closed)
+        self.assertLess(response.read, len(response.chunks))
+
+
+class ParseQueryTests(SimpleTestCase):
+    def assertLimited(self, query, limit, offset=None):
+        """LIMIT hasil limit_query ditemukan lagi oleh parser di posisi yang benar."""
+        parsed = parse_query(limit_query(parse_query(query), default_limit=100, max_limit=1000).query)
+        self.assertIsNone(parsed.error)
+        self.assertEqual(parsed.limit.value, limit)
+        self.assertEqual(parsed.offset.value if parsed.offset else None, offset)
+        return parsed
+
+    def test_keywords_in_strings_and_comments(self):
+        parsed = parse_query('SELECT ?s WHERE { ?s ?p "DELETE LIMIT 5" } # INSERT LIMIT 3')
+        self.assertEqual((parsed.form, parsed.update, parsed.error, parsed.limit), ("SELECT", None, None, None))
+        self.assertLimited('SELECT ?s WHERE { ?s ?p "DELETE LIMIT 5" } # INSERT LIMIT 3', 101)
+
+        parsed = parse_query("SELECT * WHERE { ?s ?p '''baris\nLIMIT 9''' }")
+        self.assertIsNone(parsed.limit)
+
+    def test_keyword_like_prefixed_name(self):
+        parsed = parse_query("PREFIX ex: <http://x/> SELECT * WHERE { ?s ex:limit ?o ; ex:delete ?d }")
+        self.assertEqual((parsed.form, parsed.update, parsed.limit), ("SELECT", None, None))
+
+    def test_chained_update(self):
+        self.assertEqual(parse_query("SELECT * WHERE { ?s ?p ?o } ; DELETE WHERE { ?s ?p ?o }").update, "DELETE")
+        self.assertEqual(parse_query("SELECT * WHERE { ?s ?p ?o } ;\nINSERT DATA { <a> <b> <c> }").update, "INSERT")
+        self.assertEqual(parse_query("PREFIX ex: <http://x/>\nDROP ALL").update, "DROP")
+
+    def test_subquery_limit_is_not_top_level(self):
+        query = "SELECT * WHERE { { SELECT ?s WHERE { ?s ?p ?o } LIMIT 5 } }"
+        self.assertIsNone(parse_query(query).limit)
+        self.assertLimited(query, 101)
+
+    def test_offset_without_limit(self):
+        parsed = parse_query("SELECT * WHERE { ?s ?p ?o } OFFSET 10")
+        self.assertIsNone(parsed.limit)
+        self.assertEqual(parsed.offset.value, 10)
+        self.assertLimited("SELECT * WHERE { ?s ?p ?o } OFFSET 10", 101, offset=10)
+
+    def test_offset_before_limit(self):
+        parsed = self.assertLimited("SELECT * WHERE { ?s ?p ?o } OFFSET 3 LIMIT 4", 4, offset=3)
+        self.assertEqual(parsed.text, "SELECT * WHERE { ?s ?p ?o } OFFSET 3 LIMIT 4")
+
+    def test_trailing_values_with_limit_injection(self):
+        query = "SELECT ?s WHERE { ?s ?p ?o } VALUES ?s { <http://a> <http://b> }"
+        self.assertEqual(parse_query(query).values_at, query.index("VALUES"))
+        parsed = self.assertLimited(query, 101)
+        self.assertGreater(parsed.values_at, parsed.limit.end)
+
+    def test_group_by_having_order_by(self):
+        query = (
+            "SELECT ?s (COUNT(?o) AS ?n) WHERE { ?s ?p ?o } GROUP BY ?s "
+            "HAVING (COUNT(?o) > 2) ORDER BY DESC(?n) LIMIT 7 OFFSET 2"
+        )
+        parsed = parse_query(query)
+        self.assertEqual(parsed.variables, ("s", "n"))
+        self.assertEqual((parsed.limit.value, parsed.offset.value), (7, 2))
+        self.assertEqual(query[parsed.limit.start:parsed.limit.end], "7")
+
+        parsed = parse_query("SELECT ?s WHERE { ?s ?p ?o } ORDER BY ?s")
+        self.assertIsNone(parsed.error)
+        self.assertLimited("SELECT ?s WHERE { ?s ?p ?o } ORDER BY ?s", 101)
+
+        self.assertIsNotNone(parse_query("SELECT ?s WHERE { ?s ?p ?o } GROUP ?s").error)
+
+    def test_clamped_limit(self):
+        self.assertLimited("SELECT * WHERE { ?s ?p ?o } LIMIT 99999", 1001)
+
+    def test_syntax_errors(self):
+        for query in (
+            'SELECT * WHERE { ?s ?p "x }',
+            "SELECT * WHERE { ?s ?p ?o",
+            "SELECT * WHERE { ?s ?p ?o } LIMIT 5 LIMIT 6",
+            "SELECT * WHERE { ?s ?p ?o } LIMIT ten",
+            "SELECT WHERE { ?s ?p ?o }",
+            "",
+        ):
+            self.assertIsNotNone(parse_query(query).error, query)
+
+    def test_forms_and_cacheable(self):
+        self.assertEqual(parse_query("ASK { ?s ?p ?o }").form, "ASK")
+        self.assertEqual(parse_query("DESCRIBE <http://a>").form, "DESCRIBE")
+        self.assertFalse(parse_query("SELECT (RAND() AS ?r) WHERE {}").cacheable)
+        self.assertTrue(parse_query("SELECT * WHERE { ?s ?p 'rand()' }").cacheable)
+
+
+class JobStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.store = jobs.JobStore(directory)
+        self.limited = limit_query(parse_query("SELECT * WHERE { ?s ?p ?o }"))
+
+    def age(self, job, seconds, **fields):
+        """Tulis ulang job.json seolah-olah job dibuat `seconds` detik lalu."""
+        job = dict(job, **fields)
+        for field in ("createdAt", "updatedAt", "startedAt", "finishedAt", "expiresAt"):
+            if job.get(field) is not None:
+                job[field] -= seconds
+        with open(self.store.path(job["id"], "job.json"), "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        return job
+
+    @mock.patch.object(jobs, "QUERY_JOB_MAX_WAIT", jobs.QUERY_JOB_TTL * 2)
+    def test_active_jobs_not_purged_after_ttl(self):
+        queued = self.age(self.store.create(self.limited), jobs.QUERY_JOB_TTL + 10)
+        running = self.age(self.store.create(self.limited), jobs.QUERY_JOB_TTL + 10, status=jobs.RUNNING)
+        # masih ada progress baru-baru ini
+        self.store.update(running)
+
+        self.assertEqual(self.store.purge_expired(), 0)
+        self.assertEqual(self.store.get(queued["id"])["status"], jobs.QUEUED)
+        self.assertEqual(self.store.get(running["id"])["status"], jobs.RUNNING)
+
+    def test_finished_job_purged_after_ttl(self):
+        job = self.store.finish(self.store.create(self.limited), jobs.DONE, rows=0)
+        self.age(job, jobs.QUERY_JOB_TTL + 10)
+        self.assertEqual(self.store.purge_expired(), 1)
+        self.assertIsNone(self.store.get(job["id"]))
+
+    def test_abandoned_jobs_marked_failed(self):
+        running = self.age(self.store.create(self.limited), jobs.QUERY_JOB_TIMEOUT_SECONDS + 120, status=jobs.RUNNING)
+        queued = self.age(self.store.create(self.limited), jobs.QUERY_JOB_MAX_WAIT + 10)
+        for job in (running, queued):
+            job = self.store.get(job["id"])
+            self.assertEqual(job["status"], jobs.FAILED)
+            self.assertGreater(job["expiresAt"], time.time())
+
+    def test_first_status_write_failure_recorded(self):
+        job = self.store.create(self.limited)
+        original_update = self.store.update
+
+        def update(job, **fields):
+            if fields.get("status") == jobs.RUNNING:
+                raise OSError("disk penuh")
+            return original_update(job, **fields)
+
+        with mock.patch.object(jobs, "store", self.store), \
+                mock.patch.object(self.store, "update", side_effect=update), \
+                self.assertLogs("query.jobs", "ERROR"):
+            jobs.run_job(job)
+
+        job = self.store.get(job["id"])
+        self.assertEqual(job["status"], jobs.FAILED)
+        self.assertEqual(job["error"], "disk penuh")
@@ -1,8 +1,12 @@
 from django.urls import path
-from query.views import execute_query
+from query.views import execute_query, explain_query, submit_query_job, query_job, query_job_results
 
 
 app_name = 'query'
 urlpatterns = [
     path('execute/', execute_query, name='execute_query'),
+    path('explain/', explain_query, name='explain_query'),
+    path('jobs/', submit_query_job, name='submit_query_job'),
+    path('jobs/<str:job_id>/', query_job, name='query_job'),
+    path('jobs/<str:job_id>/results/', query_job_results, name='query_job_results'),
 ]
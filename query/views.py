@@ -1,112 +1,218 @@
-from rest_framework.decorators import api_view
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework import status
-from kagebunshin.common.utils import api_response
-from api.sparql_client import run_sparql
+from kagebunshin.common.utils import api_response, dump_json, iter_ndjson, stream_api_response, STREAM_RESPONSES
+from api.sparql_client import run_sparql, stream_sparql, stream_sparql_raw
 from api.views import sparql_to_json
+from kagebunshin.common.pagination import PAGE_DEFAULT_LIMIT, Page, PaginationError, parse_pagination
+from query.guard import QUERY_MAX_ROWS, QUERY_TIMEOUT_SECONDS, RawResultGuard, ResultGuard, limit_query
+from query.jobs import DONE, FAILED, JobQueueFull, job_status, store as job_store, submit_job
+from query.parser import parse_query
+from query.profile import elapsed_ms, profile_query
+from query.renderers import EXPORT_RENDERERS
 
-import re
-
-FORBIDDEN_PATTERNS = [
-    r'^\s*INSERT\b',
-    r'^\s*DELETE\b',
-    r'^\s*UPDATE\b',
-    r'^\s*LOAD\b',
-    r'^\s*CREATE\b',
-    r'^\s*DROP\b',
-    r'^\s*CLEAR\b',
-    r'^\s*ADD\b',
-    r'^\s*MOVE\b',
-    r'^\s*COPY\b',
-    r'^\s*ALTER\b',
-]
-
-def find_forbidden_keyword(query: str):
-    lines = query.splitlines()
-    for line in lines:
-        for pattern in FORBIDDEN_PATTERNS:
-            if re.match(pattern, line, flags=re.IGNORECASE):
-                # ambil keyword dari pattern
-                keyword = pattern.strip(r'^\s*\b').split('\\b')[0].strip()
-                return keyword.upper()
-    return None
-
-def normalize_query(query: str) -> str:
-    return "\n".join(line.rstrip() for line in query.strip().splitlines())
-
-def is_select_query(query: str):
-    text = query.strip().upper()
-
-    # SELECT harus muncul
-    if "SELECT" not in text:
-        return False
-    
-    # SELECT harus muncul sebelum WHERE
-    select_pos = text.find("SELECT")
-    where_pos = text.find("WHERE")
-
-    # kalau WHERE tidak ada, dihandle validate_query
-    if where_pos != -1 and select_pos > where_pos:
-        return False
-
-    return True
+import os
+import time
 
+# TTL cache hasil query dari playground (detik), 0 berarti tidak di-cache
+CACHE_TTL_QUERY = int(os.getenv('CACHE_TTL_QUERY', '60'))
 
 def validate_query(query: str):
+    """Pesan error kalau query bukan SELECT yang valid, atau None."""
     if not query or not isinstance(query, str):
         return "Query tidak boleh kosong."
 
-    normalized = normalize_query(query)
-    upper_q = normalized.upper()
+    parsed = parse_query(query)
+    if parsed.update:
+        return f"Query mengandung operasi yang dilarang yaitu {parsed.update}"
 
-    forbidden = find_forbidden_keyword(normalized)
-    if forbidden:
-        return f"Query mengandung operasi yang dilarang yaitu {forbidden}"
+    if parsed.error:
+        return parsed.error
 
-    if not is_select_query(normalized):
+    if parsed.form != "SELECT":
         return "Hanya query SELECT yang diperbolehkan."
 
-    if "WHERE" not in upper_q:
-        return "Query tidak valid, bagian WHERE tidak ditemukan."
+    return None
 
-    if "{" not in upper_q or "}" not in upper_q:
-        return "Query harus mengandung kurung {}."
+def graphdb_error_response(raw_error):
+    lower = raw_error.lower()
 
-    return None
+    # dihentikan GraphDB karena melewati QUERY_TIMEOUT_SECONDS
+    if "took too long" in lower or "interrupted" in lower:
+        return api_response(
+            status.HTTP_400_BAD_REQUEST,
+            f"Query melebihi batas waktu {QUERY_TIMEOUT_SECONDS} detik. Persempit pola query atau tambahkan LIMIT.",
+            {}
+        )
 
-@api_view(['POST'])
-def execute_query(request):
+    # graphdb mati
+    if ("connection refused" in lower 
+        or "failed to establish" in lower
+        or "max retries exceeded" in lower
+        or "timed out" in lower):
+        return api_response(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "Database tidak merespon. Silahkan coba lagi nanti.",
+            {}
+        )
+
+    # error lain (query salah, malformed, dll)
+    return api_response(
+        status.HTTP_400_BAD_REQUEST,
+        f"Query gagal dijalankan: {raw_error}",
+        {}
+    )
+
+def checked_query(request):
+    """(ParsedQuery, None) kalau query di body request valid, atau (None, response 400)."""
     query = request.data.get("query")
 
     if not query:
-        return api_response(status.HTTP_400_BAD_REQUEST, "Query SPARQL tidak boleh kosong", {})
+        return None, api_response(status.HTTP_400_BAD_REQUEST, "Query SPARQL tidak boleh kosong", {})
 
     error = validate_query(query)
     if error:
-        return api_response(status.HTTP_400_BAD_REQUEST, error, {})
+        return None, api_response(status.HTTP_400_BAD_REQUEST, error, {})
+    return parse_query(query), None
+
+def query_cache_ttl(parsed):
+    # query dengan RAND(), NOW(), SERVICE dll hasilnya bisa berubah, jangan di-cache
+    return CACHE_TTL_QUERY if parsed.cacheable else 0
+
+def iter_ndjson_export(guard, limited):
+    yield from iter_ndjson(guard)
+    # header response sudah terkirim, jadi tanda terpotong ada di baris terakhir
+    if guard.truncated_by is not None:
+        yield (dump_json({"meta": guard.meta(limited)}) + "\n").encode()
+
+def export_response(parsed, export_format):
+    """Hasil query tanpa envelope dalam format ndjson, csv atau tsv. Tanpa LIMIT
+    dari user, export dibatasi QUERY_MAX_ROWS row; batas byte sama dengan
+    /query/execute/.
+
+    ndjson yang terpotong diakhiri baris {"meta": ...}. csv / tsv tidak punya
+    tempat untuk metadata, jadi hanya berisi row: query-nya tanpa probe row
+    (LIMIT yang ditambahkan / diturunkan terlihat dari header X-Query-Limit*),
+    dan export yang terpotong karena QUERY_MAX_BYTES tidak diberi tanda."""
+    if export_format == "ndjson":
+        limited = limit_query(parsed, default_limit=QUERY_MAX_ROWS)
+        result = stream_sparql(limited.query, cache_ttl=query_cache_ttl(parsed), timeout=QUERY_TIMEOUT_SECONDS)
+        if "error" in result:
+            return graphdb_error_response(result.get("error") or "")
+        guard = ResultGuard(result["rows"], max_rows=limited.limit)
+        content, content_type = iter_ndjson_export(guard, limited), "application/x-ndjson"
+    else:
+        # csv / tsv dari GraphDB diteruskan apa adanya, tanpa dibuat jadi row
+        limited = limit_query(parsed, default_limit=QUERY_MAX_ROWS, probe_row=False)
+        result = stream_sparql_raw(limited.query, export_format, timeout=QUERY_TIMEOUT_SECONDS)
+        if "error" in result:
+            return graphdb_error_response(result.get("error") or "")
+        content = RawResultGuard(result["chunks"], max_rows=limited.limit, quoted=export_format == "csv")
+        content_type = result["content_type"]
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="query.{export_format}"'
+    response["X-Query-Limit"] = str(limited.limit)
+    response["X-Query-Limit-Injected"] = "true" if limited.injected else "false"
+    response["X-Query-Limit-Clamped"] = "true" if limited.clamped else "false"
+    return response
 
-    result = run_sparql(query)
+@api_view(['POST'])
+@renderer_classes([JSONRenderer, BrowsableAPIRenderer, *EXPORT_RENDERERS])
+def execute_query(request):
+    """Jalankan query SELECT. Hasilnya envelope JSON, atau ndjson / csv / tsv
+    kalau diminta lewat header Accept atau ?format=."""
+    parsed, error_response = checked_query(request)
+    if error_response:
+        return error_response
+
+    export_format = request.accepted_renderer.format
+    if export_format in ("ndjson", "csv", "tsv"):
+        return export_response(parsed, export_format)
+
+    limited = limit_query(parsed)
+    cache_ttl = query_cache_ttl(parsed)
+    if STREAM_RESPONSES:
+        result = stream_sparql(limited.query, cache_ttl=cache_ttl, timeout=QUERY_TIMEOUT_SECONDS)
+    else:
+        result = run_sparql(limited.query, cache_ttl=cache_ttl, timeout=QUERY_TIMEOUT_SECONDS)
 
     if "error" in result:
-        raw_error = result.get("error") or ""
-        lower = raw_error.lower()
-
-        # graphdb mati
-        if ("connection refused" in lower 
-            or "failed to establish" in lower
-            or "max retries exceeded" in lower
-            or "timed out" in lower):
-            return api_response(
-                status.HTTP_503_SERVICE_UNAVAILABLE,
-                "Database tidak merespon. Silahkan coba lagi nanti.",
-                {}
-            )
-
-        # error lain (query salah, malformed, dll)
-        return api_response(
-            status.HTTP_400_BAD_REQUEST,
-            f"Query gagal dijalankan: {raw_error}",
-            {}
-        )
-    
-    simplified = sparql_to_json(result)
-    return api_response(status.HTTP_200_OK, "Query berhasil dijalankan", simplified)
+        return graphdb_error_response(result.get("error") or "")
+
+    if STREAM_RESPONSES:
+        guard = ResultGuard(result["rows"], max_rows=limited.limit)
+        return stream_api_response(status.HTTP_200_OK, "Query berhasil dijalankan", guard, lambda: guard.meta(limited))
+
+    guard = ResultGuard(sparql_to_json(result), max_rows=limited.limit)
+    simplified = list(guard)
+    return api_response(status.HTTP_200_OK, "Query berhasil dijalankan", simplified, guard.meta(limited))
+
+@api_view(['POST'])
+def explain_query(request):
+    """Query plan GraphDB dan waktu tiap tahap eksekusi untuk query playground.
+    Body: {"query": ..., "execute": true}; execute false hanya mengambil plan."""
+    start = time.perf_counter()
+    parsed, error_response = checked_query(request)
+    if error_response:
+        return error_response
+    limited = limit_query(parsed)
+    validation_ms = elapsed_ms(start)
+
+    execute = request.data.get("execute", True)
+    if isinstance(execute, str):
+        execute = execute.lower() not in ("false", "0", "no")
+
+    profile = profile_query(limited.query, execute=bool(execute), timeout=QUERY_TIMEOUT_SECONDS)
+    if "error" in profile:
+        return graphdb_error_response(profile["error"])
+
+    timings = {"validation": validation_ms, **profile.pop("timings")}
+    timings["total"] = elapsed_ms(start)
+    return api_response(status.HTTP_200_OK, "Query plan berhasil diambil", {
+        "query": limited.query,
+        **profile,
+        "timings": timings,
+    })
+
+@api_view(['POST'])
+def submit_query_job(request):
+    """Jalankan query di background untuk query yang terlalu lama untuk
+    /query/execute/. Status dipantau lewat /query/jobs/<id>/."""
+    parsed, error_response = checked_query(request)
+    if error_response:
+        return error_response
+
+    try:
+        job = submit_job(parsed)
+    except JobQueueFull:
+        return api_response(status.HTTP_503_SERVICE_UNAVAILABLE, "Antrian job query penuh. Silahkan coba lagi nanti.", {})
+    return api_response(status.HTTP_202_ACCEPTED, "Job query diterima", job)
+
+@api_view(['GET'])
+def query_job(request, job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return api_response(status.HTTP_404_NOT_FOUND, "Job tidak ditemukan atau sudah kedaluwarsa", {})
+    return api_response(status.HTTP_200_OK, "Berhasil ambil status job", job_status(job))
+
+@api_view(['GET'])
+def query_job_results(request, job_id):
+    try:
+        page = parse_pagination(request.GET) or Page(PAGE_DEFAULT_LIMIT)
+    except PaginationError as e:
+        return api_response(status.HTTP_400_BAD_REQUEST, str(e), None)
+
+    job = job_store.get(job_id)
+    if job is None:
+        return api_response(status.HTTP_404_NOT_FOUND, "Job tidak ditemukan atau sudah kedaluwarsa", {})
+    if job["status"] == FAILED:
+        return graphdb_error_response(job.get("error") or "")
+    if job["status"] != DONE:
+        return api_response(status.HTTP_409_CONFLICT, "Job belum selesai", job_status(job))
+
+    rows = job_store.read_rows(job, page.offset, page.limit)
+    meta = page.meta(len(rows), total=job["rows"])
+    meta["execution"] = {"truncated": job["truncated"], "truncatedBy": job["truncatedBy"]}
+    return api_response(status.HTTP_200_OK, "Berhasil ambil hasil job", rows, meta)
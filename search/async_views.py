@@ -0,0 +1,223 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.http import require_GET
+from rest_framework import status
+
+from api.sparql_client import arun_sparql, arun_sparql_many
+from kagebunshin.common.pagination import parse_pagination, PaginationError
+from kagebunshin.common.utils import json_api_response
+from search.catalog import catalog, get_catalog
+from search.fulltext import get_search_index
+from search.suggest import get_suggest_index, parse_suggest_params, SuggestParamError
+from search.versioning import conditional_on_dataset
+from search.studio import WikidataError, acached_studio, afetch_studio
+from search.queries import (
+    anime_list_query, anime_by_theme_query, character_list_query,
+    anime_search_query, character_search_query, all_search_query,
+    studio_local_anime_query,
+)
+from search.views import (
+    format_anime_rows, format_character_rows, page_rows, top_k_page,
+    ParamError, required_param, ok, bad_request, list_query, list_result,
+    tolerant_search_result, search_result, query_all_limit, query_all_result,
+    parse_pk, parse_pks, PkListError, ANIME_INFOBOX, CHARACTER_INFOBOX,
+    infobox_queries, infobox_result, infobox_batch_result,
+    parse_studio_name, studio_result, wikidata_error, format_local_anime,
+    CACHE_TTL_LIST, CACHE_TTL_SEARCH, CACHE_TTL_INFOBOX,
+)
+
+# Versi async dari endpoint di search/views.py untuk deploy lewat ASGI
+# (kagebunshin/asgi.py). Parsing parameter dan isi response memakai helper
+# yang sama dengan versi sync, bedanya request ke GraphDB/Wikidata tidak
+# mem-block worker. Snapshot katalog tidak pernah di-load sinkron di sini,
+# selama belum siap pakai query SPARQL. Akses snapshot holder (cache bersama)
+# tetap blocking, jadi lewat sync_to_async.
+
+aget_catalog = sync_to_async(get_catalog)
+aget_search_index = sync_to_async(get_search_index)
+aget_suggest_index = sync_to_async(get_suggest_index)
+
+@conditional_on_dataset(catalog)
+@require_GET
+async def get_anime(request):
+    try:
+        page = parse_pagination(request.GET)
+    except PaginationError as e:
+        return json_api_response(*bad_request(e))
+
+    snapshot = await aget_catalog(block=False)
+    if snapshot is not None:
+        return json_api_response(*ok(*page_rows(snapshot.anime_payload, page)))
+
+    result = await arun_sparql(list_query(anime_list_query(), page, "?anime"), cache_ttl=CACHE_TTL_LIST)
+    return json_api_response(*list_result(result, page, format_anime_rows))
+
+@conditional_on_dataset(catalog)
+@require_GET
+async def get_anime_by_theme(request):
+    try:
+        theme = required_param(request.GET, "theme")
+        page = parse_pagination(request.GET)
+    except (ParamError, PaginationError) as e:
+        return json_api_response(*bad_request(e))
+
+    snapshot = await aget_catalog(block=False)
+    if snapshot is not None:
+        return json_api_response(*ok(*page_rows(snapshot.anime_by_theme(theme), page)))
+
+    result = await arun_sparql(list_query(anime_by_theme_query(theme), page, "?anime"), cache_ttl=CACHE_TTL_LIST)
+    return json_api_response(*list_result(result, page, format_anime_rows))
+
+@conditional_on_dataset(catalog)
+@require_GET
+async def get_character(request):
+    try:
+        page = parse_pagination(request.GET)
+    except PaginationError as e:
+        return json_api_response(*bad_request(e))
+
+    snapshot = await aget_catalog(block=False)
+    if snapshot is not None:
+        return json_api_response(*ok(*page_rows(snapshot.character_payload, page)))
+
+    result = await arun_sparql(list_query(character_list_query(), page, "?char"), cache_ttl=CACHE_TTL_LIST)
+    return json_api_response(*list_result(result, page, format_character_rows))
+
+@require_GET
+async def query_anime(request):
+    search = request.GET.get("search", "")
+    theme = request.GET.get("theme", "")
+
+    try:
+        page = parse_pagination(request.GET)
+    except PaginationError as e:
+        return json_api_response(*bad_request(e))
+
+    snapshot = await aget_catalog(block=False)
+    if snapshot is not None:
+        rows, correction = snapshot.search_anime_tolerant(search, theme)
+        return json_api_response(*tolerant_search_result(rows, correction, search, "title", page))
+
+    result = await arun_sparql(anime_search_query(search, theme), cache_ttl=CACHE_TTL_SEARCH)
+    return json_api_response(*search_result(result, search, "title", page, format_anime_rows))
+
+@require_GET
+async def query_character(request):
+    search = request.GET.get("search", "")
+
+    try:
+        page = parse_pagination(request.GET)
+    except PaginationError as e:
+        return json_api_response(*bad_request(e))
+
+    snapshot = await aget_catalog(block=False)
+    if snapshot is not None:
+        rows, correction = snapshot.search_characters_tolerant(search)
+        return json_api_response(*tolerant_search_result(rows, correction, search, "name", page))
+
+    result = await arun_sparql(character_search_query(search), cache_ttl=CACHE_TTL_SEARCH)
+    return json_api_response(*search_result(result, search, "name", page, format_character_rows))
+
+@require_GET
+async def query_all(request):
+    search = request.GET.get("search", "")
+
+    try:
+        page = parse_pagination(request.GET)
+    except PaginationError as e:
+        return json_api_response(*bad_request(e))
+
+    index = await aget_search_index(block=False)
+    if index is not None:
+        rows, total = index.search(search, query_all_limit(page))
+        return json_api_response(*ok(*top_k_page(rows, total, page)))
+
+    result = await arun_sparql(all_search_query(search), cache_ttl=CACHE_TTL_SEARCH)
+    return json_api_response(*query_all_result(result, search, page))
+
+@require_GET
+async def suggest(request):
+    try:
+        search, type_label, limit = parse_suggest_params(request.GET)
+    except SuggestParamError as e:
+        return json_api_response(*bad_request(e))
+
+    index = await aget_suggest_index(block=False)
+    if index is None:
+        return json_api_response(status.HTTP_503_SERVICE_UNAVAILABLE, "Index autocomplete belum tersedia", None)
+
+    return json_api_response(*ok(index.suggest(search, limit, type_label)))
+
+# INFO BOX
+
+@conditional_on_dataset()
+@require_GET
+async def get_anime_by_pk(request):
+    try:
+        pk = parse_pk(request.GET)
+    except ParamError as e:
+        return json_api_response(*bad_request(e))
+
+    results = await arun_sparql_many(infobox_queries(ANIME_INFOBOX, [pk]), cache_ttl=CACHE_TTL_INFOBOX)
+    return json_api_response(*infobox_result(ANIME_INFOBOX, results, pk))
+
+@conditional_on_dataset()
+@require_GET
+async def get_character_by_pk(request):
+    try:
+        pk = parse_pk(request.GET)
+    except ParamError as e:
+        return json_api_response(*bad_request(e))
+
+    results = await arun_sparql_many(infobox_queries(CHARACTER_INFOBOX, [pk]), cache_ttl=CACHE_TTL_INFOBOX)
+    return json_api_response(*infobox_result(CHARACTER_INFOBOX, results, pk))
+
+@conditional_on_dataset()
+@require_GET
+async def get_anime_by_pks(request):
+    try:
+        pks = parse_pks(request.GET)
+    except PkListError as e:
+        return json_api_response(*bad_request(e))
+
+    results = await arun_sparql_many(infobox_queries(ANIME_INFOBOX, pks), cache_ttl=CACHE_TTL_INFOBOX)
+    return json_api_response(*infobox_batch_result(ANIME_INFOBOX, results, pks))
+
+@conditional_on_dataset()
+@require_GET
+async def get_character_by_pks(request):
+    try:
+        pks = parse_pks(request.GET)
+    except PkListError as e:
+        return json_api_response(*bad_request(e))
+
+    results = await arun_sparql_many(infobox_queries(CHARACTER_INFOBOX, pks), cache_ttl=CACHE_TTL_INFOBOX)
+    return json_api_response(*infobox_batch_result(CHARACTER_INFOBOX, results, pks))
+
+@require_GET
+async def get_studio_wd_by_name(request, pk: str = None):
+    try:
+        studio_name = parse_studio_name(request, pk)
+    except ParamError as e:
+        return json_api_response(*bad_request(e))
+
+    # lookup anime lokal jalan bareng baca cache studio dan lookup Wikidata
+    local_lookup = asyncio.create_task(
+        arun_sparql(studio_local_anime_query(studio_name), cache_ttl=CACHE_TTL_INFOBOX)
+    )
+    try:
+        entry, needs_fetch = await acached_studio(studio_name)
+        studio = entry["studio"] if not needs_fetch else await afetch_studio(studio_name, entry)
+    except WikidataError as e:
+        local_lookup.cancel()
+        return json_api_response(*wikidata_error(e))
+    except BaseException:
+        local_lookup.cancel()
+        raise
+
+    try:
+        local_anime = format_local_anime(await local_lookup)
+    except Exception:
+        local_anime = []
+    return json_api_response(*studio_result(studio, local_anime))
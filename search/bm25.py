@@ -0,0 +1,104 @@
+import math
+import os
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+# BM25F sederhana: term frequency tiap field dinormalisasi dengan panjang
+# field-nya, dikali bobot field, lalu dijumlah sebelum saturasi k1. Dengan begitu
+# match di judul/nama bisa dibuat lebih berat dari match di deskripsi.
+
+BM25_K1 = float(os.getenv('BM25_K1', '1.2'))
+BM25_B = float(os.getenv('BM25_B', '0.75'))
+# token terakhir di query dianggap prefix (user masih mengetik), bobotnya
+# lebih kecil dari token yang cocok persis
+BM25_PREFIX_WEIGHT = float(os.getenv('BM25_PREFIX_WEIGHT', '0.5'))
+BM25_MAX_PREFIX_TERMS = int(os.getenv('BM25_MAX_PREFIX_TERMS', '64'))
+
+
+class Bm25Index:
+    """Index BM25F atas dokumen berupa {field: [token, ...]}.
+
+    `weights` berisi bobot tiap field, field yang tidak ada di `weights`
+    diabaikan. Skor dihitung dari posting list yang sudah berisi term
+    frequency ternormalisasi, jadi query cukup menjumlah idf * tf / (k1 + tf).
+    """
+
+    def __init__(self, documents, weights, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        documents = [
+            {field: Counter(tokens) for field, tokens in doc.items() if field in weights}
+            for doc in documents
+        ]
+        self.size = len(documents)
+
+        lengths = {field: 0 for field in weights}
+        for doc in documents:
+            for field, counts in doc.items():
+                lengths[field] += sum(counts.values())
+        average = {field: (total / self.size if self.size else 0) or 1 for field, total in lengths.items()}
+
+        postings = {}
+        for doc_id, doc in enumerate(documents):
+            tf = Counter()
+            for field, counts in doc.items():
+                norm = 1 - b + b * sum(counts.values()) / average[field]
+                for term, count in counts.items():
+                    tf[term] += weights[field] * count / norm
+            for term, value in tf.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(doc_id)
+                postings[term][1].append(value)
+
+        self.postings = {
+            term: (array('I', ids), array('d', tfs))
+            for term, (ids, tfs) in postings.items()
+        }
+        self.terms = sorted(self.postings)
+
+    def __len__(self):
+        return self.size
+
+    def idf(self, term):
+        df = len(self.postings[term][0])
+        return math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+
+    def expand(self, token):
+        """Term di index yang diawali `token`, maksimal BM25_MAX_PREFIX_TERMS."""
+        start = bisect_left(self.terms, token)
+        terms = []
+        for term in self.terms[start:start + BM25_MAX_PREFIX_TERMS]:
+            if not term.startswith(token):
+                break
+            terms.append(term)
+        return terms
+
+    def term_scores(self, term, weight=1.0):
+        ids, tfs = self.postings[term]
+        idf = self.idf(term) * weight
+        k1 = self.k1
+        return ((doc_id, idf * tf / (k1 + tf)) for doc_id, tf in zip(ids, tfs))
+
+    def scores(self, tokens, prefix_last=True):
+        """Skor per doc id untuk `tokens`. Token terakhir juga dicocokkan
+        sebagai prefix kalau `prefix_last`; untuk satu token query diambil
+        skor term terbaik supaya ekspansi prefix tidak menggelembungkan skor."""
+        scores = {}
+        tokens = list(dict.fromkeys(tokens))
+        for position, token in enumerate(tokens):
+            best = {}
+            if token in self.postings:
+                for doc_id, score in self.term_scores(token):
+                    best[doc_id] = score
+
+            if prefix_last and position == len(tokens) - 1:
+                for term in self.expand(token):
+                    if term == token:
+                        continue
+                    for doc_id, score in self.term_scores(term, BM25_PREFIX_WEIGHT):
+                        if score > best.get(doc_id, 0.0):
+                            best[doc_id] = score
+
+            for doc_id, score in best.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        return scores
@@ -0,0 +1,304 @@
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from operator import attrgetter
+
+from api.cache import shared_get, shared_set
+from api.sparql_client import run_sparql
+from api.views import sparql_to_result_set
+from kagebunshin.common.utils import str_to_list
+from search.index import NgramIndex, compact_text, search_terms, search_tokens
+from search.queries import anime_list_query, character_list_query, character_full_name_query
+from search.typo import DeletionIndex, correct_search
+
+logger = logging.getLogger(__name__)
+
+# Snapshot katalog anime & karakter di memori, supaya endpoint list tidak perlu
+# scan GROUP BY ke GraphDB di setiap request. Snapshot di-refresh berkala di
+# background, atau on demand lewat `python manage.py refresh_catalog`.
+
+CATALOG_ENABLED = os.getenv('CATALOG_ENABLED', 'True') == 'True'
+CATALOG_REFRESH_SECONDS = int(os.getenv('CATALOG_REFRESH_SECONDS', '900'))
+# seberapa sering tiap worker mengecek permintaan refresh di cache bersama
+CATALOG_GENERATION_CHECK_SECONDS = int(os.getenv('CATALOG_GENERATION_CHECK_SECONDS', '10'))
+# jeda sebelum mencoba load ulang setelah load gagal (misal GraphDB mati)
+CATALOG_RETRY_SECONDS = int(os.getenv('CATALOG_RETRY_SECONDS', '30'))
+
+AnimeEntry = namedtuple("AnimeEntry", ["uri", "image", "title", "year", "themes"])
+CharacterEntry = namedtuple("CharacterEntry", ["uri", "name", "anime_list", "full_names"])
+
+
+def anime_row(entry):
+    row = {"anime": entry.uri, "image": entry.image, "title": entry.title}
+    if entry.year is not None:
+        row["year"] = entry.year
+    row["themes"] = list(entry.themes)
+    return row
+
+def character_row(entry):
+    return {"char": entry.uri, "name": entry.name, "animeList": list(entry.anime_list)}
+
+
+class CatalogSnapshot:
+    """Isi katalog pada satu titik waktu. Immutable setelah dibuat, jadi aman
+    dibaca banyak thread tanpa lock."""
+
+    def __init__(self, anime, characters):
+        # urut uri, sama dengan ORDER BY ?anime / ?char di query list, supaya
+        # offset / cursor menunjuk row yang sama dari snapshot maupun GraphDB
+        self.anime = tuple(sorted(anime, key=attrgetter("uri")))
+        self.characters = tuple(sorted(characters, key=attrgetter("uri")))
+        self.loaded_at = time.time()
+
+        theme_index = {}
+        for i, entry in enumerate(self.anime):
+            for theme in entry.themes:
+                theme_index.setdefault(theme.lower(), []).append(i)
+        self.theme_index = {theme: tuple(ids) for theme, ids in theme_index.items()}
+
+        # payload response disiapkan sekali per snapshot
+        self.anime_payload = [anime_row(entry) for entry in self.anime]
+        self.character_payload = [character_row(entry) for entry in self.characters]
+
+        # index substring untuk query_anime / query_character, satu dokumen per
+        # judul anime dan per (karakter, full name)
+        self.anime_index = NgramIndex(compact_text(entry.title) for entry in self.anime)
+        self.full_name_owner = tuple(
+            i for i, entry in enumerate(self.characters) for _ in entry.full_names
+        )
+        self.full_name_index = NgramIndex(
+            compact_text(name) for entry in self.characters for name in entry.full_names
+        )
+
+        # kosakata judul / full name untuk koreksi typo
+        self.title_words = DeletionIndex(
+            token for entry in self.anime for token in search_tokens(entry.title or "")
+        )
+        self.full_name_words = DeletionIndex(
+            token for entry in self.characters for name in entry.full_names
+            for token in search_tokens(name or "")
+        )
+
+    def anime_by_theme(self, theme):
+        return [self.anime_payload[i] for i in self.theme_index.get(theme.lower(), ())]
+
+    def search_anime(self, search, theme=""):
+        """Padanan query SPARQL dari `anime_search_query`, hasilnya salinan row
+        payload (boleh diubah, misalnya ditambah field `score`)."""
+        ids = self.anime_index.search(search_terms(search))
+        if theme:
+            theme = theme.lower()
+            ids = [i for i in ids if any(theme in t.lower() for t in self.anime[i].themes)]
+        return [dict(self.anime_payload[i]) for i in ids]
+
+    def search_characters(self, search):
+        """Padanan query SPARQL dari `character_search_query`: satu row per
+        full name karakter yang cocok."""
+        ids = self.full_name_index.search(search_terms(search))
+        owners = sorted(self.full_name_owner[i] for i in ids)
+        return [dict(self.character_payload[i]) for i in owners]
+
+    # Versi toleran typo: kalau hasilnya kosong, cari ulang dengan search yang
+    # sudah dikoreksi. Return (rows, search yang dikoreksi atau None).
+
+    def search_anime_tolerant(self, search, theme=""):
+        rows = self.search_anime(search, theme)
+        if rows:
+            return rows, None
+        correction = correct_search(search, self.title_words, self.anime_index)
+        if correction is None:
+            return rows, None
+        return self.search_anime(correction, theme), correction
+
+    def search_characters_tolerant(self, search):
+        rows = self.search_characters(search)
+        if rows:
+            return rows, None
+        correction = correct_search(search, self.full_name_words, self.full_name_index)
+        if correction is None:
+            return rows, None
+        return self.search_characters(correction), correction
+
+
+def load_catalog():
+    anime_result = run_sparql(anime_list_query(), cache_ttl=0)
+    if "error" in anime_result:
+        raise RuntimeError(anime_result["error"])
+
+    character_result = run_sparql(character_list_query(), cache_ttl=0)
+    if "error" in character_result:
+        raise RuntimeError(character_result["error"])
+
+    full_name_result = run_sparql(character_full_name_query(), cache_ttl=0)
+    if "error" in full_name_result:
+        raise RuntimeError(full_name_result["error"])
+
+    full_name_rows = sparql_to_result_set(full_name_result)
+    full_names = {}
+    for char, full_name in zip(full_name_rows.column("char"), full_name_rows.column("fullName")):
+        full_names.setdefault(char, []).append(full_name)
+
+    anime_rows = sparql_to_result_set(anime_result)
+    anime = [
+        AnimeEntry(uri, image, title, year, tuple(str_to_list(themes or "")))
+        for uri, image, title, year, themes in zip(
+            anime_rows.column("anime"),
+            anime_rows.column("image"),
+            anime_rows.column("title"),
+            anime_rows.column("year"),
+            anime_rows.column("themes"),
+        )
+    ]
+
+    character_rows = sparql_to_result_set(character_result)
+    characters = [
+        CharacterEntry(uri, name, tuple(str_to_list(anime_list or "")), tuple(full_names.get(uri, ())))
+        for uri, name, anime_list in zip(
+            character_rows.column("char"),
+            character_rows.column("name"),
+            character_rows.column("animeList"),
+        )
+    ]
+    return CatalogSnapshot(anime, characters)
+
+
+class SnapshotHolder:
+    """Pegang snapshot yang di-load lewat `loader` dan refresh di background.
+
+    - `get()` pertama kali me-load secara sinkron (atau langsung return None
+      kalau `block=False`, load-nya jalan di background).
+    - Snapshot yang umurnya lewat `refresh_seconds` di-refresh di background,
+      request tetap dilayani dari snapshot lama sampai yang baru siap.
+    - `request_refresh()` menaikkan generation di cache bersama sehingga semua
+      worker ikut refresh.
+    """
+
+    def __init__(self, name, loader, refresh_seconds=CATALOG_REFRESH_SECONDS):
+        self.name = name
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self._snapshot = None
+        self._generation = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        # di-set setiap kali tidak ada refresh yang sedang jalan
+        self._refresh_done = threading.Event()
+        self._refresh_done.set()
+        self._last_failure = None
+        self._last_generation_check = 0
+
+    @property
+    def generation_key(self):
+        return f"snapshot:{self.name}:generation"
+
+    def refresh(self):
+        """Load ulang snapshot secara sinkron. Snapshot lama tetap dipakai kalau gagal."""
+        generation = shared_get(self.generation_key)
+        try:
+            snapshot = self.loader()
+        except Exception as e:
+            self._last_failure = time.monotonic()
+            logger.warning("Gagal load snapshot %s: %s", self.name, e)
+            return self._snapshot
+
+        self._snapshot = snapshot
+        self._generation = generation
+        return snapshot
+
+    def _begin_refresh(self):
+        """True kalau pemanggil boleh menjalankan refresh, False kalau refresh
+        lain sedang jalan."""
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+            self._refresh_done.clear()
+            return True
+
+    def _end_refresh(self):
+        self._refreshing = False
+        self._refresh_done.set()
+
+    def _refresh_in_background(self):
+        if not self._begin_refresh():
+            return
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._end_refresh()
+
+        threading.Thread(target=run, name=f"snapshot-{self.name}", daemon=True).start()
+
+    def _recently_failed(self):
+        return (
+            self._last_failure is not None
+            and time.monotonic() - self._last_failure < CATALOG_RETRY_SECONDS
+        )
+
+    def _needs_refresh(self, snapshot):
+        if time.time() - snapshot.loaded_at >= self.refresh_seconds:
+            return True
+
+        now = time.monotonic()
+        if now - self._last_generation_check < CATALOG_GENERATION_CHECK_SECONDS:
+            return False
+        self._last_generation_check = now
+        return shared_get(self.generation_key) != self._generation
+
+    def get(self, block=True):
+        recently_failed = self._recently_failed()
+
+        snapshot = self._snapshot
+        if snapshot is not None:
+            if not recently_failed and self._needs_refresh(snapshot):
+                self._refresh_in_background()
+            return snapshot
+
+        if recently_failed:
+            return None
+
+        if not block:
+            self._refresh_in_background()
+            return None
+
+        # load yang sedang jalan (misalnya dari warm()) ditunggu, bukan diulang
+        while not self._begin_refresh():
+            self._refresh_done.wait()
+            if self._snapshot is not None or self._recently_failed():
+                return self._snapshot
+        try:
+            if self._snapshot is None:
+                self.refresh()
+        finally:
+            self._end_refresh()
+        return self._snapshot
+
+    @property
+    def loaded_at(self):
+        """Waktu load snapshot yang sedang dipakai, None kalau belum ada."""
+        snapshot = self._snapshot
+        return snapshot.loaded_at if snapshot is not None else None
+
+    def warm(self):
+        self._refresh_in_background()
+
+    def request_refresh(self):
+        shared_set(self.generation_key, time.time(), 365 * 24 * 3600)
+
+
+catalog = SnapshotHolder("catalog", load_catalog)
+
+def get_catalog(block=True):
+    """Snapshot katalog saat ini, atau None kalau dimatikan / belum bisa di-load
+    (view lalu fallback ke query SPARQL biasa)."""
+    if not CATALOG_ENABLED:
+        return None
+    return catalog.get(block=block)
+
+def warm_catalog():
+    if CATALOG_ENABLED:
+        catalog.warm()
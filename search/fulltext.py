@@ -0,0 +1,233 @@
+import heapq
+import os
+import time
+
+from api.sparql_client import stream_sparql
+from search.bm25 import Bm25Index
+from search.catalog import SnapshotHolder
+from search.index import NgramIndex, search_tokens
+from search.queries import searchable_values_query
+
+# Index full-text untuk query_all. Semua value dari properti di
+# SEARCHABLE_PROPERTIES (search/queries.py) diambil sekali dari GraphDB, lalu
+# pencarian substring dilakukan di index trigram lokal, bukan dengan
+# FILTER(CONTAINS(...)) yang men-scan semua literal di setiap request.
+# Hasilnya satu row per resource, diurutkan dengan BM25 (lihat search/bm25.py).
+# Snapshot-nya di-refresh bareng katalog (lihat SnapshotHolder).
+
+SEARCH_INDEX_ENABLED = os.getenv('SEARCH_INDEX_ENABLED', 'True') == 'True'
+
+# bobot field untuk BM25: judul/nama > deskripsi > properti lain
+SEARCH_LABEL_WEIGHT = float(os.getenv('SEARCH_LABEL_WEIGHT', '3.0'))
+SEARCH_DESCRIPTION_WEIGHT = float(os.getenv('SEARCH_DESCRIPTION_WEIGHT', '1.0'))
+SEARCH_OTHER_WEIGHT = float(os.getenv('SEARCH_OTHER_WEIGHT', '0.3'))
+
+FIELD_WEIGHTS = {
+    "label": SEARCH_LABEL_WEIGHT,
+    "description": SEARCH_DESCRIPTION_WEIGHT,
+    "other": SEARCH_OTHER_WEIGHT,
+}
+
+VOCAB = "http://kagebunshin.org/vocab/"
+TITLE = VOCAB + "hasTitle"
+IMAGE = VOCAB + "hasImage"
+FULL_NAME = VOCAB + "hasFullName"
+LABEL_PROPERTIES = {TITLE, FULL_NAME, VOCAB + "hasAltName", "http://xmlns.com/foaf/0.1/name"}
+DESCRIPTION_PROPERTIES = {VOCAB + "hasDesc", VOCAB + "hasDescription"}
+
+# pemisah antar value dalam satu dokumen, supaya match tidak melewati batas value
+SEPARATOR = "\x00"
+
+# tier match di judul / full name: yang sama persis selalu di atas, sisanya
+# dipakai untuk resource dengan skor BM25 sama
+RANK_EXACT = 3
+RANK_PREFIX = 2
+RANK_LABEL = 1
+RANK_OTHER = 0
+
+
+def search_row(resource, titles, images, full_names):
+    """Satu row per resource dengan key yang sama dengan hasil all_search_query."""
+    if titles:
+        type_label = "anime"
+    elif full_names:
+        type_label = "character"
+    else:
+        type_label = "unknown"
+
+    row = {"resource": resource, "typeLabel": type_label}
+    if titles:
+        row["title"] = titles[0]
+    if images:
+        row["image"] = images[0]
+    if full_names:
+        row["fullName"] = full_names[0]
+    return row
+
+
+class SearchDocument:
+    __slots__ = ("resource", "titles", "images", "full_names", "fields")
+
+    def __init__(self, resource):
+        self.resource = resource
+        self.titles = []
+        self.images = []
+        self.full_names = []
+        self.fields = {"label": [], "description": [], "other": []}
+
+    def add(self, prop, value):
+        if prop == TITLE:
+            target = self.titles
+        elif prop == IMAGE:
+            target = self.images
+        elif prop == FULL_NAME:
+            target = self.full_names
+        else:
+            target = None
+        if target is not None and value not in target:
+            target.append(value)
+
+        if prop in LABEL_PROPERTIES:
+            self.fields["label"].append(value)
+        elif prop in DESCRIPTION_PROPERTIES:
+            self.fields["description"].append(value)
+        else:
+            self.fields["other"].append(value)
+
+    def labels(self):
+        return self.titles + self.full_names
+
+    def text(self):
+        return SEPARATOR.join(value.lower() for values in self.fields.values() for value in values)
+
+    def tokens(self):
+        return {
+            field: [token for value in values for token in search_tokens(value)]
+            for field, values in self.fields.items()
+        }
+
+
+class SearchIndex:
+    """Index per resource. Satu dokumen berisi semua value (lowercase) yang
+    digabung dengan SEPARATOR, jadi `in` pada teks dokumen sama artinya dengan
+    CONTAINS(LCASE(STR(?value)), ...) pada salah satu value-nya.
+
+    Dengan `substring=False` index trigram tidak dibuat, dipakai untuk
+    meranking row yang sudah pasti cocok (fallback SPARQL).
+    """
+
+    def __init__(self, documents, substring=True):
+        self.loaded_at = time.time()
+        documents = sorted(documents, key=lambda doc: doc.resource)
+        self.resources = tuple(doc.resource for doc in documents)
+        self.labels = tuple(
+            tuple(label.lower() for label in doc.labels())
+            for doc in documents
+        )
+        self.rows = tuple(
+            search_row(doc.resource, doc.titles, doc.images, doc.full_names)
+            for doc in documents
+        )
+        self.bm25 = Bm25Index((doc.tokens() for doc in documents), FIELD_WEIGHTS)
+        self.index = NgramIndex(doc.text() for doc in documents) if substring else None
+
+    def __len__(self):
+        return len(self.resources)
+
+    def tier(self, doc_id, search):
+        labels = self.labels[doc_id]
+        if search in labels:
+            return RANK_EXACT
+        if any(label.startswith(search) for label in labels):
+            return RANK_PREFIX
+        if any(search in label for label in labels):
+            return RANK_LABEL
+        return RANK_OTHER
+
+    def matches(self, search):
+        """Id dokumen yang mengandung `search` (semantik sama dengan query_all)."""
+        search = search.lower().replace(SEPARATOR, "")
+        if self.index is None:
+            return range(len(self.resources))
+        return self.index.search([search])
+
+    def top(self, ids, search, limit=None):
+        """Row `ids` urut dari judul/nama yang sama persis dengan `search`, lalu
+        skor BM25 tertinggi, lalu tier, lalu IRI. Kalau `limit` diisi hanya
+        top-k yang diurutkan dan dikembalikan."""
+        search = search.lower().replace(SEPARATOR, "")
+        scores = self.bm25.scores(search_tokens(search))
+
+        def key(doc_id):
+            tier = self.tier(doc_id, search)
+            return (tier == RANK_EXACT, scores.get(doc_id, 0.0), tier, -doc_id)
+
+        if limit is None:
+            ranked = sorted(ids, key=key, reverse=True)
+        else:
+            ranked = heapq.nlargest(max(limit, 0), ids, key=key)
+        return [
+            dict(self.rows[doc_id], score=round(scores.get(doc_id, 0.0), 4))
+            for doc_id in ranked
+        ]
+
+    def search(self, search, limit=None):
+        """(row top-k, jumlah resource yang cocok) untuk query_all."""
+        ids = self.matches(search)
+        return self.top(ids, search, limit), len(ids)
+
+
+def documents_from_rows(rows):
+    """Dokumen dari row all_search_query (judul/image/full name saja)."""
+    documents = {}
+    for row in rows:
+        resource = row.get("resource")
+        if resource is None:
+            continue
+        doc = documents.get(resource)
+        if doc is None:
+            doc = documents[resource] = SearchDocument(resource)
+        for prop, key, values in ((TITLE, "title", doc.titles), (IMAGE, "image", doc.images),
+                                  (FULL_NAME, "fullName", doc.full_names)):
+            value = row.get(key)
+            # row hasil OPTIONAL berulang untuk kombinasi value yang sama
+            if value is not None and value not in values:
+                doc.add(prop, value)
+    return documents.values()
+
+def rank_search_rows(rows, search, limit=None):
+    """Collapse row hasil all_search_query per resource lalu ranking BM25 atas
+    judul/full name. Dipakai kalau index full-text belum tersedia."""
+    index = SearchIndex(documents_from_rows(rows), substring=False)
+    return index.search(search, limit)
+
+
+def load_search_index():
+    result = stream_sparql(searchable_values_query(), cache_ttl=0)
+    if "error" in result:
+        raise RuntimeError(result["error"])
+
+    documents = {}
+    for row in result["rows"]:
+        resource, prop, value = row.get("resource"), row.get("prop"), row.get("value")
+        if resource is None or prop is None or value is None:
+            continue
+        doc = documents.get(resource)
+        if doc is None:
+            doc = documents[resource] = SearchDocument(resource)
+        doc.add(prop, value)
+    return SearchIndex(documents.values())
+
+
+search_index = SnapshotHolder("search_index", load_search_index)
+
+def get_search_index(block=True):
+    """Index full-text saat ini, atau None kalau dimatikan / belum bisa di-load
+    (query_all lalu fallback ke query SPARQL biasa)."""
+    if not SEARCH_INDEX_ENABLED:
+        return None
+    return search_index.get(block=block)
+
+def warm_search_index():
+    if SEARCH_INDEX_ENABLED:
+        search_index.warm()
@@ -0,0 +1,82 @@
+import re
+from array import array
+
+# Normalisasi yang sama dengan filter SPARQL di search/queries.py:
+# - token dari search: karakter selain huruf/angka jadi spasi lalu di-split
+# - judul/nama: REPLACE(LCASE(?x), "[^a-z0-9]", "")
+
+def search_tokens(search):
+    normalized = re.sub(r"[^a-zA-Z0-9 ]+", " ", search.lower()).strip()
+    return [t for t in normalized.split() if t]
+
+def search_no_space(search):
+    return re.sub(r"[^a-zA-Z0-9]+", "", search.lower()).strip()
+
+def search_terms(search):
+    """Semua substring yang wajib ada di judul/nama yang sudah di-compact."""
+    terms = search_tokens(search)
+    no_space = search_no_space(search)
+    if no_space and " " not in search:
+        terms.append(no_space)
+    return terms
+
+def compact_text(text):
+    return re.sub(r"[^a-z0-9]", "", (text or "").lower())
+
+def ngrams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class NgramIndex:
+    """Inverted index n-gram (default trigram) untuk pencarian substring.
+
+    Kandidat diambil dari irisan posting list n-gram tiap term, lalu dicek
+    ulang dengan `in` karena semua n-gram muncul belum tentu berarti
+    substring-nya muncul. Term yang lebih pendek dari n tidak bisa
+    mempersempit kandidat dan hanya dicek di tahap verifikasi.
+    """
+
+    def __init__(self, texts, n=3):
+        self.n = n
+        self.texts = tuple(texts)
+
+        postings = {}
+        for doc_id, text in enumerate(self.texts):
+            for gram in ngrams(text, n):
+                postings.setdefault(gram, []).append(doc_id)
+        self.postings = {gram: array('I', ids) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _candidates(self, terms):
+        candidates = None
+        grams = set()
+        for term in terms:
+            if len(term) >= self.n:
+                grams |= ngrams(term, self.n)
+
+        # mulai dari posting list terpendek supaya irisannya cepat mengecil
+        for gram in sorted(grams, key=lambda g: len(self.postings.get(g, ()))):
+            posting = self.postings.get(gram)
+            if not posting:
+                return []
+            if candidates is None:
+                candidates = set(posting)
+            else:
+                candidates.intersection_update(posting)
+            if not candidates:
+                return []
+
+        if candidates is None:
+            return range(len(self.texts))
+        return sorted(candidates)
+
+    def search(self, terms):
+        """Id dokumen (urut naik) yang mengandung semua `terms`."""
+        terms = [t for t in terms if t]
+        texts = self.texts
+        return [
+            doc_id for doc_id in self._candidates(terms)
+            if all(term in texts[doc_id] for term in terms)
+        ]
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.sparql_client import run_sparql
+from api.views import sparql_to_json
+from search.queries import local_studios_query
+from search.studio import FRESH, WIKIDATA_BATCH_SIZE, WikidataError, fetch_studios, store, studio_name_from_uri
+
+
+class Command(BaseCommand):
+    help = "Isi cache disk data Wikidata untuk semua studio lokal (v:hasStudio) dengan query VALUES per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=WIKIDATA_BATCH_SIZE,
+                            help="Jumlah studio per query Wikidata.")
+        parser.add_argument("--all", action="store_true",
+                            help="Ambil ulang semua studio, termasuk yang cache-nya masih fresh.")
+
+    def handle(self, *args, **options):
+        result = run_sparql(local_studios_query(), cache_ttl=0)
+        if "error" in result:
+            raise CommandError(f"Gagal ambil daftar studio dari GraphDB: {result['error']}")
+
+        names = sorted({studio_name_from_uri(row["studio"]) for row in sparql_to_json(result) if row.get("studio")})
+        if not options["all"]:
+            names = [
+                name for name in names
+                if (entry := store.get(name)) is None or store.state(entry) != FRESH
+            ]
+
+        if not names:
+            self.stdout.write(self.style.SUCCESS("Cache studio sudah fresh, tidak ada yang diambil."))
+            return
+
+        try:
+            studios = fetch_studios(names, batch_size=options["batch_size"])
+        except WikidataError as e:
+            raise CommandError(f"{e.message}: {e.data}")
+
+        found = sum(1 for studio in studios.values() if studio is not None)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(studios)} studio disimpan ke cache ({found} ditemukan di Wikidata)."
+        ))
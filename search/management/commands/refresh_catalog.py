@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from search.catalog import catalog
+from search.fulltext import search_index
+from search.suggest import suggest_index
+
+
+class Command(BaseCommand):
+    help = "Minta semua worker me-reload snapshot katalog anime/karakter dan index full-text / autocomplete dari GraphDB."
+
+    def handle(self, *args, **options):
+        catalog.request_refresh()
+        search_index.request_refresh()
+        suggest_index.request_refresh()
+        self.stdout.write(self.style.SUCCESS(
+            "Permintaan refresh katalog tersimpan, worker akan reload dalam beberapa detik."
+        ))
@@ -0,0 +1,506 @@
+from search.index import search_tokens, search_no_space
+
+# kumpulan query SPARQL yang dipakai view search (sync maupun async)
+
+def anime_list_query():
+    return """
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT ?anime ?image ?title ?year (GROUP_CONCAT(DISTINCT ?themeAll; separator=",") AS ?themes)
+    WHERE {
+      ?anime v:hasImage ?image ;
+             v:hasTitle ?title ;
+             v:hasTheme ?themeAll ;
+             v:isReleased ?releaseNode .
+
+      OPTIONAL {
+        ?releaseNode v:releasedYear ?year .
+      }
+    }
+    GROUP BY ?anime ?image ?title ?year
+    """
+
+def anime_by_theme_query(theme):
+    filter_theme = f"""
+    FILTER EXISTS {{
+      ?anime v:hasTheme ?t .
+      FILTER(LCASE(?t) = LCASE("{theme}"))
+    }}
+    """
+
+    return f"""
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT ?anime ?image ?title ?year
+           (GROUP_CONCAT(DISTINCT ?themeAll; separator=",") AS ?themes)
+    WHERE {{
+      ?anime v:hasImage ?image ;
+             v:hasTitle ?title ;
+             v:hasTheme ?themeAll ;
+             v:isReleased ?releaseNode .
+
+      OPTIONAL {{
+        ?releaseNode v:releasedYear ?year .
+      }}
+
+      {filter_theme}
+    }}
+    GROUP BY ?anime ?image ?title ?year
+    """
+
+def character_list_query():
+    return """
+    PREFIX v: <http://kagebunshin.org/vocab/>
+    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+
+    SELECT ?char ?name (GROUP_CONCAT(DISTINCT ?title; separator=", ") AS ?animeList)
+    WHERE {
+      ?anime v:hasCharacter ?char ;
+        v:hasTitle ?title .
+
+      ?char foaf:name ?name .
+    }
+    GROUP BY ?char ?name
+
+    """
+
+def character_full_name_query():
+    return """
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT ?char ?fullName
+    WHERE {
+      ?char v:hasFullName ?fullName .
+    }
+    """
+
+def sparql_anime(filter_title):
+    return f"""
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT ?anime ?image ?title ?year
+           (GROUP_CONCAT(DISTINCT ?themeAll; separator=",") AS ?themes)
+    WHERE {{
+      ?anime v:hasImage ?image ;
+             v:hasTitle ?title ;
+             v:hasTheme ?themeAll ;
+             v:isReleased ?releaseNode .
+
+      OPTIONAL {{
+        ?releaseNode v:releasedYear ?year .
+      }}
+
+      {filter_title}
+    }}
+    GROUP BY ?anime ?image ?title ?year
+    """
+
+def sparql_anime_by_theme(filter_title, theme):
+    filter_theme = f"""
+    FILTER EXISTS {{
+      ?anime v:hasTheme ?t .
+      FILTER(CONTAINS(LCASE(?t), LCASE("{theme}")))
+    }}
+    """
+
+    return f"""
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT ?anime ?image ?title ?year
+           (GROUP_CONCAT(DISTINCT ?themeAll; separator=",") AS ?themes)
+    WHERE {{
+      ?anime v:hasImage ?image ;
+             v:hasTitle ?title ;
+             v:hasTheme ?themeAll ;
+             v:isReleased ?releaseNode .
+
+      OPTIONAL {{
+        ?releaseNode v:releasedYear ?year .
+      }}
+
+      {filter_title}
+      {filter_theme}
+    }}
+    GROUP BY ?anime ?image ?title ?year
+    """
+
+def search_filters(search, variable):
+    # Token search
+    tokens = search_tokens(search)
+
+    # No space search
+    no_space = search_no_space(search)
+
+    token_filters = "\n".join(
+        [f'FILTER(CONTAINS(REPLACE(LCASE(?{variable}), "[^a-z0-9]", ""), "{token}"))'
+         for token in tokens]
+    ) if tokens else ""
+
+    exact_filter = ""
+    if no_space and " " not in search:
+        exact_filter = f'''
+        FILTER(CONTAINS(
+            REPLACE(LCASE(?{variable}), "[^a-z0-9]", ""),
+            "{no_space}"
+        ))
+        '''
+
+    return token_filters + "\n" + exact_filter
+
+def anime_search_query(search, theme=""):
+    all_filters = search_filters(search, "title")
+
+    if theme:
+        return sparql_anime_by_theme(all_filters, theme)
+    return sparql_anime(all_filters)
+
+def character_search_query(search):
+    all_filters = search_filters(search, "fullName")
+
+    return f"""
+    PREFIX v: <http://kagebunshin.org/vocab/>
+    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+
+    SELECT ?char ?name (GROUP_CONCAT(DISTINCT ?title; separator=", ") AS ?animeList)
+    WHERE {{
+      ?anime v:hasCharacter ?char ;
+             v:hasTitle ?title .
+
+      ?char foaf:name ?name ;
+            v:hasFullName ?fullName .
+
+      {all_filters}
+    }}
+    GROUP BY ?char ?name ?fullName
+    """
+
+# properti yang dicari oleh query_all, dipakai juga untuk membangun index
+# full-text di search/fulltext.py
+SEARCHABLE_PROPERTIES = (
+    "v:hasTitle",
+    "v:hasDesc",
+    "v:hasImage",
+    "v:hasType",
+    "v:hasStatus",
+    "v:hasSource",
+    "v:hasGenre",
+    "v:hasTheme",
+    "v:hasStudio",
+    "v:hasProducer",
+    "v:hasRating",
+    "v:hasCharacter",
+    "v:hasDemographic",
+
+    "vcard:hasURL",
+    "foaf:name",
+    "v:hasAltName",
+    "v:hasDescription",
+    "v:hasFullName",
+    "v:hasAttributes",
+)
+
+def searchable_properties():
+    return "\n        ".join(SEARCHABLE_PROPERTIES)
+
+def all_search_query(search):
+    return f"""
+    PREFIX v: <http://kagebunshin.org/vocab/>
+    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+    PREFIX vcard: <http://www.w3.org/2006/vcard/ns#>
+
+    SELECT DISTINCT
+        ?resource
+        ?typeLabel
+        ?title
+        ?image
+        ?fullName
+
+    WHERE {{
+      VALUES ?prop {{
+        {searchable_properties()}
+      }}
+
+      ?resource ?prop ?value .
+
+      FILTER(CONTAINS(LCASE(STR(?value)), LCASE("{search}")))
+
+      OPTIONAL {{ ?resource v:hasTitle ?title . }}
+      OPTIONAL {{ ?resource v:hasImage ?image . }}
+
+      OPTIONAL {{ ?resource v:hasFullName ?fullName . }}
+
+      BIND(
+        IF(BOUND(?title), "anime",
+          IF(BOUND(?fullName), "character", "unknown")
+        ) AS ?typeLabel
+      )
+    }}
+    """
+
+def searchable_values_query():
+    # semua value yang bisa dicari query_all, untuk membangun index full-text
+    return f"""
+    PREFIX v: <http://kagebunshin.org/vocab/>
+    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+    PREFIX vcard: <http://www.w3.org/2006/vcard/ns#>
+
+    SELECT ?resource ?prop ?value
+    WHERE {{
+      VALUES ?prop {{
+        {searchable_properties()}
+      }}
+
+      ?resource ?prop ?value .
+    }}
+    """
+
+# SUGGEST (autocomplete)
+
+def suggest_labels_query():
+    return """
+    PREFIX v: <http://kagebunshin.org/vocab/>
+    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+
+    SELECT ?resource ?prop ?value
+    WHERE {
+      VALUES ?prop { v:hasTitle v:hasFullName v:hasAltName foaf:name }
+      ?resource ?prop ?value .
+    }
+    """
+
+def anime_popularity_query():
+    return """
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT ?anime (SAMPLE(?image) AS ?image) (MIN(?popularity) AS ?popularity) (MAX(?members) AS ?members)
+    WHERE {
+      ?anime v:hasTitle ?title .
+      OPTIONAL { ?anime v:hasImage ?image . }
+      OPTIONAL { ?anime v:isPopularity ?popularity . }
+      OPTIONAL { ?anime v:hasMembers ?members . }
+    }
+    GROUP BY ?anime
+    """
+
+def character_popularity_query():
+    # karakter tidak punya data popularitas sendiri, pakai anime terpopuler-nya
+    return """
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT ?char (MIN(?popularity) AS ?popularity) (MAX(?members) AS ?members)
+    WHERE {
+      ?anime v:hasCharacter ?char .
+      OPTIONAL { ?anime v:isPopularity ?popularity . }
+      OPTIONAL { ?anime v:hasMembers ?members . }
+    }
+    GROUP BY ?char
+    """
+
+def paginated(query, page, order_by):
+    # ambil satu row lebih dari limit untuk tahu apakah masih ada halaman berikutnya
+    return f"""{query}
+    ORDER BY {order_by}
+    LIMIT {page.limit + 1}
+    OFFSET {page.offset}
+    """
+
+# INFO BOX
+
+def anime_uri(pk):
+    return f"http://kagebunshin.org/anime/{pk}"
+
+def character_uri(pk):
+    return f"http://kagebunshin.org/character/{pk}"
+
+def infobox_values(uris):
+    return " ".join(f"<{uri}>" for uri in uris)
+
+# Infobox dipecah jadi beberapa query kecil yang dijalankan bersamaan
+# (run_sparql_many) lalu digabung di Python: satu query untuk field tunggal,
+# satu query per relasi yang nilainya banyak. Kalau semua relasi jadi OPTIONAL
+# dalam satu GROUP BY, GraphDB harus membentuk cartesian product genre x theme
+# x producer x karakter sebelum GROUP_CONCAT. Semua query menerima banyak uri
+# sekaligus (VALUES), jadi dipakai juga oleh endpoint batch.
+#
+# Property di *_SCALAR_PROPERTIES diambil satu value (SAMPLE) per resource,
+# jadi data yang tidak sengaja punya dua value (misalnya dua v:hasTitle) tetap
+# menghasilkan satu row. Property yang memang bisa banyak (studio, genre, ...)
+# diambil lewat query relasi.
+
+ANIME_SCALAR_PROPERTIES = (
+    ("title", "v:hasTitle"),
+    ("desc", "v:hasDesc"),
+    ("image", "v:hasImage"),
+    ("type", "v:hasType"),
+    ("episodes", "v:hasEpisodes"),
+    ("status", "v:hasStatus"),
+    ("premiered", "v:isPremiered"),
+    ("duration", "v:hasDuration"),
+    ("rating", "v:hasRating"),
+    ("score", "v:hasScore"),
+    ("rank", "v:isRanked"),
+    ("popularity", "v:isPopularity"),
+    ("members", "v:hasMembers"),
+    ("favorites", "v:hasFavorites"),
+    ("source", "v:hasSource"),
+)
+
+CHARACTER_SCALAR_PROPERTIES = (
+    ("name", "foaf:name"),
+    ("fullName", "v:hasFullName"),
+    ("altName", "v:hasAltName"),
+    ("desc", "v:hasDescription"),
+    ("url", "vcard:hasURL"),
+    ("attributes", "v:hasAttributes"),
+)
+
+def infobox_scalar_query(uris, subject, properties):
+    # satu row per resource; resource yang tidak punya triple sama sekali
+    # tidak menghasilkan row
+    variables = " ".join(f"(SAMPLE(?{name}_) AS ?{name})" for name, _ in properties)
+    optionals = "\n      ".join(
+        f"OPTIONAL {{ ?{subject} {prop} ?{name}_ . }}" for name, prop in properties
+    )
+    return f"""
+    PREFIX v: <http://kagebunshin.org/vocab/>
+    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+    PREFIX vcard: <http://www.w3.org/2006/vcard/ns#>
+
+    SELECT ?{subject} {variables}
+    WHERE {{
+      VALUES ?{subject} {{ {infobox_values(uris)} }}
+      FILTER EXISTS {{ ?{subject} ?anyProp ?anyValue . }}
+
+      {optionals}
+    }}
+    GROUP BY ?{subject}
+    """
+
+def infobox_relation_query(uris, subject, prop):
+    return f"""
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT DISTINCT ?{subject} ?value
+    WHERE {{
+      VALUES ?{subject} {{ {infobox_values(uris)} }}
+      ?{subject} {prop} ?value .
+    }}
+    """
+
+def anime_infobox_queries(uris):
+    """Sub-query infobox anime, {nama: query}. Lihat format di search/views.py."""
+    values = infobox_values(uris)
+    return {
+        "scalar": infobox_scalar_query(uris, "anime", ANIME_SCALAR_PROPERTIES),
+        "genres": infobox_relation_query(uris, "anime", "v:hasGenre"),
+        "themes": infobox_relation_query(uris, "anime", "v:hasTheme"),
+        "producers": infobox_relation_query(uris, "anime", "v:hasProducer"),
+        "studios": infobox_relation_query(uris, "anime", "v:hasStudio"),
+        "characters": f"""
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT DISTINCT ?anime ?char ?charName
+    WHERE {{
+      VALUES ?anime {{ {values} }}
+      ?anime v:hasCharacter ?char .
+      OPTIONAL {{ ?char v:hasFullName ?charName . }}
+    }}
+    """,
+        "release": f"""
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT ?anime ?year ?season
+    WHERE {{
+      VALUES ?anime {{ {values} }}
+      ?anime v:isReleased ?releaseNode .
+      OPTIONAL {{ ?releaseNode v:releasedYear ?year . }}
+      OPTIONAL {{ ?releaseNode v:releasedSeason ?season . }}
+    }}
+    """,
+    }
+
+def character_infobox_queries(uris):
+    """Sub-query infobox karakter, {nama: query}."""
+    return {
+        "scalar": infobox_scalar_query(uris, "char", CHARACTER_SCALAR_PROPERTIES),
+        "animeList": f"""
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT DISTINCT ?char ?value
+    WHERE {{
+      VALUES ?char {{ {infobox_values(uris)} }}
+      ?anime v:hasCharacter ?char ;
+             v:hasTitle ?value .
+    }}
+    """,
+    }
+
+# STUDIO
+
+def sparql_string(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def studios_wikidata_query(studio_names):
+    # satu query untuk banyak studio, hasilnya bisa lebih dari satu row per
+    # nama (dipilih row pertama per ?name)
+    names = " ".join(sparql_string(name) + "@en" for name in studio_names)
+
+    return f"""
+    PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    PREFIX wikibase: <http://wikiba.se/ontology#>
+    PREFIX bd: <http://www.bigdata.com/rdf#>
+
+    SELECT DISTINCT
+      ?name ?studio ?studioLabel
+      (GROUP_CONCAT(DISTINCT ?notableWorkLabel; separator=", ") AS ?notableWorks)
+      (GROUP_CONCAT(DISTINCT ?foundedByLabel; separator=", ") AS ?founders)
+      ?countryLabel
+      ?officialWebsite
+      ?logo
+    WHERE {{
+      VALUES ?name {{ {names} }}
+      ?studio rdfs:label ?name .
+
+      OPTIONAL {{ ?studio wdt:P800 ?notableWork . ?notableWork rdfs:label ?notableWorkLabel FILTER(LANG(?notableWorkLabel) = "en") }}
+      OPTIONAL {{ ?studio wdt:P112 ?foundedBy . ?foundedBy rdfs:label ?foundedByLabel FILTER(LANG(?foundedByLabel) = "en") }}
+      OPTIONAL {{ ?studio wdt:P17 ?country . ?country rdfs:label ?countryLabel FILTER(LANG(?countryLabel) = "en") }}
+      OPTIONAL {{ ?studio wdt:P856 ?officialWebsite . }}
+      OPTIONAL {{ ?studio wdt:P154 ?logo . }}
+
+      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en".
+        ?studio rdfs:label ?studioLabel .
+      }}
+    }}
+    GROUP BY
+      ?name ?studio ?studioLabel
+      ?countryLabel ?officialWebsite ?logo
+    """
+
+def local_studio_uri(studio_name):
+    # We construct a likely local studio URI by replacing spaces with underscores
+    # e.g. studio_name "Toei Animation" -> http://kagebunshin.org/studio/Toei_Animation
+    local_studio_fragment = studio_name.replace(' ', '_')
+    return f"http://kagebunshin.org/studio/{local_studio_fragment}"
+
+def studio_local_anime_query(studio_name):
+    return f"""
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT ?anime ?title
+    WHERE {{
+      VALUES ?studio {{ <{local_studio_uri(studio_name)}> }}
+      ?anime v:hasStudio ?studio .
+      OPTIONAL {{ ?anime v:hasTitle ?title . }}
+    }}
+    """
+
+def local_studios_query():
+    return """
+    PREFIX v: <http://kagebunshin.org/vocab/>
+
+    SELECT DISTINCT ?studio
+    WHERE {
+      ?anime v:hasStudio ?studio .
+    }
+    """
@@ -0,0 +1,129 @@
+import heapq
+from collections import Counter
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from api.result_set import ResultSet
+
+# Ranking hasil search berdasarkan kemiripan (difflib.SequenceMatcher.ratio)
+# antara field (title / name) dan query. Skor dan urutannya sama persis dengan
+# implementasi awal: skor = round(ratio * 100, 2), urut menurun, dan row dengan
+# skor sama tetap di urutan aslinya.
+
+RANKING_FEATURE_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=RANKING_FEATURE_CACHE_SIZE)
+def text_features(value):
+    """Fitur per judul/nama yang dipakai berulang antar request: versi
+    lowercase dan multiset karakternya (untuk batas atas quick_ratio)."""
+    lowered = value.lower()
+    return lowered, Counter(lowered)
+
+
+def to_score(ratio):
+    return round(ratio * 100, 2)
+
+
+class Ranker:
+    """Penghitung skor untuk satu query. Analisis query (seq2 SequenceMatcher)
+    cukup dibuat sekali, lalu dipakai untuk semua kandidat."""
+
+    def __init__(self, query):
+        self.query = query.lower()
+        self.query_counts = Counter(self.query)
+        self.matcher = SequenceMatcher(None)
+        self.matcher.set_seq2(self.query)
+        self._scores = {}
+
+    def length_bound(self, value):
+        # sama dengan SequenceMatcher.real_quick_ratio()
+        la, lb = len(value), len(self.query)
+        return 2.0 * min(la, lb) / (la + lb) if la + lb else 1.0
+
+    def count_bound(self, counts, length):
+        # sama dengan SequenceMatcher.quick_ratio()
+        total = length + len(self.query)
+        if not total:
+            return 1.0
+        matches = sum(min(n, counts[ch]) for ch, n in self.query_counts.items())
+        return 2.0 * matches / total
+
+    def score(self, value):
+        # judul yang sama (mis. beberapa row untuk satu anime) cukup dihitung sekali
+        score = self._scores.get(value)
+        if score is None:
+            if not self.query:
+                score = 100.0 if not value else 0.0
+            else:
+                self.matcher.set_seq1(value)
+                score = to_score(self.matcher.ratio())
+            self._scores[value] = score
+        return score
+
+
+def rank_indices(values, query, limit=None):
+    """Ranking list string `values` terhadap `query`: list (index, skor) urut
+    dari skor tertinggi, index kecil duluan kalau skornya sama.
+
+    Kalau `limit` diisi hanya top-k yang dikembalikan. Kandidat diproses dari
+    batas atas skor terbesar dan berhenti begitu batas atasnya tidak mungkin
+    lagi masuk top-k, jadi kebanyakan row tidak perlu dihitung ratio-nya.
+    """
+    ranker = Ranker(query)
+    values = [text_features(value or "")[0] for value in values]
+
+    # query kosong: semua skor 0 (atau 100 untuk field kosong), tidak perlu heap
+    if limit is None or limit >= len(values) or not ranker.query:
+        scores = [ranker.score(value) for value in values]
+        order = sorted(range(len(values)), key=scores.__getitem__, reverse=True)
+        if limit is not None:
+            order = order[:max(limit, 0)]
+        return [(i, scores[i]) for i in order]
+
+    if limit <= 0:
+        return []
+
+    order = sorted(range(len(values)), key=lambda i: ranker.length_bound(values[i]), reverse=True)
+
+    # min-heap berisi (skor, -index) sehingga heap[0] adalah entry terlemah.
+    # Kandidat dilewati kalau (batas atas skor, -index)-nya pun tidak bisa
+    # mengalahkan heap[0], termasuk kasus skor sama tapi index lebih besar.
+    heap = []
+    for i in order:
+        value = values[i]
+        if len(heap) == limit:
+            bound = to_score(ranker.length_bound(value))
+            if bound < heap[0][0]:
+                break
+            if (bound, -i) <= heap[0]:
+                continue
+            _, counts = text_features(value)
+            if (to_score(ranker.count_bound(counts, len(value))), -i) <= heap[0]:
+                continue
+
+        entry = (ranker.score(value), -i)
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    return [(-neg_index, score) for score, neg_index in sorted(heap, reverse=True)]
+
+
+def rank_results(results, query, field, limit=None):
+    """Urutkan `results` berdasarkan kemiripan `field` dengan `query` dan isi
+    kolom/key `score`. `results` boleh list of dict atau ResultSet, hasilnya
+    bertipe sama; lihat rank_indices untuk arti `limit`.
+    """
+    if isinstance(results, ResultSet):
+        ranked = rank_indices(results.column(field), query, limit)
+        ranked_results = results.take(i for i, _ in ranked)
+        return ranked_results.set_column("score", (score for _, score in ranked))
+
+    ranked_results = []
+    for i, score in rank_indices([row.get(field) for row in results], query, limit):
+        row = results[i]
+        row['score'] = score
+        ranked_results.append(row)
+    return ranked_results
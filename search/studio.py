@@ -0,0 +1,258 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+
+from search.queries import studios_wikidata_query
+
+logger = logging.getLogger(__name__)
+
+# Data studio dari Wikidata (notable works, founder, negara, website, logo)
+# disimpan di disk, satu file JSON per studio, supaya infobox studio tidak
+# menunggu query.wikidata.org di setiap view dan tetap ada setelah restart.
+#
+# - umur < WIKIDATA_CACHE_TTL: dipakai langsung
+# - umur < WIKIDATA_CACHE_TTL + WIKIDATA_STALE_SECONDS: tetap dipakai, tapi
+#   di-refresh di background (stale-while-revalidate)
+# - lebih tua dari itu: diambil ulang dari Wikidata; kalau Wikidata gagal,
+#   data lama tetap dipakai daripada error
+#
+# Studio yang tidak ditemukan di Wikidata juga disimpan (data None), supaya
+# nama yang sama tidak ditanyakan terus. `python manage.py prefetch_studios`
+# mengisi cache untuk semua studio lokal sekaligus.
+
+WIKIDATA_URL = os.getenv('WIKIDATA_URL', 'https://query.wikidata.org/sparql')
+WIKIDATA_HEADERS = {'Accept': 'application/sparql-results+json', 'User-Agent': 'kagebunshin-be/1.0 (contact: dev@example.com)'}
+WIKIDATA_TIMEOUT = int(os.getenv('WIKIDATA_TIMEOUT', '15'))
+WIKIDATA_CACHE_TTL = int(os.getenv('WIKIDATA_CACHE_TTL', '86400'))
+WIKIDATA_STALE_SECONDS = int(os.getenv('WIKIDATA_STALE_SECONDS', '604800'))
+# jumlah nama studio per query VALUES
+WIKIDATA_BATCH_SIZE = int(os.getenv('WIKIDATA_BATCH_SIZE', '50'))
+# koneksi paralel ke Wikidata per event loop (view async)
+WIKIDATA_ASYNC_POOL_SIZE = int(os.getenv('WIKIDATA_ASYNC_POOL_SIZE', '10'))
+STUDIO_CACHE_DIR = os.getenv('STUDIO_CACHE_DIR', '/tmp/kagebunshin-studio')
+
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+
+class WikidataError(Exception):
+    """Request ke Wikidata gagal. `message` dan `data` dipakai untuk response 502."""
+
+    def __init__(self, message, data):
+        super().__init__(message)
+        self.message = message
+        self.data = data
+
+
+def studio_name_from_pk(pk):
+    # Normalize underscores to spaces
+    return pk.replace('_', ' ').strip()
+
+def studio_name_from_uri(uri):
+    # kebalikan dari local_studio_uri di search/queries.py
+    return studio_name_from_pk(uri.rstrip('/').rsplit('/', 1)[-1])
+
+def format_studio(binding, studio_name):
+    def read(binding, key):
+      v = binding.get(key)
+      if not v:
+        return None
+      return v.get('value')
+
+    notable_raw = read(binding, 'notableWorks') or ''
+    founders_raw = read(binding, 'founders') or ''
+
+    return {
+      'wikidataUri': read(binding, 'studio'),
+      'name': read(binding, 'studioLabel') or studio_name,
+      'notableWorks': [s for s in notable_raw.split('||') if s],
+      'founders': [s for s in founders_raw.split('||') if s],
+      'originCountry': read(binding, 'countryLabel'),
+      'officialWebsite': read(binding, 'officialWebsite'),
+      'logo': read(binding, 'logo'),
+    }
+
+def studios_from_bindings(bindings, studio_names):
+    """{nama: data studio atau None} untuk semua `studio_names`."""
+    studios = {name: None for name in studio_names}
+    for binding in bindings:
+        name = (binding.get('name') or {}).get('value')
+        if name in studios and studios[name] is None:
+            studios[name] = format_studio(binding, name)
+    return studios
+
+def batches(items, size):
+    items = list(items)
+    for start in range(0, len(items), max(size, 1)):
+        yield items[start:start + size]
+
+
+class StudioStore:
+    """Cache studio di disk. Ditulis lewat file sementara + rename, jadi aman
+    dipakai beberapa worker sekaligus."""
+
+    def __init__(self, directory=STUDIO_CACHE_DIR):
+        self.directory = directory
+
+    def path(self, studio_name):
+        digest = hashlib.sha256(studio_name.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".json")
+
+    def get(self, studio_name):
+        try:
+            with open(self.path(studio_name), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, studio_name, studio):
+        entry = {"name": studio_name, "fetchedAt": time.time(), "studio": studio}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path(studio_name))
+        except OSError as e:
+            logger.warning("Gagal simpan cache studio %s: %s", studio_name, e)
+        return entry
+
+    def state(self, entry):
+        age = time.time() - entry.get("fetchedAt", 0)
+        if age < WIKIDATA_CACHE_TTL:
+            return FRESH
+        if age < WIKIDATA_CACHE_TTL + WIKIDATA_STALE_SECONDS:
+            return STALE
+        return EXPIRED
+
+
+store = StudioStore()
+
+def wikidata_params(studio_names):
+    return {'query': studios_wikidata_query(studio_names)}
+
+def parse_wikidata_response(resp, studio_names):
+    # resp bisa response requests atau httpx, interface-nya sama
+    if resp.status_code != 200:
+        raise WikidataError('Wikidata returned non-200', {'status_code': resp.status_code, 'text': resp.text[:200]})
+    bindings = resp.json().get('results', {}).get('bindings', [])
+    return studios_from_bindings(bindings, studio_names)
+
+def put_studios(studios):
+    for name, studio in studios.items():
+        store.put(name, studio)
+
+def fetch_studios(studio_names, batch_size=WIKIDATA_BATCH_SIZE):
+    """Ambil studio dari Wikidata per batch VALUES lalu simpan ke cache disk."""
+    studios = {}
+    for batch in batches(dict.fromkeys(studio_names), batch_size):
+        try:
+            resp = requests.get(WIKIDATA_URL, params=wikidata_params(batch), headers=WIKIDATA_HEADERS, timeout=WIKIDATA_TIMEOUT)
+        except Exception as e:
+            raise WikidataError('Gagal menghubungi Wikidata', {'error': str(e)})
+
+        found = parse_wikidata_response(resp, batch)
+        put_studios(found)
+        studios.update(found)
+    return studios
+
+# client httpx untuk Wikidata, terpisah dari pool GraphDB supaya Wikidata yang
+# lambat tidak menghabiskan koneksi ke GraphDB. Disimpan per event loop seperti
+# get_async_client di api/sparql_client.py.
+_wikidata_clients = {}
+
+def get_wikidata_client():
+    loop = asyncio.get_running_loop()
+    http = _wikidata_clients.get(loop)
+    if http is None:
+        for old_loop in [l for l in _wikidata_clients if l.is_closed()]:
+            del _wikidata_clients[old_loop]
+        http = httpx.AsyncClient(
+            headers=WIKIDATA_HEADERS,
+            timeout=WIKIDATA_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=WIKIDATA_ASYNC_POOL_SIZE,
+                max_keepalive_connections=WIKIDATA_ASYNC_POOL_SIZE,
+            ),
+        )
+        _wikidata_clients[loop] = http
+    return http
+
+async def afetch_studios(studio_names, batch_size=WIKIDATA_BATCH_SIZE):
+    studios = {}
+    http = get_wikidata_client()
+    for batch in batches(dict.fromkeys(studio_names), batch_size):
+        try:
+            resp = await http.get(WIKIDATA_URL, params=wikidata_params(batch))
+        except Exception as e:
+            raise WikidataError('Gagal menghubungi Wikidata', {'error': str(e)})
+
+        found = parse_wikidata_response(resp, batch)
+        # tulis cache disk di thread, jangan di event loop
+        await sync_to_async(put_studios)(found)
+        studios.update(found)
+    return studios
+
+
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+def revalidate_in_background(studio_name):
+    with _revalidating_lock:
+        if studio_name in _revalidating:
+            return
+        _revalidating.add(studio_name)
+
+    def run():
+        try:
+            fetch_studios([studio_name])
+        except WikidataError as e:
+            logger.warning("Gagal refresh studio %s dari Wikidata: %s", studio_name, e.data)
+        finally:
+            with _revalidating_lock:
+                _revalidating.discard(studio_name)
+
+    threading.Thread(target=run, name="studio-revalidate", daemon=True).start()
+
+def cached_studio(studio_name):
+    """(entry cache, perlu fetch?). Entry stale langsung dipakai dan di-refresh
+    di background; entry expired dikembalikan sebagai cadangan kalau fetch gagal."""
+    entry = store.get(studio_name)
+    if entry is None:
+        return None, True
+
+    state = store.state(entry)
+    if state == STALE:
+        revalidate_in_background(studio_name)
+    return entry, state == EXPIRED
+
+def fetch_studio(studio_name, fallback=None):
+    """Data studio dari Wikidata, atau data di `fallback` (entry lama) kalau gagal."""
+    try:
+        return fetch_studios([studio_name])[studio_name]
+    except WikidataError:
+        if fallback is None:
+            raise
+        return fallback["studio"]
+
+# versi async cached_studio: baca cache disk (dan mungkin start thread
+# revalidate) di thread, jangan di event loop
+acached_studio = sync_to_async(cached_studio)
+
+async def afetch_studio(studio_name, fallback=None):
+    try:
+        return (await afetch_studios([studio_name]))[studio_name]
+    except WikidataError:
+        if fallback is None:
+            raise
+        return fallback["studio"]
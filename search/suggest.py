@@ -0,0 +1,236 @@
+import os
+import time
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from api.sparql_client import run_sparql, stream_sparql
+from api.views import sparql_to_result_set
+from search.catalog import SnapshotHolder
+from search.index import search_tokens
+from search.queries import suggest_labels_query, anime_popularity_query, character_popularity_query
+
+# Autocomplete untuk search box: prefix judul anime, full name / nama / alt name
+# karakter, dicari di array key yang sudah diurutkan (binary search) tanpa
+# query ke GraphDB. Key dibuat untuk setiap awal kata, jadi "titan" juga
+# menemukan "Attack on Titan". Urutan hasil: match di awal label dulu, lalu
+# yang paling populer (hasMembers terbanyak, lalu isPopularity terkecil).
+
+SUGGEST_ENABLED = os.getenv('SUGGEST_ENABLED', 'True') == 'True'
+SUGGEST_DEFAULT_LIMIT = int(os.getenv('SUGGEST_DEFAULT_LIMIT', '10'))
+SUGGEST_MAX_LIMIT = int(os.getenv('SUGGEST_MAX_LIMIT', '50'))
+# prefix sampai panjang ini hasilnya dihitung di depan, karena range key-nya
+# terlalu lebar untuk di-scan tiap request
+SUGGEST_PRECOMPUTED_PREFIX = int(os.getenv('SUGGEST_PRECOMPUTED_PREFIX', '2'))
+
+SUGGEST_TYPES = ("anime", "character")
+
+VOCAB = "http://kagebunshin.org/vocab/"
+TITLE = VOCAB + "hasTitle"
+FULL_NAME = VOCAB + "hasFullName"
+ALT_NAME = VOCAB + "hasAltName"
+FOAF_NAME = "http://xmlns.com/foaf/0.1/name"
+
+
+class SuggestParamError(ValueError):
+    pass
+
+
+SuggestEntry = namedtuple("SuggestEntry", ["resource", "type_label", "label", "image", "popularity", "members"])
+
+
+def normalize(text):
+    return " ".join(search_tokens(text or ""))
+
+def to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+def parse_suggest_params(params):
+    """(search, type, limit) dari query string /suggest/."""
+    search = params.get("search", "")
+
+    type_label = params.get("type", "").strip().lower() or None
+    if type_label == "all":
+        type_label = None
+    if type_label is not None and type_label not in SUGGEST_TYPES:
+        raise SuggestParamError("Parameter 'type' harus 'anime', 'character', atau 'all'")
+
+    raw_limit = params.get("limit")
+    try:
+        limit = int(raw_limit) if raw_limit not in (None, "") else SUGGEST_DEFAULT_LIMIT
+    except ValueError:
+        raise SuggestParamError("Parameter 'limit' harus berupa angka")
+    if limit < 1:
+        raise SuggestParamError("Parameter 'limit' minimal 1")
+    return search, type_label, min(limit, SUGGEST_MAX_LIMIT)
+
+def suggestion(entry, matched):
+    item = {"resource": entry.resource, "typeLabel": entry.type_label, "label": entry.label}
+    if matched != entry.label:
+        item["matched"] = matched
+    if entry.image is not None:
+        item["image"] = entry.image
+    if entry.popularity is not None:
+        item["popularity"] = entry.popularity
+    if entry.members is not None:
+        item["members"] = entry.members
+    return item
+
+
+class SuggestIndex:
+    """Array key (label ternormalisasi mulai dari tiap awal kata) yang urut,
+    plus hasil teratas yang sudah dihitung untuk prefix pendek."""
+
+    def __init__(self, entries, labels):
+        """`entries` list SuggestEntry, `labels` list (entry id, label)."""
+        self.loaded_at = time.time()
+        self.entries = tuple(entries)
+
+        # rank popularitas per entry, makin kecil makin populer
+        order = sorted(
+            range(len(self.entries)),
+            key=lambda i: (
+                -(self.entries[i].members or 0),
+                self.entries[i].popularity if self.entries[i].popularity is not None else float("inf"),
+                self.entries[i].label,
+            ),
+        )
+        self.popularity_rank = array('I', [0]) * len(self.entries)
+        for rank, entry_id in enumerate(order):
+            self.popularity_rank[entry_id] = rank
+
+        keys = []
+        for entry_id, label in labels:
+            text = normalize(label)
+            if not text:
+                continue
+            starts = [0] + [i + 1 for i, ch in enumerate(text) if ch == " "]
+            for start in starts:
+                keys.append((text[start:], entry_id, label, start == 0))
+        keys.sort(key=lambda key: key[0])
+
+        self.keys = [key[0] for key in keys]
+        self.key_entry = array('I', (key[1] for key in keys))
+        self.key_label = [key[2] for key in keys]
+        self.key_at_start = [key[3] for key in keys]
+
+        self.precomputed = {}
+        if SUGGEST_PRECOMPUTED_PREFIX > 0:
+            groups = {}
+            for i, key in enumerate(self.keys):
+                for length in range(1, min(len(key), SUGGEST_PRECOMPUTED_PREFIX) + 1):
+                    groups.setdefault(key[:length], []).append(i)
+            for prefix, key_ids in groups.items():
+                for type_label in (None,) + SUGGEST_TYPES:
+                    self.precomputed[(prefix, type_label)] = self._best(key_ids, SUGGEST_MAX_LIMIT, type_label)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _best(self, key_ids, limit, type_label=None):
+        # satu hasil per entry: key terbaik (di awal label, lalu paling populer)
+        best = {}
+        for i in key_ids:
+            entry_id = self.key_entry[i]
+            if type_label is not None and self.entries[entry_id].type_label != type_label:
+                continue
+            order = (not self.key_at_start[i], self.popularity_rank[entry_id])
+            current = best.get(entry_id)
+            if current is None or order < current[0]:
+                best[entry_id] = (order, i)
+        ranked = sorted(best.values())[:limit]
+        return tuple(i for _, i in ranked)
+
+    def key_range(self, prefix):
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + "\uffff", start)
+        return range(start, end)
+
+    def suggest(self, search, limit=SUGGEST_DEFAULT_LIMIT, type_label=None):
+        prefix = normalize(search)
+        if not prefix:
+            return []
+
+        key_ids = self.precomputed.get((prefix, type_label))
+        if key_ids is None:
+            key_ids = self._best(self.key_range(prefix), limit, type_label)
+
+        return [
+            suggestion(self.entries[self.key_entry[i]], self.key_label[i])
+            for i in key_ids[:limit]
+        ]
+
+
+def load_suggest_index():
+    labels_result = stream_sparql(suggest_labels_query(), cache_ttl=0)
+    if "error" in labels_result:
+        raise RuntimeError(labels_result["error"])
+
+    labels = {}
+    for row in labels_result["rows"]:
+        resource, prop, value = row.get("resource"), row.get("prop"), row.get("value")
+        if resource is None or prop is None or not value:
+            continue
+        labels.setdefault(resource, {}).setdefault(prop, [])
+        if value not in labels[resource][prop]:
+            labels[resource][prop].append(value)
+
+    anime_result = run_sparql(anime_popularity_query(), cache_ttl=0)
+    if "error" in anime_result:
+        raise RuntimeError(anime_result["error"])
+    character_result = run_sparql(character_popularity_query(), cache_ttl=0)
+    if "error" in character_result:
+        raise RuntimeError(character_result["error"])
+
+    anime_info = {}
+    anime_rows = sparql_to_result_set(anime_result)
+    for uri, image, popularity, members in zip(
+        anime_rows.column("anime"), anime_rows.column("image"),
+        anime_rows.column("popularity"), anime_rows.column("members"),
+    ):
+        anime_info[uri] = (image, to_int(popularity), to_int(members))
+
+    character_info = {}
+    character_rows = sparql_to_result_set(character_result)
+    for uri, popularity, members in zip(
+        character_rows.column("char"), character_rows.column("popularity"), character_rows.column("members"),
+    ):
+        character_info[uri] = (None, to_int(popularity), to_int(members))
+
+    entries = []
+    entry_labels = []
+    for resource in sorted(labels):
+        props = labels[resource]
+        if props.get(TITLE):
+            type_label, main = "anime", props[TITLE][0]
+            image, popularity, members = anime_info.get(resource, (None, None, None))
+        elif props.get(FULL_NAME):
+            type_label, main = "character", props[FULL_NAME][0]
+            image, popularity, members = character_info.get(resource, (None, None, None))
+        else:
+            # bukan anime / karakter (misalnya studio)
+            continue
+
+        entry_id = len(entries)
+        entries.append(SuggestEntry(resource, type_label, main, image, popularity, members))
+        for prop in (TITLE, FULL_NAME, FOAF_NAME, ALT_NAME):
+            for label in props.get(prop, ()):
+                entry_labels.append((entry_id, label))
+
+    return SuggestIndex(entries, entry_labels)
+
+
+suggest_index = SnapshotHolder("suggest", load_suggest_index)
+
+def get_suggest_index(block=True):
+    """Index autocomplete saat ini, atau None kalau dimatikan / belum bisa di-load."""
+    if not SUGGEST_ENABLED:
+        return None
+    return suggest_index.get(block=block)
+
+def warm_suggest_index():
+    if SUGGEST_ENABLED:
+        suggest_index.warm()
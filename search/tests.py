@@ -1,3 +1,165 @@
-from django.test import TestCase
+import asyncio
+import random
+from difflib import SequenceMatcher
+from unittest import mock
 
-# Create your tests here.
+from django.http import JsonResponse, QueryDict
+from django.test import RequestFactory, SimpleTestCase
+
+from api.result_set import ResultSet
+from search.catalog import AnimeEntry, CatalogSnapshot, CharacterEntry
+from search.ranking import rank_results
+from search.versioning import DatasetVersion, conditional_on_dataset
+from search.views import ParamError, anime_infoboxes, format_anime_infobox, parse_pk, parse_pks
+
+
+def baseline_rank(rows, query, field):
+    """Implementasi awal rank_results: semua row dihitung ratio-nya lalu sort."""
+    ranked = []
+    for row in rows:
+        row = dict(row)
+        row["score"] = round(SequenceMatcher(None, row[field].lower(), query.lower()).ratio() * 100, 2)
+        ranked.append(row)
+    ranked.sort(key=lambda row: row["score"], reverse=True)
+    return ranked
+
+
+class RankResultsTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(8)
+        words = ["naruto", "shippuden", "one", "piece", "bleach", "boruto", "nar", "to", "", "Naruto"]
+        titles = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 3))) for _ in range(300)]
+        # judul kembar supaya ada banyak skor sama
+        self.rows = [{"id": i, "title": title} for i, title in enumerate(titles + titles[:50])]
+        self.queries = ["naruto", "NAR", "piece one", "x", ""]
+
+    def test_matches_baseline_without_limit(self):
+        for query in self.queries:
+            expected = baseline_rank(self.rows, query, "title")
+            actual = rank_results([dict(row) for row in self.rows], query, "title")
+            self.assertEqual(actual, expected, query)
+
+    def test_matches_baseline_with_limit(self):
+        for query in self.queries:
+            expected = baseline_rank(self.rows, query, "title")
+            for limit in (0, 1, 7, 50, len(self.rows), len(self.rows) + 5):
+                actual = rank_results([dict(row) for row in self.rows], query, "title", limit=limit)
+                self.assertEqual(actual, expected[:limit], (query, limit))
+
+    def test_result_set_matches_baseline(self):
+        result_set = ResultSet.from_rows(self.rows)
+        for query in self.queries:
+            expected = baseline_rank(self.rows, query, "title")
+            self.assertEqual(rank_results(result_set, query, "title").tolist(), expected, query)
+            self.assertEqual(rank_results(result_set, query, "title", limit=10).tolist(), expected[:10], query)
+
+
+class ParsePkTests(SimpleTestCase):
+    def test_valid_pk(self):
+        self.assertEqual(parse_pk(QueryDict("pk=%2012%20")), "12")
+        self.assertEqual(parse_pks(QueryDict("pk=1,2&pk=2,3")), ["1", "2", "3"])
+
+    def test_missing_pk(self):
+        for parse in (parse_pk, parse_pks):
+            with self.assertRaises(ParamError):
+                parse(QueryDict(""))
+
+    def test_pk_cannot_leave_iri(self):
+        for raw in ("1>%20%3Fs%20%3Fp%20%3Fo", "1%7D", "a%20b", "x%22", "a%5Cb"):
+            with self.assertRaises(ParamError, msg=raw):
+                parse_pk(QueryDict(f"pk={raw}"))
+            with self.assertRaises(ParamError, msg=raw):
+                parse_pks(QueryDict(f"pk={raw}"))
+
+    # 400 sebelum ada request ke GraphDB (versi dataset juga tidak dicek)
+    @mock.patch("search.versioning.DATASET_VERSION_ENABLED", False)
+    def test_infobox_views_reject_invalid_pk(self):
+        for path in ("/search/anime/pk/", "/search/character/pk/", "/search/async/anime/pk/", "/search/async/character/pk/"):
+            response = self.client.get(path, {"pk": "1> } ?s ?p ?o"}, HTTP_HOST="localhost")
+            self.assertEqual(response.status_code, 400, path)
+
+
+class CatalogSnapshotTests(SimpleTestCase):
+    def test_payload_in_uri_order(self):
+        # sama dengan ORDER BY ?anime / ?char di fallback SPARQL
+        anime = [AnimeEntry(f"http://kagebunshin.org/anime/{pk}", "", f"A{pk}", None, ("Isekai",)) for pk in ("3", "10", "2")]
+        characters = [CharacterEntry(f"http://kagebunshin.org/character/{pk}", pk, (), ()) for pk in ("b", "a")]
+        snapshot = CatalogSnapshot(anime, characters)
+        expected = sorted(entry.uri for entry in anime)
+        self.assertEqual([row["anime"] for row in snapshot.anime_payload], expected)
+        self.assertEqual([row["anime"] for row in snapshot.anime_by_theme("isekai")], expected)
+        self.assertEqual([row["char"] for row in snapshot.character_payload], [
+            "http://kagebunshin.org/character/a", "http://kagebunshin.org/character/b",
+        ])
+
+class SuggestViewTests(SimpleTestCase):
+    # worker tanpa index autocomplete menjawab 503, index di-load di background
+    def test_cold_index_not_loaded_inline(self):
+        with mock.patch("search.suggest.suggest_index") as holder:
+            holder.get.return_value = None
+            for path in ("/search/suggest/", "/search/async/suggest/"):
+                response = self.client.get(path, {"search": "nar"}, HTTP_HOST="localhost")
+                self.assertEqual(response.status_code, 503, path)
+        self.assertTrue(holder.get.called)
+        for call in holder.get.call_args_list:
+            self.assertEqual(call.kwargs, {"block": False})
+
+
+def sparql_result(rows):
+    return {"results": {"bindings": [
+        {key: {"type": "literal", "value": value} for key, value in row.items()} for row in rows
+    ]}}
+
+
+class AnimeInfoboxTests(SimpleTestCase):
+    def test_multi_valued_relations(self):
+        uri = "http://kagebunshin.org/anime/1"
+        results = {
+            "scalar": sparql_result([{"anime": uri, "title": "A"}]),
+            "genres": sparql_result([{"anime": uri, "value": "g1"}, {"anime": uri, "value": "g2"}]),
+            "themes": sparql_result([]),
+            "producers": sparql_result([]),
+            "studios": sparql_result([{"anime": uri, "value": "s1"}, {"anime": uri, "value": "s2"}]),
+            # karakter c1 punya dua full name, c2 tidak punya
+            "characters": sparql_result([
+                {"anime": uri, "char": "c1", "charName": "One"},
+                {"anime": uri, "char": "c1", "charName": "Uno"},
+                {"anime": uri, "char": "c2"},
+                {"anime": uri, "char": "c3", "charName": "Three"},
+            ]),
+            "release": sparql_result([]),
+        }
+        infobox = format_anime_infobox(anime_infoboxes(results)[uri])
+        self.assertEqual(infobox["genres"], ["g1", "g2"])
+        self.assertEqual(infobox["studio"], "s1")
+        self.assertEqual(infobox["studios"], ["s1", "s2"])
+        self.assertEqual(infobox["charactersUri"], ["c1", "c2", "c3"])
+        self.assertEqual(infobox["charactersName"], ["One", None, "Three"])
+
+
+class ConditionalOnDatasetTests(SimpleTestCase):
+    def setUp(self):
+        self.version = DatasetVersion("42", 1_700_000_000, 0, 1_700_000_000)
+
+    def test_async_view_not_modified(self):
+        calls = []
+
+        @conditional_on_dataset()
+        async def view(request):
+            return JsonResponse({"ok": True})
+
+        def get_version(block=True):
+            # dipanggil lewat sync_to_async, bukan di event loop
+            calls.append(block)
+            with self.assertRaises(RuntimeError):
+                asyncio.get_running_loop()
+            return self.version
+
+        factory = RequestFactory()
+        with mock.patch("search.versioning.get_dataset_version", get_version):
+            response = asyncio.run(view(factory.get("/x/")))
+            self.assertEqual(response.status_code, 200)
+            etag = response.headers["ETag"]
+            response = asyncio.run(view(factory.get("/x/", HTTP_IF_NONE_MATCH=etag)))
+            self.assertEqual(response.status_code, 304)
+        self.assertEqual(calls, [False, False])
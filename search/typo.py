@@ -0,0 +1,131 @@
+import os
+from collections import Counter
+
+from search.index import search_tokens
+
+# Koreksi typo untuk query_anime / query_character. Kalau filter substring
+# tidak menemukan apa pun, token yang tidak ada di index diganti dengan kata
+# terdekat (edit distance) dari judul anime / full name karakter, lalu
+# pencarian diulang dengan search yang sudah dikoreksi.
+#
+# Lookup kata memakai index deletion ala SymSpell: setiap kata disimpan di
+# bawah semua variasi hasil menghapus sampai TYPO_MAX_DISTANCE huruf dari
+# prefix-nya, sehingga kandidat untuk token typo cukup diambil dari variasi
+# deletion token itu sendiri, tanpa membandingkan ke semua kata.
+
+TYPO_MAX_DISTANCE = int(os.getenv('TYPO_MAX_DISTANCE', '2'))
+# hanya prefix sepanjang ini yang di-index, menghemat memori untuk kata panjang
+TYPO_PREFIX_LENGTH = int(os.getenv('TYPO_PREFIX_LENGTH', '7'))
+# token lebih pendek dari ini tidak dikoreksi
+TYPO_MIN_WORD_LENGTH = 3
+
+
+def deletes(word, max_distance):
+    """Semua string hasil menghapus 0 sampai `max_distance` huruf dari `word`."""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for item in frontier:
+            if len(item) <= 1:
+                continue
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        next_frontier -= results
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+def edit_distance(a, b, max_distance):
+    """Jarak Damerau-Levenshtein (optimal string alignment) antara `a` dan `b`.
+    Berhenti lebih awal dan return max_distance + 1 kalau sudah pasti lebih."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+def allowed_distance(token):
+    # kata pendek cukup 1 typo, supaya tidak berubah jadi kata lain yang mirip
+    return min(TYPO_MAX_DISTANCE, 1 if len(token) <= 4 else 2)
+
+
+class DeletionIndex:
+    """Index kata untuk lookup kata terdekat dalam edit distance tertentu."""
+
+    def __init__(self, words, max_distance=TYPO_MAX_DISTANCE, prefix_length=TYPO_PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.counts = Counter(word for word in words if len(word) >= TYPO_MIN_WORD_LENGTH)
+        self.words = tuple(self.counts)
+
+        index = {}
+        for word_id, word in enumerate(self.words):
+            for variant in deletes(word[:prefix_length], max_distance):
+                index.setdefault(variant, []).append(word_id)
+        self.index = {variant: tuple(ids) for variant, ids in index.items()}
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.counts
+
+    def lookup(self, term, max_distance=None):
+        """List (kata, jarak) dalam `max_distance`, urut dari jarak terkecil
+        lalu kata yang paling sering muncul."""
+        if max_distance is None:
+            max_distance = allowed_distance(term)
+        max_distance = min(max_distance, self.max_distance)
+        if term in self.counts:
+            return [(term, 0)]
+
+        candidates = set()
+        for variant in deletes(term[:self.prefix_length], max_distance):
+            candidates.update(self.index.get(variant, ()))
+
+        matches = []
+        for word_id in candidates:
+            word = self.words[word_id]
+            distance = edit_distance(term, word, max_distance)
+            if distance <= max_distance:
+                matches.append((word, distance))
+        matches.sort(key=lambda match: (match[1], -self.counts[match[0]], match[0]))
+        return matches
+
+
+def correct_search(search, words, index):
+    """`search` dengan token typo diganti kata terdekat di `words`.
+
+    Token yang sudah ditemukan di `index` (NgramIndex) dibiarkan. Return None
+    kalau tidak ada yang dikoreksi atau ada token yang tidak bisa dikoreksi.
+    """
+    corrected = []
+    changed = False
+    for token in search_tokens(search):
+        if len(token) < TYPO_MIN_WORD_LENGTH or index.search([token]):
+            corrected.append(token)
+            continue
+
+        matches = words.lookup(token)
+        if not matches:
+            return None
+        corrected.append(matches[0][0])
+        changed = True
+
+    return " ".join(corrected) if changed else None
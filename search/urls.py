@@ -1,5 +1,6 @@
 from django.urls import path
 from search.views import *
+from search import async_views
 
 app_name = 'search'
 urlpatterns = [
@@ -12,8 +13,27 @@ urlpatterns = [
     path('anime/query/', query_anime, name='query_anime'),
     path('character/query/', query_character, name='query_character'),
     path('all/query/', query_all, name='query_all'),
+    path('suggest/', suggest, name='suggest'),
 
     path('anime/pk/', get_anime_by_pk, name='get_anime_by_pk'),
     path('character/pk/', get_character_by_pk, name='get_character_by_pk'),
+    path('anime/pks/', get_anime_by_pks, name='get_anime_by_pks'),
+    path('character/pks/', get_character_by_pks, name='get_character_by_pks'),
     path('studio/pk/', get_studio_wd_by_name, name='get_studio_wd_by_name'),
+
+    # versi async, dipakai kalau deploy lewat ASGI
+    path('async/anime/', async_views.get_anime, name='async_get_anime'),
+    path('async/anime/theme/', async_views.get_anime_by_theme, name='async_get_anime_by_theme'),
+    path('async/character/', async_views.get_character, name='async_get_character'),
+
+    path('async/anime/query/', async_views.query_anime, name='async_query_anime'),
+    path('async/character/query/', async_views.query_character, name='async_query_character'),
+    path('async/all/query/', async_views.query_all, name='async_query_all'),
+    path('async/suggest/', async_views.suggest, name='async_suggest'),
+
+    path('async/anime/pk/', async_views.get_anime_by_pk, name='async_get_anime_by_pk'),
+    path('async/character/pk/', async_views.get_character_by_pk, name='async_get_character_by_pk'),
+    path('async/anime/pks/', async_views.get_anime_by_pks, name='async_get_anime_by_pks'),
+    path('async/character/pks/', async_views.get_character_by_pks, name='async_get_character_by_pks'),
+    path('async/studio/pk/', async_views.get_studio_wd_by_name, name='async_get_studio_wd_by_name'),
 ]
@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import os
+import time
+from collections import namedtuple
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from api.cache import shared_get, shared_set
+from api.sparql_client import repository_size, invalidate_sparql_cache
+from search.catalog import SnapshotHolder, catalog
+from search.fulltext import search_index
+from search.suggest import suggest_index
+
+logger = logging.getLogger(__name__)
+
+# Versi dataset untuk conditional GET. Stamp-nya jumlah statement di
+# repository GraphDB (endpoint /size), dicek ulang tiap
+# DATASET_VERSION_REFRESH_SECONDS di background. Response endpoint katalog dan
+# infobox diberi ETag (hash stamp + URL) dan Last-Modified (kapan stamp itu
+# pertama terlihat), lalu If-None-Match / If-Modified-Since yang masih cocok
+# langsung dijawab 304 tanpa query SPARQL.
+#
+# Kalau stamp berubah, cache hasil SPARQL dibuang dan snapshot katalog, index
+# full-text dan autocomplete diminta refresh, supaya body dengan ETag baru
+# memang berasal dari data baru.
+
+DATASET_VERSION_ENABLED = os.getenv('DATASET_VERSION_ENABLED', 'True') == 'True'
+DATASET_VERSION_REFRESH_SECONDS = int(os.getenv('DATASET_VERSION_REFRESH_SECONDS', '60'))
+# ikut di-hash ke ETag, ganti (misalnya dengan commit yang di-deploy) kalau
+# format response berubah walaupun datanya sama
+ETAG_SALT = os.getenv('ETAG_SALT', '')
+DATASET_CACHE_CONTROL = os.getenv('DATASET_CACHE_CONTROL', 'no-cache')
+
+DATASET_VERSION_KEY = "dataset:version"
+
+# modified_at: kapan stamp ini pertama terlihat (untuk Last-Modified),
+# changed_at: sama, tapi 0 kalau belum pernah ada stamp sebelumnya
+DatasetVersion = namedtuple("DatasetVersion", ["stamp", "modified_at", "changed_at", "loaded_at"])
+
+_last_stamp = None
+
+def on_dataset_changed(first):
+    # proses pertama yang melihat perubahan menaikkan generasi cache SPARQL
+    # bersama dan meminta semua worker refresh snapshot, proses lain cukup
+    # membuang cache lokalnya
+    invalidate_sparql_cache(local_only=not first)
+    if first:
+        for holder in (catalog, search_index, suggest_index):
+            holder.request_refresh()
+
+def load_dataset_version():
+    global _last_stamp
+
+    result = repository_size()
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    stamp = str(result["size"])
+
+    shared = shared_get(DATASET_VERSION_KEY)
+    if shared is not None and shared.get("stamp") == stamp:
+        if _last_stamp is not None and _last_stamp != stamp:
+            on_dataset_changed(first=False)
+    else:
+        now = time.time()
+        if shared is not None:
+            logger.info("Dataset berubah: %s -> %s", shared.get("stamp"), stamp)
+            on_dataset_changed(first=True)
+        shared = {"stamp": stamp, "modifiedAt": now, "changedAt": now if shared is not None else 0}
+        shared_set(DATASET_VERSION_KEY, shared, 365 * 24 * 3600)
+
+    _last_stamp = stamp
+    return DatasetVersion(stamp, shared["modifiedAt"], shared.get("changedAt", 0), time.time())
+
+
+dataset_version = SnapshotHolder(
+    "dataset_version", load_dataset_version, refresh_seconds=DATASET_VERSION_REFRESH_SECONDS,
+)
+
+def get_dataset_version(block=True):
+    """Versi dataset saat ini, atau None kalau dimatikan / GraphDB tidak bisa dicek."""
+    if not DATASET_VERSION_ENABLED:
+        return None
+    return dataset_version.get(block=block)
+
+def warm_dataset_version():
+    if DATASET_VERSION_ENABLED:
+        dataset_version.warm()
+
+def dataset_etag(request, version):
+    key = f"{ETAG_SALT}|{version.stamp}|{request.get_full_path()}"
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def conditional_on_dataset(snapshot=None):
+    """Decorator conditional GET untuk view yang hasilnya hanya bergantung pada
+    URL dan isi dataset. Pasang di luar @api_view / @require_GET.
+
+    Kalau view dilayani dari `snapshot` (SnapshotHolder), ETag hanya dipasang
+    setelah snapshot itu di-load ulang sejak dataset terakhir berubah.
+    """
+
+    def precondition(request, block):
+        if request.method not in ("GET", "HEAD"):
+            return None, None
+        version = get_dataset_version(block=block)
+        if version is None:
+            return None, None
+        etag = dataset_etag(request, version)
+        response = get_conditional_response(request, etag=etag, last_modified=int(version.modified_at))
+        return response, version
+
+    def tag(request, response, version):
+        response.headers.setdefault("ETag", dataset_etag(request, version))
+        if not response.has_header("Last-Modified"):
+            response.headers["Last-Modified"] = http_date(int(version.modified_at))
+        if DATASET_CACHE_CONTROL and not response.has_header("Cache-Control"):
+            response.headers["Cache-Control"] = DATASET_CACHE_CONTROL
+        return response
+
+    def finish(request, response, version):
+        if version is None or response.status_code != 200:
+            return response
+        if snapshot is not None:
+            loaded_at = snapshot.loaded_at
+            if loaded_at is not None and loaded_at < version.changed_at:
+                return response
+        return tag(request, response, version)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            # get_dataset_version membaca cache bersama (disk), jangan di event loop
+            aprecondition = sync_to_async(precondition)
+
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                not_modified, version = await aprecondition(request, block=False)
+                if not_modified is not None:
+                    return tag(request, not_modified, version)
+                return finish(request, await view(request, *args, **kwargs), version)
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                not_modified, version = precondition(request, block=True)
+                if not_modified is not None:
+                    return tag(request, not_modified, version)
+                return finish(request, view(request, *args, **kwargs), version)
+        return inner
+
+    return decorator
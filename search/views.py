@@ -1,20 +1,42 @@
 from rest_framework.decorators import api_view
 from rest_framework import status
-from api.sparql_client import run_sparql
-from api.views import sparql_to_json
-from kagebunshin.common.utils import api_response
-from difflib import SequenceMatcher
-import requests
+from api.sparql_client import run_sparql, run_sparql_many
+from api.views import sparql_to_json, sparql_to_result_set
+from kagebunshin.common.pagination import parse_pagination, PaginationError
+from kagebunshin.common.utils import api_response, str_to_list
+from search.catalog import catalog, get_catalog
+from search.fulltext import get_search_index, rank_search_rows
+from search.ranking import rank_results
+from search.suggest import get_suggest_index, parse_suggest_params, SuggestParamError
+from search.versioning import conditional_on_dataset
+from search.studio import WikidataError, cached_studio, fetch_studio, studio_name_from_pk
+from search.queries import (
+    anime_list_query, anime_by_theme_query, character_list_query,
+    anime_search_query, character_search_query, all_search_query,
+    paginated, anime_uri, character_uri, anime_infobox_queries, character_infobox_queries,
+    studio_local_anime_query,
+)
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import os
 import re
-from difflib import SequenceMatcher
-import requests
 import json
 
 # pakai run_sparql dari api/sparql_client.py untuk ambil data dari GraphDB
 # pakai sparql_to_json dari api/views.py untuk ratain (mempermudah) hasil SPARQL ke JSON biasa
+# untuk hasil yang banyak row-nya pakai sparql_to_result_set (ResultSet, disimpan per kolom)
 # return dibungkus pake api_response dari kagebunshin/common/utils.py biar konsisten
+# query SPARQL-nya ada di search/queries.py supaya bisa dipakai juga oleh search/async_views.py
 # jangan lupa bikin .env
 
+# TTL cache hasil SPARQL per jenis endpoint (detik), 0 berarti tidak di-cache
+CACHE_TTL_LIST = int(os.getenv('CACHE_TTL_LIST', '600'))
+CACHE_TTL_SEARCH = int(os.getenv('CACHE_TTL_SEARCH', '120'))
+CACHE_TTL_INFOBOX = int(os.getenv('CACHE_TTL_INFOBOX', '600'))
+
+# jumlah resource yang dikembalikan query_all kalau tidak pakai pagination
+QUERY_ALL_TOP_K = int(os.getenv('QUERY_ALL_TOP_K', '50'))
+
 @api_view(['GET'])
 def get_data(request):
     query = """
@@ -32,438 +54,326 @@ def get_data(request):
     data = sparql_to_json(result)
     return api_response(status.HTTP_200_OK, "Berhasil ambil data", data)
 
-def str_to_list(str):
-    return [s.strip() for s in str.split(",") if s.strip()]
-
-@api_view(['GET'])
-def get_anime(request):
-    query = """
-    PREFIX v: <http://kagebunshin.org/vocab/>
+# hasil GROUP_CONCAT dipecah jadi list, `data` berupa ResultSet
+def format_anime_rows(data):
+    return data.map_column("themes", str_to_list)
+
+def format_character_rows(data):
+    return data.map_column("animeList", str_to_list)
+
+# RESPONSE
+# Parsing parameter, query fallback dan isi response dipakai bersama oleh view
+# sync di sini dan view async di search/async_views.py. Helper mengembalikan
+# (status, message, data, meta) yang dibungkus api_response / json_api_response.
+
+class ParamError(ValueError):
+    pass
+
+def required_param(params, name):
+    value = params.get(name, "").strip()
+    if not value:
+        raise ParamError(f"Parameter '{name}' wajib diisi")
+    return value
+
+def ok(data, meta=None, message="Berhasil ambil data"):
+    return status.HTTP_200_OK, message, data, meta
+
+def bad_request(error):
+    return status.HTTP_400_BAD_REQUEST, str(error), None, None
+
+def sparql_error(result, message="Gagal ambil data"):
+    return status.HTTP_500_INTERNAL_SERVER_ERROR, message, result, None
+
+# PAGINATION
+# tanpa limit/offset/cursor (page None) semua data dikembalikan seperti biasa
+
+def page_rows(rows, page):
+    """Potong list lengkap sesuai page, total diketahui."""
+    if page is None:
+        return rows, None
+    data = page.slice(rows)
+    return data, page.meta(len(data), total=len(rows))
+
+def ranked_page(rows, search, field, page):
+    """Ranking di Python lalu potong, cukup ambil top (offset + limit)."""
+    if page is None:
+        return rank_results(rows, search, field), None
+    data = rank_results(rows, search, field, limit=page.end)[page.offset:]
+    return data, page.meta(len(data), total=len(rows))
+
+def sparql_page(rows, page):
+    """Rows dari query yang sudah dibungkus `paginated` (limit + 1 row)."""
+    if page is None:
+        return rows, None
+    has_more = len(rows) > page.limit
+    data = rows[:page.limit]
+    return data, page.meta(len(data), has_more=has_more)
+
+def correction_meta(meta, correction):
+    # kasih tahu client kalau hasilnya dari search yang sudah dikoreksi typo-nya
+    if correction is None:
+        return meta
+    meta = dict(meta or {})
+    meta["correctedSearch"] = correction
+    return meta
+
+def top_k_page(rows, total, page):
+    """Rows top (offset + limit) hasil ranking, total dari jumlah kandidat."""
+    if page is None:
+        return rows, None
+    data = rows[page.offset:]
+    return data, page.meta(len(data), total=total)
+
+# endpoint list (anime, anime/theme, character)
+
+def list_query(query, page, order_by):
+    return paginated(query, page, order_by) if page is not None else query
+
+def list_result(result, page, formatter):
+    if "error" in result:
+        return sparql_error(result)
+    data, meta = sparql_page(sparql_to_result_set(result), page)
+    return ok(formatter(data), meta)
 
-    SELECT ?anime ?image ?title ?year (GROUP_CONCAT(DISTINCT ?themeAll; separator=",") AS ?themes)
-    WHERE {
-      ?anime v:hasImage ?image ;
-             v:hasTitle ?title ;
-             v:hasTheme ?themeAll ;
-             v:isReleased ?releaseNode .
-
-      OPTIONAL {
-        ?releaseNode v:releasedYear ?year .
-      }
-    }
-    GROUP BY ?anime ?image ?title ?year
-    """
+# endpoint search (anime/query, character/query, all/query)
 
-    result = run_sparql(query)
+def tolerant_search_result(rows, correction, search, field, page):
+    """Response dari hasil search_*_tolerant snapshot katalog."""
+    data, meta = ranked_page(rows, correction or search, field, page)
+    return ok(data, correction_meta(meta, correction))
 
+def search_result(result, search, field, page, formatter):
     if "error" in result:
-        return api_response(
-            status.HTTP_500_INTERNAL_SERVER_ERROR,
-            "Gagal ambil data",
-            result
-        )
+        return sparql_error(result)
+    data, meta = ranked_page(sparql_to_result_set(result), search, field, page)
+    return ok(formatter(data), meta)
 
-    data = sparql_to_json(result)
-    for item in data:
-        if "themes" in item:
-            item["themes"] = str_to_list(item["themes"])
+def query_all_limit(page):
+    # tanpa pagination cukup top-k, dengan pagination top (offset + limit)
+    return QUERY_ALL_TOP_K if page is None else page.end
 
-    return api_response(status.HTTP_200_OK, "Berhasil ambil data", data)
+def query_all_result(result, search, page):
+    """Response query_all dari hasil SPARQL (index full-text belum siap)."""
+    if "error" in result:
+        return sparql_error(result)
+    rows, total = rank_search_rows(sparql_to_result_set(result), search, query_all_limit(page))
+    return ok(*top_k_page(rows, total, page))
 
+@conditional_on_dataset(catalog)
 @api_view(['GET'])
-def get_anime_by_theme(request):
-    theme = request.GET.get("theme", "").strip()
-
-    if not theme:
-        return api_response(
-            status.HTTP_400_BAD_REQUEST,
-            "Parameter 'theme' wajib diisi",
-            None
-        )
-
-    filter_theme = f"""
-    FILTER EXISTS {{
-      ?anime v:hasTheme ?t .
-      FILTER(LCASE(?t) = LCASE("{theme}"))
-    }}
-    """
-
-    query = f"""
-    PREFIX v: <http://kagebunshin.org/vocab/>
+def get_anime(request):
+    try:
+        page = parse_pagination(request.GET)
+    except PaginationError as e:
+        return api_response(*bad_request(e))
 
-    SELECT ?anime ?image ?title ?year
-           (GROUP_CONCAT(DISTINCT ?themeAll; separator=",") AS ?themes)
-    WHERE {{
-      ?anime v:hasImage ?image ;
-             v:hasTitle ?title ;
-             v:hasTheme ?themeAll ;
-             v:isReleased ?releaseNode .
+    snapshot = get_catalog()
+    if snapshot is not None:
+        return api_response(*ok(*page_rows(snapshot.anime_payload, page)))
 
-      OPTIONAL {{
-        ?releaseNode v:releasedYear ?year .
-      }}
+    result = run_sparql(list_query(anime_list_query(), page, "?anime"), cache_ttl=CACHE_TTL_LIST)
+    return api_response(*list_result(result, page, format_anime_rows))
 
-      {filter_theme}
-    }}
-    GROUP BY ?anime ?image ?title ?year
-    """
-
-    result = run_sparql(query)
+@conditional_on_dataset(catalog)
+@api_view(['GET'])
+def get_anime_by_theme(request):
+    try:
+        theme = required_param(request.GET, "theme")
+        page = parse_pagination(request.GET)
+    except (ParamError, PaginationError) as e:
+        return api_response(*bad_request(e))
 
-    if "error" in result:
-        return api_response(
-            status.HTTP_500_INTERNAL_SERVER_ERROR,
-            "Gagal ambil data",
-            result
-        )
+    snapshot = get_catalog()
+    if snapshot is not None:
+        return api_response(*ok(*page_rows(snapshot.anime_by_theme(theme), page)))
 
-    data = sparql_to_json(result)
-    for item in data:
-        if "themes" in item:
-            item["themes"] = str_to_list(item["themes"])
-    return api_response(status.HTTP_200_OK, "Berhasil ambil data", data)
+    result = run_sparql(list_query(anime_by_theme_query(theme), page, "?anime"), cache_ttl=CACHE_TTL_LIST)
+    return api_response(*list_result(result, page, format_anime_rows))
 
+@conditional_on_dataset(catalog)
 @api_view(['GET'])
 def get_character(request):
-    query = """
-    PREFIX v: <http://kagebunshin.org/vocab/>
-    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
-
-    SELECT ?char ?name (GROUP_CONCAT(DISTINCT ?title; separator=", ") AS ?animeList)
-    WHERE {
-      ?anime v:hasCharacter ?char ;
-        v:hasTitle ?title .
-
-      ?char foaf:name ?name .
-    }
-    GROUP BY ?char ?name
-
-    """
-    result = run_sparql(query) 
-
-    if "error" in result:
-        return api_response(status.HTTP_500_INTERNAL_SERVER_ERROR, "Gagal ambil data", result)
-    
-    data = sparql_to_json(result)
-    for item in data:
-      if "animeList" in item:
-          item["animeList"] = str_to_list(item["animeList"])
-    return api_response(status.HTTP_200_OK, "Berhasil ambil data", data)
-
-def rank_results(results, query, field):
-    def similarity(a, b):
-        return SequenceMatcher(None, a, b).ratio()
-    
-    ranked_results = []
-    q = query.lower()
-
-    for row in results:
-        value = row.get(field, "").lower()
-        score = similarity(value, q) * 100
-        row['score'] = round(score, 2)
-        ranked_results.append(row)
-    
-    ranked_results.sort(key=lambda x: x['score'], reverse=True)
-    return ranked_results
-
-def sparql_anime(filter_title):
-    return f"""
-    PREFIX v: <http://kagebunshin.org/vocab/>
-
-    SELECT ?anime ?image ?title ?year
-           (GROUP_CONCAT(DISTINCT ?themeAll; separator=",") AS ?themes)
-    WHERE {{
-      ?anime v:hasImage ?image ;
-             v:hasTitle ?title ;
-             v:hasTheme ?themeAll ;
-             v:isReleased ?releaseNode .
-
-      OPTIONAL {{
-        ?releaseNode v:releasedYear ?year .
-      }}
-
-      {filter_title}
-    }}
-    GROUP BY ?anime ?image ?title ?year
-    """
+    try:
+        page = parse_pagination(request.GET)
+    except PaginationError as e:
+        return api_response(*bad_request(e))
 
-def sparql_anime_by_theme(filter_title, theme):
-    filter_theme = f"""
-    FILTER EXISTS {{
-      ?anime v:hasTheme ?t .
-      FILTER(CONTAINS(LCASE(?t), LCASE("{theme}")))
-    }}
-    """
+    snapshot = get_catalog()
+    if snapshot is not None:
+        return api_response(*ok(*page_rows(snapshot.character_payload, page)))
 
-    return f"""
-    PREFIX v: <http://kagebunshin.org/vocab/>
-
-    SELECT ?anime ?image ?title ?year
-           (GROUP_CONCAT(DISTINCT ?themeAll; separator=",") AS ?themes)
-    WHERE {{
-      ?anime v:hasImage ?image ;
-             v:hasTitle ?title ;
-             v:hasTheme ?themeAll ;
-             v:isReleased ?releaseNode .
-
-      OPTIONAL {{
-        ?releaseNode v:releasedYear ?year .
-      }}
-
-      {filter_title}
-      {filter_theme}
-    }}
-    GROUP BY ?anime ?image ?title ?year
-    """
+    result = run_sparql(list_query(character_list_query(), page, "?char"), cache_ttl=CACHE_TTL_LIST)
+    return api_response(*list_result(result, page, format_character_rows))
 
 @api_view(['GET'])
 def query_anime(request):
     search = request.GET.get("search", "")
     theme = request.GET.get("theme", "")
 
-    # Token search
-    normalized = re.sub(r"[^a-zA-Z0-9 ]+", " ", search.lower()).strip()
-    tokens = [t for t in normalized.split() if t]
-
-    # No space search
-    search_no_space = re.sub(r"[^a-zA-Z0-9]+", "", search.lower()).strip()
-
-    token_filters = "\n".join(
-        [f'FILTER(CONTAINS(REPLACE(LCASE(?title), "[^a-z0-9]", ""), "{token}"))'
-         for token in tokens]
-    ) if tokens else ""
-
-    exact_filter = ""
-    if search_no_space and " " not in search:
-        exact_filter = f'''
-        FILTER(CONTAINS(
-            REPLACE(LCASE(?title), "[^a-z0-9]", ""), 
-            "{search_no_space}"
-        ))
-        '''
-    
-    all_filters = token_filters + "\n" + exact_filter
-
-    if theme:
-      query = sparql_anime_by_theme(all_filters, theme)
-    else:
-      query = sparql_anime(all_filters)
-
-    result = run_sparql(query)
-
-    if "error" in result:
-      return api_response(
-        status.HTTP_500_INTERNAL_SERVER_ERROR,
-        "Gagal ambil data",
-        result
-      )
-
-    data = sparql_to_json(result)
-    data = rank_results(data, search, "title")
+    try:
+        page = parse_pagination(request.GET)
+    except PaginationError as e:
+        return api_response(*bad_request(e))
 
-    for item in data:
-        item["themes"] = [g.strip() for g in item["themes"].split(",") if g.strip()]
+    snapshot = get_catalog()
+    if snapshot is not None:
+        rows, correction = snapshot.search_anime_tolerant(search, theme)
+        return api_response(*tolerant_search_result(rows, correction, search, "title", page))
 
-    return api_response(status.HTTP_200_OK, "Berhasil ambil data", data)
+    result = run_sparql(anime_search_query(search, theme), cache_ttl=CACHE_TTL_SEARCH)
+    return api_response(*search_result(result, search, "title", page, format_anime_rows))
 
 @api_view(['GET'])
 def query_character(request):
     search = request.GET.get("search", "")
 
-    # Token search
-    normalized = re.sub(r"[^a-zA-Z0-9 ]+", " ", search.lower()).strip()
-    tokens = [t for t in normalized.split() if t]
-
-    # No space search
-    search_no_space = re.sub(r"[^a-zA-Z0-9]+", "", search.lower()).strip()
-
-    token_filters = "\n".join(
-        [f'FILTER(CONTAINS(REPLACE(LCASE(?fullName), "[^a-z0-9]", ""), "{token}"))'
-         for token in tokens]
-    ) if tokens else ""
-
-    exact_filter = ""
-    if search_no_space and " " not in search:
-        exact_filter = f'''
-        FILTER(CONTAINS(
-            REPLACE(LCASE(?fullName), "[^a-z0-9]", ""), 
-            "{search_no_space}"
-        ))
-        '''
-
-    all_filters = token_filters + "\n" + exact_filter
-
-    query = f"""
-    PREFIX v: <http://kagebunshin.org/vocab/>
-    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
-
-    SELECT ?char ?name (GROUP_CONCAT(DISTINCT ?title; separator=", ") AS ?animeList)
-    WHERE {{
-      ?anime v:hasCharacter ?char ;
-             v:hasTitle ?title .
-
-      ?char foaf:name ?name ;
-            v:hasFullName ?fullName .
-
-      {all_filters}
-    }}
-    GROUP BY ?char ?name ?fullName
-    """
-
-    result = run_sparql(query)
-
-    if "error" in result:
-        return api_response(status.HTTP_500_INTERNAL_SERVER_ERROR, "Gagal ambil data", result)
-    
-    data = sparql_to_json(result)
-    data = rank_results(data, search, "name")
+    try:
+        page = parse_pagination(request.GET)
+    except PaginationError as e:
+        return api_response(*bad_request(e))
 
-    for item in data:
-        if "animeList" in item:
-            item["animeList"] = str_to_list(item["animeList"])
+    snapshot = get_catalog()
+    if snapshot is not None:
+        rows, correction = snapshot.search_characters_tolerant(search)
+        return api_response(*tolerant_search_result(rows, correction, search, "name", page))
 
-    return api_response(status.HTTP_200_OK, "Berhasil ambil data", data)
+    result = run_sparql(character_search_query(search), cache_ttl=CACHE_TTL_SEARCH)
+    return api_response(*search_result(result, search, "name", page, format_character_rows))
 
 @api_view(['GET'])
 def query_all(request):
     search = request.GET.get("search", "")
 
-    query = f"""
-    PREFIX v: <http://kagebunshin.org/vocab/>
-    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
-    PREFIX vcard: <http://www.w3.org/2006/vcard/ns#>
-
-    SELECT DISTINCT 
-        ?resource
-        ?typeLabel
-        ?title
-        ?image
-        ?fullName
-
-    WHERE {{
-      VALUES ?prop {{
-        v:hasTitle
-        v:hasDesc
-        v:hasImage
-        v:hasType
-        v:hasStatus
-        v:hasSource
-        v:hasGenre
-        v:hasTheme
-        v:hasStudio
-        v:hasProducer
-        v:hasRating
-        v:hasCharacter
-        v:hasDemographic
-
-        vcard:hasURL
-        foaf:name
-        v:hasAltName
-        v:hasDescription
-        v:hasFullName
-        v:hasAttributes
-      }}
-
-      ?resource ?prop ?value .
-
-      FILTER(CONTAINS(LCASE(STR(?value)), LCASE("{search}")))
-        
-      OPTIONAL {{ ?resource v:hasTitle ?title . }}
-      OPTIONAL {{ ?resource v:hasImage ?image . }}
-
-      OPTIONAL {{ ?resource v:hasFullName ?fullName . }} 
-      
-      BIND(
-        IF(BOUND(?title), "anime",
-          IF(BOUND(?fullName), "character", "unknown")
-        ) AS ?typeLabel
-      )
-    }}
-    """
-
-    result = run_sparql(query)
-
-    if "error" in result:
-        return api_response(status.HTTP_500_INTERNAL_SERVER_ERROR, "Gagal ambil data", result)
-    
-    data = sparql_to_json(result)
-
-    return api_response(status.HTTP_200_OK, "Berhasil ambil data", data)
+    try:
+        page = parse_pagination(request.GET)
+    except PaginationError as e:
+        return api_response(*bad_request(e))
 
-def clean_anime(anime_str):
-    return [a.strip() for a in anime_str.split(",") if a.strip()]
+    index = get_search_index()
+    if index is not None:
+        rows, total = index.search(search, query_all_limit(page))
+        return api_response(*ok(*top_k_page(rows, total, page)))
 
-# INFO BOX
+    result = run_sparql(all_search_query(search), cache_ttl=CACHE_TTL_SEARCH)
+    return api_response(*query_all_result(result, search, page))
 
 @api_view(['GET'])
-def get_anime_by_pk(request):
-    pk = request.GET.get("pk", "").strip()
-    if not pk:
-        return api_response(status.HTTP_400_BAD_REQUEST, "Parameter 'pk' wajib diisi", None)
-
-    uri = f"http://kagebunshin.org/anime/{pk}"
-
-    query = f"""
-    PREFIX v: <http://kagebunshin.org/vocab/>
-    PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
-    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
-
-        SELECT ?anime ?title ?desc ?image ?type ?episodes ?status ?premiered ?duration ?rating ?score ?rank ?popularity ?members ?favorites ?source ?studio
-          (GROUP_CONCAT(DISTINCT ?genre; separator=",") AS ?genres)
-          (GROUP_CONCAT(DISTINCT ?theme; separator=",") AS ?themes)
-          (GROUP_CONCAT(DISTINCT ?producer; separator=",") AS ?producers)
-          (GROUP_CONCAT(DISTINCT STR(?char); separator=",") AS ?charactersUri)
-          (GROUP_CONCAT(DISTINCT COALESCE(?charName, ""); separator=",") AS ?charactersName)
-          ?year ?season
-    WHERE {{
-      VALUES ?anime {{ <{uri}> }}
-
-      OPTIONAL {{ ?anime v:hasTitle ?title . }}
-      OPTIONAL {{ ?anime v:hasDesc ?desc . }}
-      OPTIONAL {{ ?anime v:hasImage ?image . }}
-      OPTIONAL {{ ?anime v:hasType ?type . }}
-      OPTIONAL {{ ?anime v:hasEpisodes ?episodes . }}
-      OPTIONAL {{ ?anime v:hasStatus ?status . }}
-      OPTIONAL {{ ?anime v:isPremiered ?premiered . }}
-      OPTIONAL {{ ?anime v:hasDuration ?duration . }}
-      OPTIONAL {{ ?anime v:hasRating ?rating . }}
-      OPTIONAL {{ ?anime v:hasScore ?score . }}
-      OPTIONAL {{ ?anime v:isRanked ?rank . }}
-      OPTIONAL {{ ?anime v:isPopularity ?popularity . }}
-      OPTIONAL {{ ?anime v:hasMembers ?members . }}
-      OPTIONAL {{ ?anime v:hasFavorites ?favorites . }}
-      OPTIONAL {{ ?anime v:hasSource ?source . }}
-      OPTIONAL {{ ?anime v:hasStudio ?studio . }}
-      OPTIONAL {{ ?anime v:hasProducer ?producer . }}
-      OPTIONAL {{ ?anime v:hasGenre ?genre . }}
-      OPTIONAL {{ ?anime v:hasTheme ?theme . }}
-      OPTIONAL {{ ?anime v:hasCharacter ?char . }}
-      OPTIONAL {{ ?char v:hasFullName ?charName . }}
-
-      OPTIONAL {{
-        ?anime v:isReleased ?releaseNode .
-        OPTIONAL {{ ?releaseNode v:releasedYear ?year . }}
-        OPTIONAL {{ ?releaseNode v:releasedSeason ?season . }}
-      }}
-    }}
-    GROUP BY ?anime ?title ?desc ?image ?type ?episodes ?status ?premiered ?duration ?rating ?score ?rank ?popularity ?members ?favorites ?source ?studio ?year ?season
-    LIMIT 1
-    """
+def suggest(request):
+    try:
+        search, type_label, limit = parse_suggest_params(request.GET)
+    except SuggestParamError as e:
+        return api_response(*bad_request(e))
 
-    result = run_sparql(query)
-    if "error" in result:
-        return api_response(status.HTTP_500_INTERNAL_SERVER_ERROR, "Gagal ambil data anime", result)
+    # autocomplete hanya dari index lokal, tidak ada fallback ke GraphDB; di
+    # worker yang belum punya index, index di-load di background
+    index = get_suggest_index(block=False)
+    if index is None:
+        return api_response(status.HTTP_503_SERVICE_UNAVAILABLE, "Index autocomplete belum tersedia", None)
 
-    items = sparql_to_json(result)
-    if not items:
-        return api_response(status.HTTP_404_NOT_FOUND, "Anime tidak ditemukan", None)
+    return api_response(*ok(index.suggest(search, limit, type_label)))
 
-    item = items[0]
+# INFO BOX
 
-    def split_field(val):
-        return [v.strip() for v in val.split(",") if v.strip()] if val else []
+# batas jumlah pk untuk endpoint infobox batch (anime/pks, character/pks)
+INFOBOX_BATCH_MAX = int(os.getenv('INFOBOX_BATCH_MAX', '100'))
+# karakter yang tidak boleh ada di IRI, pk dipakai langsung di <...>
+INVALID_PK_CHARS = re.compile(r'[\s<>"{}|^`\\]')
+
+class PkListError(ParamError):
+    pass
+
+def parse_pk(params):
+    """pk tunggal dari ?pk=..., dicek sama seperti parse_pks."""
+    pk = required_param(params, "pk")
+    if INVALID_PK_CHARS.search(pk):
+        raise ParamError(f"pk tidak valid: {pk}")
+    return pk
+
+def parse_pks(params):
+    """pk unik dari ?pk=1,2,3 (parameter pk boleh diulang), urutan dipertahankan."""
+    pks = []
+    for value in params.getlist("pk"):
+        pks.extend(str_to_list(value))
+    pks = list(dict.fromkeys(pks))
+
+    if not pks:
+        raise PkListError("Parameter 'pk' wajib diisi")
+    if len(pks) > INFOBOX_BATCH_MAX:
+        raise PkListError(f"Maksimal {INFOBOX_BATCH_MAX} pk per request")
+    invalid = [pk for pk in pks if INVALID_PK_CHARS.search(pk)]
+    if invalid:
+        raise PkListError(f"pk tidak valid: {', '.join(invalid)}")
+    return pks
+
+def infobox_map(items, pks, uri_for, formatter):
+    """{pk: infobox} untuk semua `pks`, None kalau tidak ditemukan."""
+    return {
+        pk: formatter(items[uri_for(pk)]) if uri_for(pk) in items else None
+        for pk in pks
+    }
 
-    anime = {
+def infobox_error(results):
+    """Result pertama yang error dari hasil run_sparql_many, atau None."""
+    for result in results.values():
+        if "error" in result:
+            return result
+    return None
+
+def rows_by(result, key):
+    groups = {}
+    for row in sparql_to_json(result):
+        groups.setdefault(row.get(key), []).append(row)
+    return groups
+
+def distinct_values(rows, field):
+    return list(dict.fromkeys(row[field] for row in rows if row.get(field)))
+
+def first_values(rows, key, field):
+    """{key: value pertama} per `key` yang unik, urutan dipertahankan. Key
+    tanpa value tetap ada dengan value None."""
+    values = {}
+    for row in rows:
+        if row.get(key) and values.get(row[key]) is None:
+            values[row[key]] = row.get(field)
+    return values
+
+def anime_infoboxes(results):
+    """{uri: item} dari hasil anime_infobox_queries, item untuk format_anime_infobox."""
+    relations = {
+        name: rows_by(results[name], "anime")
+        for name in ("genres", "themes", "producers", "studios", "characters", "release")
+    }
+    items = {}
+    for uri, rows in rows_by(results["scalar"], "anime").items():
+        item = dict(rows[0])
+        for name in ("genres", "themes", "producers", "studios"):
+            item[name] = distinct_values(relations[name].get(uri, []), "value")
+        item["studio"] = item["studios"][0] if item["studios"] else None
+
+        # satu nama per karakter supaya index charactersUri dan charactersName sejajar
+        characters = first_values(relations["characters"].get(uri, []), "char", "charName")
+        item["charactersUri"] = list(characters)
+        item["charactersName"] = list(characters.values())
+
+        release = relations["release"].get(uri)
+        if release:
+            item["year"] = release[0].get("year")
+            item["season"] = release[0].get("season")
+        items[uri] = item
+    return items
+
+def character_infoboxes(results):
+    """{uri: item} dari hasil character_infobox_queries."""
+    anime_lists = rows_by(results["animeList"], "char")
+    items = {}
+    for uri, rows in rows_by(results["scalar"], "char").items():
+        item = dict(rows[0])
+        item["animeList"] = distinct_values(anime_lists.get(uri, []), "value")
+        items[uri] = item
+    return items
+
+def format_anime_infobox(item):
+    return {
         "uri": item.get("anime"),
         "title": item.get("title"),
         "description": item.get("desc"),
@@ -481,61 +391,57 @@ def get_anime_by_pk(request):
         "favorites": item.get("favorites"),
         "source": item.get("source"),
         "studio": item.get("studio"),
-        "producers": split_field(item.get("producers")),
-        "genres": split_field(item.get("genres")),
-        "themes": split_field(item.get("themes")),
-        "charactersUri": split_field(item.get("charactersUri")),
-        "charactersName": split_field(item.get("charactersName")),
+        "studios": item.get("studios", []),
+        "producers": item.get("producers", []),
+        "genres": item.get("genres", []),
+        "themes": item.get("themes", []),
+        "charactersUri": item.get("charactersUri", []),
+        "charactersName": item.get("charactersName", []),
         "releasedYear": item.get("year"),
         "releasedSeason": item.get("season"),
     }
 
-    return api_response(status.HTTP_200_OK, "Berhasil ambil data anime", anime)
-
-@api_view(['GET'])
-def get_character_by_pk(request):
-    pk = request.GET.get("pk", "").strip()
-    if not pk:
-        return api_response(status.HTTP_400_BAD_REQUEST, "Parameter 'pk' wajib diisi", None)
-
-    uri = f"http://kagebunshin.org/character/{pk}"
-
-    query = f"""
-    PREFIX v: <http://kagebunshin.org/vocab/>
-    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
-    PREFIX vcard: <http://www.w3.org/2006/vcard/ns#>
-
-    SELECT ?char ?name ?fullName ?altName ?desc ?url ?attributes
-      (GROUP_CONCAT(DISTINCT ?title; separator=", ") AS ?animeList)
-    WHERE {{
-      VALUES ?char {{ <{uri}> }}
-
-      OPTIONAL {{ ?char foaf:name ?name . }}
-      OPTIONAL {{ ?char v:hasFullName ?fullName . }}
-      OPTIONAL {{ ?char v:hasAltName ?altName . }}
-      OPTIONAL {{ ?char v:hasDescription ?desc . }}
-      OPTIONAL {{ ?char vcard:hasURL ?url . }}
-      OPTIONAL {{ ?char v:hasAttributes ?attributes . }}
-
-      OPTIONAL {{
-        ?anime v:hasCharacter ?char ;
-               v:hasTitle ?title .
-      }}
-    }}
-    GROUP BY ?char ?name ?fullName ?altName ?desc ?url ?attributes
-    LIMIT 1
-    """
-
-    result = run_sparql(query)
-    if "error" in result:
-        return api_response(status.HTTP_500_INTERNAL_SERVER_ERROR, "Gagal ambil data karakter", result)
-
-    items = sparql_to_json(result)
-    if not items:
-        return api_response(status.HTTP_404_NOT_FOUND, "Karakter tidak ditemukan", None)
+def parse_attributes(raw_attrs):
+    # Parse attributes field if present. Expecting a JSON array string like:
+    # "[{\"name\": \"Birthday\", \"value\": \"August 23\"}, ...]"
+    parsed = []
+    try:
+      parsed_json = json.loads(raw_attrs)
+      if isinstance(parsed_json, list):
+        parsed = parsed_json
+      elif isinstance(parsed_json, dict):
+        parsed = [parsed_json]
+    except Exception:
+      # try to be more permissive: replace single quotes with double quotes
+      try:
+        cleaned = raw_attrs.replace("'", '"')
+        parsed_json = json.loads(cleaned)
+        if isinstance(parsed_json, list):
+          parsed = parsed_json
+        elif isinstance(parsed_json, dict):
+          parsed = [parsed_json]
+      except Exception:
+        # last resort: attempt to extract key/value pairs with regex
+        try:
+          pairs = re.findall(r'\{[^}]*\}', raw_attrs)
+          for p in pairs:
+            # remove enclosing braces and split by commas
+            body = p.strip('{}')
+            attrs = {}
+            for part in re.split(r',\s*(?=(?:[^\"]*\"[^\"]*\")*[^\"]*$)', body):
+              kv = part.split(':', 1)
+              if len(kv) == 2:
+                k = kv[0].strip().strip('"\'')
+                v = kv[1].strip().strip('"\'')
+                attrs[k] = v
+            if attrs:
+              parsed.append(attrs)
+        except Exception:
+          parsed = []
 
-    item = items[0]
+    return parsed
 
+def format_character_infobox(item):
     character = {
         "uri": item.get("char"),
         "name": item.get("name"),
@@ -544,168 +450,155 @@ def get_character_by_pk(request):
         "description": item.get("desc"),
         "attributes": [],
         "url": item.get("url"),
-        "animeList": clean_anime(item.get("animeList")) if item.get("animeList") else []
+        "animeList": item.get("animeList", [])
     }
 
-    # Parse attributes field if present. Expecting a JSON array string like:
-    # "[{\"name\": \"Birthday\", \"value\": \"August 23\"}, ...]"
     raw_attrs = item.get("attributes")
     if raw_attrs:
-      parsed = []
-      try:
-        parsed_json = json.loads(raw_attrs)
-        if isinstance(parsed_json, list):
-          parsed = parsed_json
-        elif isinstance(parsed_json, dict):
-          parsed = [parsed_json]
-      except Exception:
-        # try to be more permissive: replace single quotes with double quotes
-        try:
-          cleaned = raw_attrs.replace("'", '"')
-          parsed_json = json.loads(cleaned)
-          if isinstance(parsed_json, list):
-            parsed = parsed_json
-          elif isinstance(parsed_json, dict):
-            parsed = [parsed_json]
-        except Exception:
-          # last resort: attempt to extract key/value pairs with regex
-          try:
-            pairs = re.findall(r'\{[^}]*\}', raw_attrs)
-            for p in pairs:
-              # remove enclosing braces and split by commas
-              body = p.strip('{}')
-              attrs = {}
-              for part in re.split(r',\s*(?=(?:[^\"]*\"[^\"]*\")*[^\"]*$)', body):
-                kv = part.split(':', 1)
-                if len(kv) == 2:
-                  k = kv[0].strip().strip('"\'')
-                  v = kv[1].strip().strip('"\'')
-                  attrs[k] = v
-              if attrs:
-                parsed.append(attrs)
-          except Exception:
-            parsed = []
-
-      character["attributes"] = parsed
-
-    return api_response(status.HTTP_200_OK, "Berhasil ambil data karakter", character)
+      character["attributes"] = parse_attributes(raw_attrs)
+
+    return character
+
+# jenis infobox: label untuk pesan response, IRI dari pk, query, pengelompokan
+# hasil per IRI dan format response
+Infobox = namedtuple("Infobox", ["label", "uri", "queries", "collect", "format"])
+ANIME_INFOBOX = Infobox("anime", anime_uri, anime_infobox_queries, anime_infoboxes, format_anime_infobox)
+CHARACTER_INFOBOX = Infobox(
+    "karakter", character_uri, character_infobox_queries, character_infoboxes, format_character_infobox,
+)
+
+def infobox_queries(kind, pks):
+    return kind.queries([kind.uri(pk) for pk in pks])
+
+def infobox_result(kind, results, pk):
+    """Response infobox satu pk dari hasil run_sparql_many."""
+    error = infobox_error(results)
+    if error is not None:
+        return sparql_error(error, f"Gagal ambil data {kind.label}")
+
+    item = kind.collect(results).get(kind.uri(pk))
+    if item is None:
+        return status.HTTP_404_NOT_FOUND, f"{kind.label.capitalize()} tidak ditemukan", None, None
+    return ok(kind.format(item), message=f"Berhasil ambil data {kind.label}")
+
+def infobox_batch_result(kind, results, pks):
+    """Response {pk: infobox} dari hasil run_sparql_many."""
+    error = infobox_error(results)
+    if error is not None:
+        return sparql_error(error, f"Gagal ambil data {kind.label}")
+
+    data = infobox_map(kind.collect(results), pks, kind.uri, kind.format)
+    return ok(data, message=f"Berhasil ambil data {kind.label}")
+
+@conditional_on_dataset()
+@api_view(['GET'])
+def get_anime_by_pk(request):
+    try:
+        pk = parse_pk(request.GET)
+    except ParamError as e:
+        return api_response(*bad_request(e))
 
+    results = run_sparql_many(infobox_queries(ANIME_INFOBOX, [pk]), cache_ttl=CACHE_TTL_INFOBOX)
+    return api_response(*infobox_result(ANIME_INFOBOX, results, pk))
+
+@conditional_on_dataset()
 @api_view(['GET'])
-def get_studio_wd_by_name(request, pk: str = None):
-    """Lookup a studio on Wikidata by name extracted from the URL path segment `pk`.
+def get_character_by_pk(request):
+    try:
+        pk = parse_pk(request.GET)
+    except ParamError as e:
+        return api_response(*bad_request(e))
 
-      Example URL path: `/search/studio/wd/Toei_Animation/` -> studio name `Toei Animation`.
-      Returns notable works (P800), founders (P112), country (P17), official website (P856) and logo (P154).
-      """
-    if not pk:
-      pk = (request.GET.get('pk') or '').strip()
+    results = run_sparql_many(infobox_queries(CHARACTER_INFOBOX, [pk]), cache_ttl=CACHE_TTL_INFOBOX)
+    return api_response(*infobox_result(CHARACTER_INFOBOX, results, pk))
 
-    if not pk:
-      return api_response(status.HTTP_400_BAD_REQUEST, "Parameter 'pk' (studio name) wajib diisi pada query param '?pk=...'", None)
-
-    # Normalize underscores to spaces and sanitize double quotes
-    studio_name = pk.replace('_', ' ').strip()
-    studio_name_escaped = studio_name.replace('"', '\\"')
-
-    query = f"""
-    PREFIX wdt: <http://www.wikidata.org/prop/direct/>
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-    PREFIX wikibase: <http://wikiba.se/ontology#>
-    PREFIX bd: <http://www.bigdata.com/rdf#>
-
-    SELECT DISTINCT
-      ?studio ?studioLabel
-      (GROUP_CONCAT(DISTINCT ?notableWorkLabel; separator=", ") AS ?notableWorks)
-      (GROUP_CONCAT(DISTINCT ?foundedByLabel; separator=", ") AS ?founders)
-      ?countryLabel
-      ?officialWebsite
-      ?logo
-    WHERE {{
-      ?studio rdfs:label "{studio_name_escaped}"@en .
-
-      OPTIONAL {{ ?studio wdt:P800 ?notableWork . ?notableWork rdfs:label ?notableWorkLabel FILTER(LANG(?notableWorkLabel) = "en") }}
-      OPTIONAL {{ ?studio wdt:P112 ?foundedBy . ?foundedBy rdfs:label ?foundedByLabel FILTER(LANG(?foundedByLabel) = "en") }}
-      OPTIONAL {{ ?studio wdt:P17 ?country . ?country rdfs:label ?countryLabel FILTER(LANG(?countryLabel) = "en") }}
-      OPTIONAL {{ ?studio wdt:P856 ?officialWebsite . }}
-      OPTIONAL {{ ?studio wdt:P154 ?logo . }}
-
-      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en".
-        ?studio rdfs:label ?studioLabel .
-      }}
-    }}
-    GROUP BY
-      ?studio ?studioLabel
-      ?countryLabel ?officialWebsite ?logo
-    LIMIT 1
-    """
+@conditional_on_dataset()
+@api_view(['GET'])
+def get_anime_by_pks(request):
+    try:
+        pks = parse_pks(request.GET)
+    except PkListError as e:
+        return api_response(*bad_request(e))
+
+    results = run_sparql_many(infobox_queries(ANIME_INFOBOX, pks), cache_ttl=CACHE_TTL_INFOBOX)
+    return api_response(*infobox_batch_result(ANIME_INFOBOX, results, pks))
 
-    url = 'https://query.wikidata.org/sparql'
-    headers = {'Accept': 'application/sparql-results+json', 'User-Agent': 'kagebunshin-be/1.0 (contact: dev@example.com)'}
+@conditional_on_dataset()
+@api_view(['GET'])
+def get_character_by_pks(request):
     try:
-      resp = requests.get(url, params={'query': query}, headers=headers, timeout=15)
-    except Exception as e:
-      return api_response(status.HTTP_502_BAD_GATEWAY, 'Gagal menghubungi Wikidata', {'error': str(e)})
-
-    if resp.status_code != 200:
-      return api_response(status.HTTP_502_BAD_GATEWAY, 'Wikidata returned non-200', {'status_code': resp.status_code, 'text': resp.text[:200]})
-
-    body = resp.json()
-    bindings = body.get('results', {}).get('bindings', [])
-    if not bindings:
-      return api_response(status.HTTP_404_NOT_FOUND, 'Studio Wikidata tidak ditemukan', None)
-
-    b = bindings[0]
-
-    def read(binding, key):
-      v = binding.get(key)
-      if not v:
-        return None
-      return v.get('value')
-
-    notable_raw = read(b, 'notableWorks') or ''
-    founders_raw = read(b, 'founders') or ''
-
-    data = {
-      'wikidataUri': read(b, 'studio'),
-      'name': read(b, 'studioLabel') or studio_name,
-      'notableWorks': [s for s in notable_raw.split('||') if s],
-      'founders': [s for s in founders_raw.split('||') if s],
-      'originCountry': read(b, 'countryLabel'),
-      'officialWebsite': read(b, 'officialWebsite'),
-      'logo': read(b, 'logo'),
-    }
+        pks = parse_pks(request.GET)
+    except PkListError as e:
+        return api_response(*bad_request(e))
 
-    # Also try to find anime in the local GraphDB tagged with the same studio
-    # We construct a likely local studio URI by replacing spaces with underscores
-    # e.g. studio_name "Toei Animation" -> http://kagebunshin.org/studio/Toei_Animation
-    local_studio_fragment = studio_name.replace(' ', '_')
-    local_studio_uri = f"http://kagebunshin.org/studio/{local_studio_fragment}"
-
-    local_query = f"""
-    PREFIX v: <http://kagebunshin.org/vocab/>
-
-    SELECT ?anime ?title
-    WHERE {{
-      VALUES ?studio {{ <{local_studio_uri}> }}
-      ?anime v:hasStudio ?studio .
-      OPTIONAL {{ ?anime v:hasTitle ?title . }}
-    }}
-    """
+    results = run_sparql_many(infobox_queries(CHARACTER_INFOBOX, pks), cache_ttl=CACHE_TTL_INFOBOX)
+    return api_response(*infobox_batch_result(CHARACTER_INFOBOX, results, pks))
+
+# STUDIO
 
+# lookup anime lokal yang jalan bareng lookup Wikidata saat cache studio miss
+STUDIO_LOOKUP_WORKERS = int(os.getenv('STUDIO_LOOKUP_WORKERS', '4'))
+studio_lookup_pool = ThreadPoolExecutor(max_workers=STUDIO_LOOKUP_WORKERS, thread_name_prefix="studio-lookup")
+
+def format_local_anime(local_result):
     local_anime = []
+    if "error" not in local_result:
+      local_items = sparql_to_json(local_result)
+      for it in local_items:
+        local_anime.append({
+          'uri': it.get('anime'),
+          'title': it.get('title')
+        })
+    return local_anime
+
+def local_anime_for_studio(studio_name):
     try:
-      local_result = run_sparql(local_query)
-      if "error" not in local_result:
-        local_items = sparql_to_json(local_result)
-        for it in local_items:
-          local_anime.append({
-            'uri': it.get('anime'),
-            'title': it.get('title')
-          })
+      return format_local_anime(run_sparql(studio_local_anime_query(studio_name), cache_ttl=CACHE_TTL_INFOBOX))
     except Exception as e:
       # ignore local lookup errors but include empty list
-      local_anime = []
+      return []
+
+def parse_studio_name(request, pk):
+    """Nama studio dari segmen URL `pk` atau ?pk=..."""
+    if not pk:
+      pk = (request.GET.get('pk') or '').strip()
+    if not pk:
+      raise ParamError("Parameter 'pk' (studio name) wajib diisi pada query param '?pk=...'")
+    return studio_name_from_pk(pk)
+
+def studio_result(studio, local_anime):
+    if studio is None:
+      return status.HTTP_404_NOT_FOUND, 'Studio Wikidata tidak ditemukan', None, None
+    return ok(dict(studio, localAnime=local_anime), message='Berhasil ambil data dari Wikidata (by name)')
+
+def wikidata_error(error):
+    return status.HTTP_502_BAD_GATEWAY, error.message, error.data, None
 
-    data['localAnime'] = local_anime
+@api_view(['GET'])
+def get_studio_wd_by_name(request, pk: str = None):
+    """Lookup a studio on Wikidata by name extracted from the URL path segment `pk`.
+
+      Example URL path: `/search/studio/wd/Toei_Animation/` -> studio name `Toei Animation`.
+      Returns notable works (P800), founders (P112), country (P17), official website (P856) and logo (P154).
+      Wikidata results are cached on disk, see search/studio.py.
+      """
+    try:
+      studio_name = parse_studio_name(request, pk)
+    except ParamError as e:
+      return api_response(*bad_request(e))
+
+    entry, needs_fetch = cached_studio(studio_name)
+    if not needs_fetch:
+      studio = entry["studio"]
+      local_anime = local_anime_for_studio(studio_name)
+    else:
+      # Also try to find anime in the local GraphDB tagged with the same studio,
+      # concurrently with the Wikidata request
+      local_lookup = studio_lookup_pool.submit(local_anime_for_studio, studio_name)
+      try:
+        studio = fetch_studio(studio_name, entry)
+      except WikidataError as e:
+        return api_response(*wikidata_error(e))
+      local_anime = local_lookup.result()
 
-    return api_response(status.HTTP_200_OK, 'Berhasil ambil data dari Wikidata (by name)', data)
+    return api_response(*studio_result(studio, local_anime))